@@ -10,7 +10,7 @@ class ConfigDataAnalysis(cp.ConfigParser):
                  led_arrays=None, num_ref_images=10, camera_channels=0, num_of_cores=1,
                  reference_property='sum_col_val',
                  average_images=False, solver='numeric', weighting_preference=-6e-3, weighting_curvature=1e-6,
-                 num_iterations=200):
+                 num_iterations=200, weighting_tikhonov=1e-3, weighting_temporal=1e-2, linear_seeds=True):
         """
         :param load_config_file: Determines whether to load the config file on initialization. Defaults to True.
         :type load_config_file: bool
@@ -32,7 +32,7 @@ class ConfigDataAnalysis(cp.ConfigParser):
         :type reference_property: str
         :param average_images: Determines if intensities are computed as an average from two consecutive images. Defaults to False.
         :type average_images: bool
-        :param solver: Method used to compute extinction coefficients - can be 'analytic' or 'numeric'. Defaults to 'numeric'.
+        :param solver: Method used to compute extinction coefficients - can be 'linear', 'joint', 'numeric' or 'analytic'. Defaults to 'numeric'.
         :type solver: str
         :param weighting_preference: Weighting factor for the preference to push the numerical solver to high or low values for the extinction coeffiientes. Defaults to -6e-3.
         :type weighting_preference: float
@@ -40,6 +40,12 @@ class ConfigDataAnalysis(cp.ConfigParser):
         :type weighting_curvature: float
         :param num_iterations: Maximum number of iterations for the numeric solver. Defaults to 200.
         :type num_iterations: int
+        :param weighting_tikhonov: Weighting factor of the regularization of the curvature of the solution of the linear solver. Defaults to 1e-3.
+        :type weighting_tikhonov: float
+        :param weighting_temporal: Weighting factor of the regularization of the temporal differences of the solution of the joint solver. Defaults to 1e-2.
+        :type weighting_temporal: float
+        :param linear_seeds: Start the chunks of images solved in parallel by the numeric solver from the solution of the linear solver, like the images in between start from the solution of the previous image. If False, the first image of every chunk starts from zero. Defaults to True.
+        :type linear_seeds: bool
         """
         cp.ConfigParser.__init__(self, allow_no_value=True)
         if load_config_file:
@@ -55,12 +61,18 @@ class ConfigDataAnalysis(cp.ConfigParser):
             self['DEFAULT']['   camera_channels'] = str(camera_channels)
             self.set('DEFAULT', '   # Intensities are computed as average from two consecutive images if set to True ')
             self['DEFAULT']['   average_images'] = str(average_images)
-            self.set('DEFAULT', '   # Extinction coefficients can be computed by linear or numeric solver ')
+            self.set('DEFAULT', '   # Extinction coefficients can be computed by linear, joint or numeric solver ')
             self['DEFAULT']['   solver'] = str(solver)
             self.set('DEFAULT', '   # Options for numeric solver ')
             self['DEFAULT']['   weighting_preference'] = str(weighting_preference)
             self['DEFAULT']['   weighting_curvature'] = str(weighting_curvature)
             self['DEFAULT']['   num_iterations'] = str(num_iterations)
+            self.set('DEFAULT', '   # Start the images solved on each core from the solution of the linear solver if set to True, from zero otherwise ')
+            self['DEFAULT']['   linear_seeds'] = str(linear_seeds)
+            self.set('DEFAULT', '   # Options for linear and joint solver ')
+            self['DEFAULT']['   weighting_tikhonov'] = str(weighting_tikhonov)
+            self.set('DEFAULT', '   # Options for joint solver, which couples the solutions of all images in time ')
+            self['DEFAULT']['   weighting_temporal'] = str(weighting_temporal)
 
             self['experiment_geometry'] = {}
             self.set('experiment_geometry', '# Global X Y Z position of the camera ')
@@ -187,6 +187,43 @@ class Experiment:
             distance_per_layer = None
         return distance_per_layer
 
+    def calc_traversed_dist_per_led_and_layer(self) -> np.ndarray:
+        """
+        Calculate the distances traversed by light from all LEDs through each layer to the camera at once.
+        Gives the same distances as calc_traversed_dist_per_layer for every LED, with NaN values for LEDs whose
+        distances are not consistent.
+
+        :return: Array of distances traversed in each layer, with a row for every LED
+        :rtype: np.ndarray
+        """
+        distances = np.zeros((self.led_number, self.layers.amount))
+        if len(self.leds) == 0:
+            return distances
+        led_x, led_y, led_z = np.array([[led.pos_x, led.pos_y, led.pos_z] for led in self.leds]).T
+        horizontal_dist = np.sqrt((self.camera.pos_x - led_x) ** 2 + (self.camera.pos_y - led_y) ** 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alpha = np.arctan((led_z - self.camera.pos_z) / horizontal_dist)
+        layer_bottoms = self.layers.borders[np.newaxis, :-1]
+        layer_tops = self.layers.borders[np.newaxis, 1:]
+
+        # vertical distance traversed in every layer, see calc_traversed_height_in_layer
+        top = np.minimum(np.maximum(self.camera.pos_z, led_z)[:, np.newaxis], layer_tops)
+        bot = np.maximum(np.minimum(self.camera.pos_z, led_z)[:, np.newaxis], layer_bottoms)
+        traversed_heights = np.clip(top - bot, 0, None)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distance_per_layer = np.abs(traversed_heights / np.sin(alpha)[:, np.newaxis])
+
+        # LEDs in the plane of the camera, see calc_traversed_dist_in_plane
+        in_plane = alpha == 0
+        camera_layer = (layer_bottoms <= self.camera.pos_z) & (self.camera.pos_z < layer_tops)
+        distance_per_layer[in_plane] = np.where(camera_layer, horizontal_dist[in_plane, np.newaxis], 0)
+
+        euclidean_dist = np.sqrt(horizontal_dist ** 2 + (self.camera.pos_z - led_z) ** 2)
+        consistent = np.abs(np.sum(distance_per_layer, axis=1) - euclidean_dist) <= 1e-6
+        distance_per_layer[~consistent] = np.nan
+        distances[:len(self.leds)] = distance_per_layer
+        return distances
+
     def calc_traversed_dist_in_plane(self, led: LED) -> np.ndarray:
         """
         Calculate the distance traversed by light from an LED in a plane to the camera.
@@ -32,6 +32,14 @@ class ExperimentData:
     :type weighting_curvature: float
     :ivar num_iterations: Number of iterations.
     :type num_iterations: int
+    :ivar linear_seeds: Flag to seed the parallel numeric solver with the linear solver.
+    :type linear_seeds: bool
+    :ivar solver: Solver of the extinction coefficients, 'linear', 'joint', 'numeric' or 'analytic'.
+    :type solver: str
+    :ivar weighting_tikhonov: Weighting of the regularization of the linear solver.
+    :type weighting_tikhonov: float
+    :ivar weighting_temporal: Weighting of the temporal regularization of the joint solver.
+    :type weighting_temporal: float
     :ivar num_ref_images: Number of reference images.
     :type num_ref_images: int
     :ivar reference_property: Reference property to be analysed.
@@ -50,6 +58,10 @@ class ExperimentData:
         self.weighting_preference = None
         self.weighting_curvature = None
         self.num_iterations = None
+        self.linear_seeds = None
+        self.solver = None
+        self.weighting_tikhonov = None
+        self.weighting_temporal = None
         self.num_ref_images = None
         self.reference_property = None
         self.merge_led_arrays = None
@@ -67,6 +79,10 @@ class ExperimentData:
         self.weighting_preference = float(config_analysis['DEFAULT']['weighting_preference'])
         self.weighting_curvature = float(config_analysis['DEFAULT']['weighting_curvature'])
         self.num_iterations = int(config_analysis['DEFAULT']['num_iterations'])
+        self.linear_seeds = config_analysis['DEFAULT'].getboolean('linear_seeds', fallback=True)
+        self.solver = config_analysis['DEFAULT'].get('solver', fallback='numeric')
+        self.weighting_tikhonov = config_analysis['DEFAULT'].getfloat('weighting_tikhonov', fallback=1e-3)
+        self.weighting_temporal = config_analysis['DEFAULT'].getfloat('weighting_temporal', fallback=1e-2)
         self.reference_property = config_analysis['DEFAULT']['reference_property']
 
         self.led_arrays = config_analysis.get_list_of_values('model_parameters', 'led_arrays')
@@ -1,5 +1,9 @@
+import hashlib
+import os
 from abc import ABC, abstractmethod
 from multiprocessing import Pool
+from pathlib import Path
+from typing import List, Optional
 
 import numpy as np
 import pandas as pd
@@ -22,6 +26,13 @@ class ExtinctionCoefficients(ABC):
     :vartype num_ref_imgs: int
     :ivar calculated_img_data: DataFrame containing calculated image data.
     :vartype calculated_img_data: pd.DataFrame
+    :ivar result_cube: Memory-mapped results of the channel. If set, the intensities are taken from it instead of
+        being read from the binary file.
+    :vartype result_cube: ResultCube or None
+    :ivar img_ids: IDs of the images the intensities belong to.
+    :vartype img_ids: np.ndarray
+    :ivar intensities_per_image_and_led: Values of the reference property of every image and LED.
+    :vartype intensities_per_image_and_led: np.ndarray
     :ivar distances_per_led_and_layer: Array of distances traversed between camera and LEDs in each layer.
     :vartype distances_per_led_and_layer: np.ndarray
     :ivar ref_intensities: Array of reference intensities for all LEDs.
@@ -52,6 +63,9 @@ class ExtinctionCoefficients(ABC):
         self.num_ref_imgs = num_ref_imgs
 
         self.calculated_img_data = pd.DataFrame()
+        self.result_cube = None
+        self.img_ids = np.array([])
+        self.intensities_per_image_and_led = np.array([])
         self.distances_per_led_and_layer = np.array([])
         self.ref_intensities = np.array([])
         self.cc_matrix = None
@@ -64,6 +78,21 @@ class ExtinctionCoefficients(ABC):
               f'reference_property: {self.reference_property}, num_ref_imgs: {self.num_ref_imgs}\n'
         return out
 
+    def __getstate__(self) -> dict:
+        """
+        Get the state to pickle, e.g. for the processes of calc_and_set_coefficients_mp. The result cube and the
+        image data are left out, since a pickled memory map is a full copy of its data and the processes receive the
+        relative intensities of their images as arguments.
+
+        :return: State of the object without the result cube and the image data.
+        :rtype: dict
+        """
+        state = self.__dict__.copy()
+        state['result_cube'] = None
+        state['calculated_img_data'] = pd.DataFrame()
+        state['intensities_per_image_and_led'] = np.array([])
+        return state
+
     def calc_and_set_coefficients(self) -> None:
         """
         Serial calculation of extinction coefficients fo every image
@@ -71,8 +100,7 @@ class ExtinctionCoefficients(ABC):
         """
         # Load and calculate all needed variables
         self.set_all_member_variables()
-        for img_id, single_img_data in self.calculated_img_data.groupby(level=0):
-            single_img_array = single_img_data[self.reference_property].to_numpy()
+        for single_img_array in self.intensities_per_image_and_led:
             rel_intensities = single_img_array / self.ref_intensities
 
             # Calculate the extinction coefficients depending on child class used
@@ -82,49 +110,93 @@ class ExtinctionCoefficients(ABC):
     def calc_and_set_coefficients_mp(self, cores=4) -> None:
         """
         Uses multiprocessing to calculate and set extinction coefficients.
+        The images are split into one contiguous chunk per core. Within a chunk, the images are solved serially, so that
+        every image starts from the coefficients of the previous one, and the chunks are joined in order afterwards.
 
         :param cores: Number of cores to use.
         :type cores: int
         """
         # Load and calculate all needed variables
         self.set_all_member_variables()
-        img_property_array = multiindex_series_to_nparray(self.calculated_img_data[self.reference_property])
-        rel_intensities = img_property_array / self.ref_intensities
+        rel_intensities = self.intensities_per_image_and_led / self.ref_intensities
+        if len(rel_intensities) == 0:
+            self.coefficients_per_image_and_layer = []
+            return
+        chunks = np.array_split(rel_intensities, min(cores, len(rel_intensities)))
+        chunk_seeds = self.calc_chunk_seeds(np.array([chunk[0] for chunk in chunks]))
 
         # Calculate the extinction coefficients depending on child class used
-        pool = Pool(processes=cores)
-        kappas = pool.map(self.calc_coefficients_of_img, rel_intensities)
-        pool.close()
-        self.coefficients_per_image_and_layer = kappas
+        with Pool(processes=cores) as pool:
+            kappas_per_chunk = pool.starmap(self.calc_coefficients_of_img_sequence, zip(chunks, chunk_seeds))
+        self.coefficients_per_image_and_layer = [kappas for chunk in kappas_per_chunk for kappas in chunk]
+
+    def calc_coefficients_of_img_sequence(self, rel_intensities: np.ndarray, kappas0=None) -> List[np.ndarray]:
+        """
+        Calculate the extinction coefficients of consecutive images one after another, every image starting from the
+        coefficients of the previous one.
+
+        :param rel_intensities: Relative change in intensity of every image and LED.
+        :type rel_intensities: np.ndarray
+        :param kappas0: Coefficients the first image starts from, in the order of the results. Defaults to None.
+        :type kappas0: np.ndarray, optional
+        :return: Array of the computed extinction coefficients of every image.
+        :rtype: List[np.ndarray]
+        """
+        self.coefficients_per_image_and_layer = [] if kappas0 is None else [kappas0]
+        for single_img_rel_intensities in rel_intensities:
+            self.coefficients_per_image_and_layer.append(self.calc_coefficients_of_img(single_img_rel_intensities))
+        return self.coefficients_per_image_and_layer[0 if kappas0 is None else 1:]
+
+    def calc_chunk_seeds(self, rel_intensities: np.ndarray) -> List[Optional[np.ndarray]]:
+        """
+        Calculate the coefficients the first images of the chunks of calc_and_set_coefficients_mp start from.
+        By default, they start without a seed.
+
+        :param rel_intensities: Relative change in intensity of every LED in the first image of every chunk.
+        :type rel_intensities: np.ndarray
+        :return: Seed of every chunk or None.
+        :rtype: List[Optional[np.ndarray]]
+        """
+        return [None] * len(rel_intensities)
 
     def set_all_member_variables(self) -> None:
         """
         Calculate  distance traveled per layer, for every led, load image data from binary file and calculate reference intensities for each LED
 
         """
-        camera = 0
         if len(self.distances_per_led_and_layer) == 0:
             self.distances_per_led_and_layer = self.calc_distance_array()
-            np.savetxt(f'cam_{camera}_distances_per_led_and_layer.txt', self.distances_per_led_and_layer)
-        if self.calculated_img_data.empty:
+        if self.intensities_per_image_and_led.shape[0] == 0:
             self.load_img_data()
         if self.ref_intensities.shape[0] == 0:
             self.calc_and_set_ref_intensities()
 
     def load_img_data(self) -> None:
         """
-        Load processed image data from binary file
+        Load processed image data from the result cube if set, from binary file otherwise
 
         """
+        if self.result_cube is not None and not self.average_images:
+            self.img_ids = self.result_cube.img_ids
+            self.intensities_per_image_and_led = self.result_cube.get_values(self.reference_property,
+                                                                             self.experiment.led_array)
+            if self.intensities_per_image_and_led.shape[1] == 0:
+                exit(f"Apparently there are no intensity values for line {self.experiment.led_array}!")
+            return
         if self.average_images:
             img_data = read_hdf_avg(self.experiment.channel, path=self.experiment.path)
             create_analysis_infos_avg()
+            img_data_cropped = img_data[['line', self.reference_property]]
+            self.calculated_img_data = img_data_cropped[img_data_cropped['line'] == self.experiment.led_array]
         else:
-            img_data = read_hdf(self.experiment.channel, path=self.experiment.path)
-        img_data_cropped = img_data[['line', self.reference_property]]
-        self.calculated_img_data = img_data_cropped[img_data_cropped['line'] == self.experiment.led_array]
+            self.calculated_img_data = read_hdf(self.experiment.channel, path=self.experiment.path,
+                                                columns=['line', self.reference_property],
+                                                line=self.experiment.led_array)
         if self.calculated_img_data.empty:
             exit(f"Apparently there are no intensity values for line {self.experiment.led_array}!")
+        self.img_ids = self.calculated_img_data.index.unique(level='img_id').to_numpy()
+        self.intensities_per_image_and_led = multiindex_series_to_nparray(
+            self.calculated_img_data[self.reference_property])
 
     def save(self) -> None:
         """
@@ -144,27 +216,47 @@ class ExtinctionCoefficients(ABC):
     def calc_distance_array(self) -> np.ndarray:
         """
         Calculate the distances traversed between camera and LEDs in each layer.
+        The distances are cached in 'analysis/geometry_cache', keyed by a hash of the camera position, the layer borders
+        and the LED ids and coordinates, and reused by every channel and solver with the same geometry.
 
         :return: Array of distances traversed between camera and LEDs in each layer.
         :rtype: np.ndarray
         """
-        distances = np.zeros((self.experiment.led_number, self.experiment.layers.amount))
-        count = 0
-        for led in self.experiment.leds:
-            d = self.experiment.calc_traversed_dist_per_layer(led)
-            distances[count] = d
-            count += 1
+        cache_path = self.get_distance_cache_path()
+        if cache_path.exists():
+            return np.load(cache_path)
+        distances = self.experiment.calc_traversed_dist_per_led_and_layer()
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_cache_path = cache_path.with_name(f'{cache_path.stem}.{os.getpid()}.tmp')
+        with open(tmp_cache_path, 'wb') as cache_file:
+            np.save(cache_file, distances)
+        os.replace(tmp_cache_path, cache_path)
         return distances
 
+    def get_distance_cache_path(self) -> Path:
+        """
+        Get the path of the cached distances traversed between camera and LEDs in each layer.
+
+        :return: Path of the cache file.
+        :rtype: Path
+        """
+        camera = self.experiment.camera
+        geometry = hashlib.sha256()
+        geometry.update(np.array([camera.pos_x, camera.pos_y, camera.pos_z], dtype=np.float64).tobytes())
+        geometry.update(np.asarray(self.experiment.layers.borders, dtype=np.float64).tobytes())
+        geometry.update(np.array([self.experiment.led_number], dtype=np.float64).tobytes())
+        geometry.update(np.array([[led.id, led.pos_x, led.pos_y, led.pos_z] for led in self.experiment.leds],
+                                 dtype=np.float64).tobytes())
+        return Path(self.experiment.path) / 'analysis' / 'geometry_cache' / \
+            f'distances_per_led_and_layer_{geometry.hexdigest()[:16]}.npy'
+
     def calc_and_set_ref_intensities(self) -> None:
         """
          Calculate and set the reference intensities for all LEDs based on the reference images.
 
          """
-        ref_img_data = self.calculated_img_data.query(f'img_id <= {self.num_ref_imgs}')
-        ref_intensities = ref_img_data.groupby(level='led_id').mean()
-
-        self.ref_intensities = ref_intensities[self.reference_property].to_numpy()
+        ref_intensities = self.intensities_per_image_and_led[self.img_ids <= self.num_ref_imgs]
+        self.ref_intensities = np.nanmean(ref_intensities, axis=0)
 
     def apply_color_correction(self, cc_matrix, on='sum_col_val',
                                nchannels=3) -> None:  # TODO: remove hardcoding of nchannels
@@ -182,7 +274,7 @@ class ExtinctionCoefficients(ABC):
         quanity = on
         fit_params_list = []
         for channel in range(nchannels):
-            fit_parameters = read_hdf(channel)[quanity]
+            fit_parameters = read_hdf(channel, columns=[quanity])[quanity]
             fit_params_list.append(fit_parameters)
         raw_val_array = pd.concat(fit_params_list, axis=1)
         cc_val_array = np.dot(cc_matrix_inv, raw_val_array.T).T
@@ -213,9 +305,4 @@ def multiindex_series_to_nparray(multi_series: pd.Series) -> np.ndarray:
     :return: Converted array.
     :rtype: np.ndarray
     """
-    num_leds = pd.Series(multi_series.groupby(level=0).size()).iloc[0]
-    num_imgs = pd.Series(multi_series.groupby(level=1).size()).iloc[0]
-    array = np.zeros((num_imgs, num_leds))
-    for i in range(num_imgs):
-        array[i] = multi_series.loc[i + 1]
-    return array
+    return multi_series.unstack(level=1).to_numpy(dtype=float)
@@ -0,0 +1,102 @@
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+from scipy.sparse.linalg import LinearOperator, cg
+
+from ledsa.analysis.Experiment import Experiment, Layers, Camera
+from ledsa.analysis.ExtinctionCoefficientsLinear import ExtinctionCoefficientsLinear
+
+
+class ExtinctionCoefficientsJoint(ExtinctionCoefficientsLinear):
+    """
+    ExtinctionCoefficientsJoint class. Estimates the extinction coefficients of all images and layers in one
+    regularized least squares problem of the linear problem -log(I/I0) = D @ kappa, which couples consecutive images by
+    a penalty on the temporal differences of the coefficients besides the penalty on their vertical curvature.
+    The sparse normal equations are solved by the preconditioned conjugate gradient method, starting from the
+    solutions of the single images. The coefficients are clipped to the bounds afterwards.
+
+    :ivar weighting_temporal: Weighting factor of the regularization of the temporal differences of the solution.
+    :vartype weighting_temporal: float
+    :ivar num_iterations: Maximum number of iterations of the conjugate gradient method.
+    :vartype num_iterations: int
+    :ivar type: Type of method.
+    :vartype type: str
+    """
+    def __init__(self, experiment=Experiment(layers=Layers(20, 1.0, 3.35), camera=Camera(pos_x=4.4, pos_y=2, pos_z=2.3),
+                                             led_array=3, channel=0),
+                 reference_property='sum_col_val', num_ref_imgs=10, average_images=False, weighting_tikhonov=1e-3,
+                 weighting_temporal=1e-2, num_iterations=200):
+        """
+        :param experiment: Object representing the experimental setup.
+        :type experiment: Experiment
+        :param reference_property: Reference property to be analysed
+        :type reference_property: str
+        :param num_ref_imgs: Number of reference images.
+        :type num_ref_imgs: int
+        :param average_images: Flag to determine if intensities are computed as an average from two consecutive images.
+        :type average_images: bool
+        :param weighting_tikhonov: Weighting factor of the regularization of the curvature of the solution.
+        :type weighting_tikhonov: float
+        :param weighting_temporal: Weighting factor of the regularization of the temporal differences of the solution.
+        :type weighting_temporal: float
+        :param num_iterations: Maximum number of iterations of the conjugate gradient method.
+        :type num_iterations: int
+        """
+        super().__init__(experiment, reference_property, num_ref_imgs, average_images, weighting_tikhonov)
+        self.weighting_temporal = weighting_temporal
+        self.num_iterations = num_iterations
+        self.type = 'joint'
+
+    def calc_and_set_coefficients(self) -> None:
+        """
+        Calculation of the extinction coefficients of all images in a single joint solve.
+
+        """
+        self.set_all_member_variables()
+        rel_intensities = self.intensities_per_image_and_led / self.ref_intensities
+        self.coefficients_per_image_and_layer = list(self.calc_coefficients_of_all_imgs(rel_intensities))
+
+    def calc_coefficients_of_all_imgs(self, rel_intensities: np.ndarray) -> np.ndarray:
+        """
+        Calculate the extinction coefficients of a sequence of images in a single joint solve. Like in
+        ExtinctionCoefficientsNumeric, the coefficients of every image are returned from the top to the bottom layer.
+
+        :param rel_intensities: Relative change in intensity of every image and LED, in temporal order.
+        :type rel_intensities: np.ndarray
+        :return: Extinction coefficients of every image and layer.
+        :rtype: np.ndarray
+        """
+        if self.factorization is None:
+            self.factor_normal_equations()
+        num_imgs, num_layers = rel_intensities.shape[0], self.experiment.layers.amount
+        distances = self.distances_per_led_and_layer
+        with np.errstate(divide='ignore', invalid='ignore'):
+            optical_depths = -np.log(rel_intensities)
+        valid = np.isfinite(optical_depths)
+        optical_depths = np.where(valid, optical_depths, 0)
+        vertical_matrix = self.weighting_tikhonov * self.regularization_matrix.T @ self.regularization_matrix
+
+        def apply_normal_matrix(kappas: np.ndarray) -> np.ndarray:
+            kappas = kappas.reshape(num_imgs, num_layers)
+            result = (valid * (kappas @ distances.T)) @ distances + kappas @ vertical_matrix
+            temporal_differences = self.weighting_temporal * np.diff(kappas, axis=0)
+            result[:-1] -= temporal_differences
+            result[1:] += temporal_differences
+            return result.ravel()
+
+        # the data and vertical terms of a complete image plus the largest diagonal entry of the temporal term
+        preconditioner = cho_factor(distances.T @ distances + vertical_matrix +
+                                    2 * self.weighting_temporal * np.eye(num_layers))
+
+        def apply_preconditioner(residuals: np.ndarray) -> np.ndarray:
+            return cho_solve(preconditioner, residuals.reshape(num_imgs, num_layers).T).T.ravel()
+
+        size = num_imgs * num_layers
+        normal_matrix = LinearOperator((size, size), matvec=apply_normal_matrix, dtype=float)
+        rhs = ((valid * optical_depths) @ distances).ravel()
+        kappas0 = np.flip(self.calc_coefficients_of_imgs(rel_intensities), axis=1)
+        kappas, info = cg(normal_matrix, rhs, x0=kappas0.ravel(), maxiter=self.num_iterations,
+                          M=LinearOperator((size, size), matvec=apply_preconditioner, dtype=float))
+        if info > 0:
+            print(f"Joint solve did not converge within {self.num_iterations} iterations!")
+        kappas = np.clip(kappas.reshape(num_imgs, num_layers), *self.bounds)
+        return np.flip(kappas, axis=1)
@@ -0,0 +1,138 @@
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+from scipy.optimize import lsq_linear
+
+from ledsa.analysis.Experiment import Experiment, Layers, Camera
+from ledsa.analysis.ExtinctionCoefficients import ExtinctionCoefficients
+
+
+class ExtinctionCoefficientsLinear(ExtinctionCoefficients):
+    """
+    ExtinctionCoefficientsLinear class. Solves the linear problem -log(I/I0) = D @ kappa of every image as a
+    Tikhonov-regularized least squares problem, with D the distances traversed between camera and LEDs in each layer.
+    Since D is the same for all images, the normal equations are factored once and all images are solved together.
+    Images whose solution violates the bounds are solved again as bounded least squares problems.
+
+    :ivar bounds: Lower and upper bound of the extinction coefficients.
+    :vartype bounds: tuple
+    :ivar weighting_tikhonov: Weighting factor of the regularization of the curvature of the solution.
+    :vartype weighting_tikhonov: float
+    :ivar regularization_matrix: Regularization matrix, the second differences of the coefficients and a small
+        multiple of the identity, which keeps the normal equations positive definite.
+    :vartype regularization_matrix: np.ndarray
+    :ivar factorization: Cholesky factorization of the regularized normal equations.
+    :vartype factorization: tuple or None
+    :ivar type: Type of method.
+    :vartype type: str
+    """
+    def __init__(self, experiment=Experiment(layers=Layers(20, 1.0, 3.35), camera=Camera(pos_x=4.4, pos_y=2, pos_z=2.3),
+                                             led_array=3, channel=0),
+                 reference_property='sum_col_val', num_ref_imgs=10, average_images=False, weighting_tikhonov=1e-3):
+        """
+        :param experiment: Object representing the experimental setup.
+        :type experiment: Experiment
+        :param reference_property: Reference property to be analysed
+        :type reference_property: str
+        :param num_ref_imgs: Number of reference images.
+        :type num_ref_imgs: int
+        :param average_images: Flag to determine if intensities are computed as an average from two consecutive images.
+        :type average_images: bool
+        :param weighting_tikhonov: Weighting factor of the regularization of the curvature of the solution.
+        :type weighting_tikhonov: float
+        """
+        super().__init__(experiment, reference_property, num_ref_imgs, average_images)
+        self.bounds = (0, 10)
+        self.weighting_tikhonov = weighting_tikhonov
+        self.regularization_matrix = np.array([])
+        self.factorization = None
+        self.type = 'linear'
+
+    def set_all_member_variables(self) -> None:
+        """
+        Set the member variables of the parent class and factor the regularized normal equations.
+
+        """
+        super().set_all_member_variables()
+        if self.factorization is None:
+            self.factor_normal_equations()
+
+    def factor_normal_equations(self) -> None:
+        """
+        Factor the regularized normal equations of the distances traversed between camera and LEDs in each layer.
+
+        """
+        num_layers = self.experiment.layers.amount
+        second_differences = np.diff(np.eye(num_layers), n=2, axis=0)
+        self.regularization_matrix = np.vstack([second_differences, 1e-4 * np.eye(num_layers)])
+        distances = self.distances_per_led_and_layer
+        normal_matrix = distances.T @ distances + \
+            self.weighting_tikhonov * self.regularization_matrix.T @ self.regularization_matrix
+        self.factorization = cho_factor(normal_matrix)
+
+    def calc_and_set_coefficients(self) -> None:
+        """
+        Calculation of the extinction coefficients of all images in a single solve.
+
+        """
+        self.set_all_member_variables()
+        rel_intensities = self.intensities_per_image_and_led / self.ref_intensities
+        self.coefficients_per_image_and_layer = list(self.calc_coefficients_of_imgs(rel_intensities))
+
+    def calc_and_set_coefficients_mp(self, cores=4) -> None:
+        """
+        Calculation of the extinction coefficients of all images in a single solve. The solve is not split up between
+        processes, see calc_and_set_coefficients.
+
+        :param cores: Number of cores to use. Not used.
+        :type cores: int
+        """
+        self.calc_and_set_coefficients()
+
+    def calc_coefficients_of_img(self, rel_intensities: np.ndarray) -> np.ndarray:
+        """
+        Calculate the extinction coefficients for a single image.
+
+        :param rel_intensities: Array of relative change in intensity of every LED.
+        :return: Array of the computed extinction coefficients
+        :rtype: np.ndarray
+        """
+        return self.calc_coefficients_of_imgs(rel_intensities[np.newaxis, :])[0]
+
+    def calc_coefficients_of_imgs(self, rel_intensities: np.ndarray) -> np.ndarray:
+        """
+        Calculate the extinction coefficients of several images. Like in ExtinctionCoefficientsNumeric, the
+        coefficients of every image are returned from the top to the bottom layer.
+
+        :param rel_intensities: Relative change in intensity of every image and LED.
+        :type rel_intensities: np.ndarray
+        :return: Extinction coefficients of every image and layer.
+        :rtype: np.ndarray
+        """
+        if self.factorization is None:
+            self.factor_normal_equations()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            optical_depths = -np.log(rel_intensities)
+        distances = self.distances_per_led_and_layer
+        complete = np.all(np.isfinite(optical_depths), axis=1)
+
+        kappas = cho_solve(self.factorization, distances.T @ np.where(complete[:, np.newaxis], optical_depths, 0).T).T
+        lower, upper = self.bounds
+        for img in np.flatnonzero(~complete | np.any((kappas < lower) | (kappas > upper), axis=1)):
+            kappas[img] = self._solve_bounded(optical_depths[img])
+        return np.flip(kappas, axis=1)
+
+    def _solve_bounded(self, optical_depths: np.ndarray) -> np.ndarray:
+        """
+        Solve the regularized least squares problem of a single image within the bounds, using only the LEDs with a
+        finite optical depth.
+
+        :param optical_depths: Negative logarithm of the relative change in intensity of every LED.
+        :type optical_depths: np.ndarray
+        :return: Extinction coefficients of every layer, from the bottom to the top layer.
+        :rtype: np.ndarray
+        """
+        valid = np.isfinite(optical_depths)
+        matrix = np.vstack([self.distances_per_led_and_layer[valid],
+                            np.sqrt(self.weighting_tikhonov) * self.regularization_matrix])
+        rhs = np.concatenate([optical_depths[valid], np.zeros(self.regularization_matrix.shape[0])])
+        return lsq_linear(matrix, rhs, bounds=self.bounds).x
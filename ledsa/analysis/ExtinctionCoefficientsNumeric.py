@@ -1,8 +1,11 @@
+from typing import List, Optional, Tuple
+
 import numpy as np
 from scipy.optimize import minimize
 
 from ledsa.analysis.Experiment import Experiment, Layers, Camera
 from ledsa.analysis.ExtinctionCoefficients import ExtinctionCoefficients
+from ledsa.analysis.ExtinctionCoefficientsLinear import ExtinctionCoefficientsLinear
 
 
 class ExtinctionCoefficientsNumeric(ExtinctionCoefficients):
@@ -17,13 +20,16 @@ class ExtinctionCoefficientsNumeric(ExtinctionCoefficients):
     :vartype weighting_curvature: float
     :ivar num_iterations: Maximum number of iterations of the numerical solver.
     :vartype num_iterations: int
+    :ivar linear_seeds: Flag to start the chunks of images of calc_and_set_coefficients_mp from the solution of the
+        linear solver. Otherwise, the first image of every chunk starts from zero.
+    :vartype linear_seeds: bool
     :ivar type: Type of method.
     :vartype type: str
     """
     def __init__(self, experiment=Experiment(layers=Layers(20, 1.0, 3.35), camera=Camera(pos_x=4.4, pos_y=2, pos_z=2.3),
                                              led_array=3, channel=0),
                  reference_property='sum_col_val', num_ref_imgs=10, average_images=False, weighting_curvature=1e-6,
-                 weighting_preference=-6e-3, num_iterations=200):
+                 weighting_preference=-6e-3, num_iterations=200, linear_seeds=True):
         """
         :param experiment: Object representing the experimental setup.
         :type experiment: Experiment
@@ -39,6 +45,9 @@ class ExtinctionCoefficientsNumeric(ExtinctionCoefficients):
         :type weighting_preference: float
         :param num_iterations: Maximum number of iterations of the numerical solver.
         :type num_iterations: int
+        :param linear_seeds: Flag to start the chunks of images of calc_and_set_coefficients_mp from the solution of
+            the linear solver. Otherwise, the first image of every chunk starts from zero.
+        :type linear_seeds: bool
         """
 
         super().__init__(experiment, reference_property, num_ref_imgs, average_images)
@@ -46,6 +55,7 @@ class ExtinctionCoefficientsNumeric(ExtinctionCoefficients):
         self.weighting_preference = weighting_preference
         self.weighting_curvature = weighting_curvature
         self.num_iterations = num_iterations
+        self.linear_seeds = linear_seeds
         self.type = 'numeric'
 
     def calc_coefficients_of_img(self, rel_intensities: np.ndarray) -> np.ndarray:
@@ -59,17 +69,38 @@ class ExtinctionCoefficientsNumeric(ExtinctionCoefficients):
         if len(self.coefficients_per_image_and_layer) == 0:
             kappa0 = np.zeros(self.experiment.layers.amount)
         else:
-            kappa0 = self.coefficients_per_image_and_layer[-1]
-        fit = minimize(self.cost_function, kappa0, args=rel_intensities,
-                       method='TNC', bounds=tuple(self.bounds),
-                       options={'maxfun': self.num_iterations, 'gtol': 1e-5, 'disp': False})
+            kappa0 = np.flip(self.coefficients_per_image_and_layer[-1])
+        # TNC stops early on the non-smooth cost when it is given the exact gradient. L-BFGS-B converges with it, but
+        # the projected gradient stays large along the kinks, so it stops on the reduction of the cost. This reduction
+        # is compared to max(|cost|, 1) and the cost is of the order 1e-3, hence the small ftol.
+        fit = minimize(self.cost_function_and_gradient, kappa0, args=rel_intensities, jac=True,
+                       method='L-BFGS-B', bounds=tuple(self.bounds),
+                       options={'maxfun': self.num_iterations, 'gtol': 1e-5, 'ftol': 1e-16})
         print(fit.message)
         kappas = np.flip(fit.x)
         return kappas
 
+    def calc_chunk_seeds(self, rel_intensities: np.ndarray) -> List[Optional[np.ndarray]]:
+        """
+        Calculate the coefficients the first images of the chunks of calc_and_set_coefficients_mp start from.
+        If linear_seeds is set, these are the solutions of ExtinctionCoefficientsLinear.
+
+        :param rel_intensities: Relative change in intensity of every LED in the first image of every chunk.
+        :type rel_intensities: np.ndarray
+        :return: Seed of every chunk or None.
+        :rtype: List[Optional[np.ndarray]]
+        """
+        if not self.linear_seeds:
+            return super().calc_chunk_seeds(rel_intensities)
+        linear_solver = ExtinctionCoefficientsLinear(self.experiment, self.reference_property, self.num_ref_imgs)
+        linear_solver.bounds = self.bounds[0]
+        linear_solver.distances_per_led_and_layer = self.distances_per_led_and_layer
+        return list(linear_solver.calc_coefficients_of_imgs(rel_intensities))
+
     def calc_intensities(self, kappas: np.ndarray) -> np.ndarray:
         """
-        Calculate the intensities from a given set of extinction coefficients.
+        Calculate the intensities from a given set of extinction coefficients as exp(-D @ kappas), with D the distances
+        traversed between camera and LEDs in each layer.
         Is called in the minimization of the cost function.
 
         :param kappas: An array of extinction coefficients.
@@ -77,14 +108,7 @@ class ExtinctionCoefficientsNumeric(ExtinctionCoefficients):
         :return: An array of the calculated intensities.
         :rtype: np.ndarray
         """
-        n_leds = self.experiment.led_number
-        intensities = np.zeros(n_leds)
-        for led in range(n_leds):
-            intensity = 1.0
-            for layer in range(len(self.distances_per_led_and_layer[led, :])):
-                intensity = intensity * np.exp(-kappas[layer] * self.distances_per_led_and_layer[led, layer])
-            intensities[led] = intensity
-        return intensities
+        return np.exp(-self.distances_per_led_and_layer @ kappas)
 
     def cost_function(self, kappas: np.ndarray, target: np.ndarray) -> float:
         """
@@ -99,9 +123,37 @@ class ExtinctionCoefficientsNumeric(ExtinctionCoefficients):
         :return: Computed cost.
         :rtype: float
         """
-        intensities = self.calc_intensities(kappas)
-        rmse = np.sqrt(np.sum((intensities - target) ** 2)) / len(intensities)
-        curvature = np.sum(np.abs(kappas[0:-2] - 2 * kappas[1:-1] + kappas[2:])) * len(
-            intensities) * 2 * self.weighting_curvature
+        return self.cost_function_and_gradient(kappas, target)[0]
+
+    def cost_function_and_gradient(self, kappas: np.ndarray, target: np.ndarray) -> Tuple[float, np.ndarray]:
+        """
+        Calculate the cost, see cost_function, and its gradient with respect to the extinction coefficients.
+        With the intensities I = exp(-D @ kappas), the gradient of the rmse is -D^T ((I - target) I) / (n ||I - target||).
+        The curvature term is differentiated where the second differences of the coefficients are not zero.
+
+        :param kappas: Extinction coefficients.
+        :type kappas: np.ndarray
+        :param target: Target intensities.
+        :type target: np.ndarray
+        :return: Computed cost and its gradient.
+        :rtype: Tuple[float, np.ndarray]
+        """
+        distances = self.distances_per_led_and_layer
+        intensities = np.exp(-distances @ kappas)
+        n_leds = len(intensities)
+        residuals = intensities - target
+        norm = np.sqrt(np.dot(residuals, residuals))
+        rmse = norm / n_leds
+        second_differences = kappas[0:-2] - 2 * kappas[1:-1] + kappas[2:]
+        curvature_weight = n_leds * 2 * self.weighting_curvature
+        curvature = np.sum(np.abs(second_differences)) * curvature_weight
         preference = np.sum(kappas) / len(kappas) * self.weighting_preference
-        return rmse + curvature + preference
+
+        gradient = np.full(len(kappas), self.weighting_preference / len(kappas))
+        if norm > 0:
+            gradient -= distances.T @ (residuals * intensities) / (n_leds * norm)
+        signs = np.sign(second_differences) * curvature_weight
+        gradient[0:-2] += signs
+        gradient[1:-1] -= 2 * signs
+        gradient[2:] += signs
+        return rmse + curvature + preference, gradient
@@ -19,7 +19,7 @@ def apply_color_correction(cc_matrix: np.ndarray, on='sum_col_val', channels=(0,
     quantity = on
     fit_params_list = []
     for channel in channels:
-        fit_parameters = read_hdf(channel)[quantity]
+        fit_parameters = read_hdf(channel, columns=[quantity])[quantity]
         fit_params_list.append(fit_parameters)
     raw_val_array = pd.concat(fit_params_list, axis=1)
     cc_val_array = np.dot(cc_matrix_inv, raw_val_array.T).T
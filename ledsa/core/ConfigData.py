@@ -16,7 +16,11 @@ class ConfigData(cp.ConfigParser):
                  time_diff_to_image_time=None, img_name_string=None, img_number_overflow=None,
                  first_img_experiment=None, last_img_experiment=None, reference_img=None, ignore_indices=None,
                  line_edge_indices=None, line_edge_coordinates=None, first_img_analysis=None, last_img_analysis=None,
-                 skip_imgs=0, skip_leds=0, merge_led_arrays=None):  # TODO: merge LED arrays
+                 skip_imgs=0, skip_leds=0, merge_led_arrays=None, bayer_planes=False,
+                 average_greens=True, num_prefetch_imgs=0,
+                 cache_rois=False, fit_solver='nelder-mead', warm_start_fits=False,
+                 fit_mode='full', num_ref_imgs=10, template_fit_shift=False,
+                 result_format='csv', pool_mode='map', pool_chunksize=1):  # TODO: merge LED arrays
         """
         :param load_config_file: Determines whether to load the config file on initialization. Defaults to True.
         :type load_config_file: bool
@@ -66,6 +70,37 @@ class ConfigData(cp.ConfigParser):
         :type skip_leds: int
         :param merge_led_arrays: Flag to merge LED arrays for analysis. Defaults to None. TODO: not a flag but list of arrays to merge?
         :type merge_led_arrays: bool or None
+        :param bayer_planes: Analyse RAW images on the half-resolution Bayer plane of each channel. The LED centers are given in image pixels, the fit parameters x, y, dx, dy, wx and wy in pixels of the plane. Defaults to False.
+        :type bayer_planes: bool
+        :param average_greens: Average both green Bayer planes if bayer_planes is True. Defaults to True.
+        :type average_greens: bool
+        :param num_prefetch_imgs: Number of images read in the background during the analysis. Defaults to 0.
+        :type num_prefetch_imgs: int
+        :param cache_rois: Store and reuse the windows around all LEDs of every analysed image. Defaults to False.
+        :type cache_rois: bool
+        :param fit_solver: Solver used to fit the LED model, 'nelder-mead', 'least_squares' or 'batched' to fit all LEDs
+            of an image simultaneously. Defaults to 'nelder-mead'.
+        :type fit_solver: str
+        :param warm_start_fits: Start the fit of every LED from its result of the previous image. Defaults to False.
+        :type warm_start_fits: bool
+        :param fit_mode: 'full' to fit all LED parameters on every image or 'template' to fit only the amplitude of a
+            shape template created from the reference images. Defaults to 'full'.
+        :type fit_mode: str
+        :param num_ref_imgs: Number of reference images used to create the LED shape templates. Defaults to 10.
+        :type num_ref_imgs: int
+        :param template_fit_shift: Fit the LED center in addition to the amplitude in the template fit mode. Defaults
+            to False.
+        :type template_fit_shift: bool
+        :param result_format: 'csv' to write one result file per image and channel or 'hdf' to append the results of
+            all images to one HDF5 table per channel. Defaults to 'csv'.
+        :type result_format: str
+        :param pool_mode: 'map' to let every worker process write its own result files, or return its results to the
+            main process if result_format is 'hdf', or 'stream' to send the state of the analysis to every worker once
+            and persist the results streamed back by the workers in the main process. Defaults to 'map'.
+        :type pool_mode: str
+        :param pool_chunksize: Number of images sent to a worker at once in the stream pool mode and, with prefetching
+            or warm starts, in the map pool mode if result_format is 'hdf'. Defaults to 1.
+        :type pool_chunksize: int
         """
         cp.ConfigParser.__init__(self, allow_no_value=True)
         if load_config_file:
@@ -126,6 +161,44 @@ class ConfigData(cp.ConfigParser):
             self['analyse_photo']['   skip_imgs'] = str(skip_imgs)
             self.set('analyse_photo', '   # Will only fit leds with id dividable by skip_leds + 1. Used for testing')
             self['analyse_photo']['   skip_leds'] = str(skip_leds)
+            self.set('analyse_photo', '   # Analyse RAW images on the packed half-resolution Bayer plane of each channel')
+            self.set('analyse_photo', '   # LED centers are given in image pixels, the fit parameters x, y, dx, dy, wx, wy in pixels of the plane')
+            self['analyse_photo']['   bayer_planes'] = str(bayer_planes)
+            self.set('analyse_photo', '   # Use the average of both green Bayer planes for the green channel')
+            self['analyse_photo']['   average_greens'] = str(average_greens)
+            self.set('analyse_photo', '   # Number of images read in the background while the current image is analysed')
+            self['analyse_photo']['   num_prefetch_imgs'] = str(num_prefetch_imgs)
+            self.set('analyse_photo', '   # Store the windows around all LEDs in analysis/roi_cache and reuse them in '
+                                      'later runs')
+            self['analyse_photo']['   cache_rois'] = str(cache_rois)
+            self.set('analyse_photo', '   # Solver to fit the LED model, nelder-mead, least_squares with analytic '
+                                      'Jacobian')
+            self.set('analyse_photo', '   # or batched to fit all LEDs of an image simultaneously')
+            self['analyse_photo']['   fit_solver'] = str(fit_solver)
+            self.set('analyse_photo', '   # Start the fit of every LED from its result of the previous image. With '
+                                      'multiple')
+            self.set('analyse_photo', '   # cores, every core processes a contiguous chunk of images')
+            self['analyse_photo']['   warm_start_fits'] = str(warm_start_fits)
+            self.set('analyse_photo', '   # full: fit all LED parameters on every image, template: fit only the '
+                                      'amplitude of an LED')
+            self.set('analyse_photo', '   # shape template created from the first num_ref_imgs images')
+            self['analyse_photo']['   fit_mode'] = str(fit_mode)
+            self['analyse_photo']['   num_ref_imgs'] = str(num_ref_imgs)
+            self.set('analyse_photo', '   # Fit the LED center in addition to the amplitude in the template fit mode')
+            self['analyse_photo']['   template_fit_shift'] = str(template_fit_shift)
+            self.set('analyse_photo', '   # csv: one result file per image and channel, hdf: append the results of all '
+                                      'images')
+            self.set('analyse_photo', '   # to analysis/channel<c>/all_parameters.h5, which is read without conversion')
+            self['analyse_photo']['   result_format'] = str(result_format)
+            self.set('analyse_photo', '   # map: every worker process writes its own result files, with result_format '
+                                      'hdf it returns')
+            self.set('analyse_photo', '   # the results of its images to the main process, in chunks of pool_chunksize '
+                                      'images with')
+            self.set('analyse_photo', '   # prefetching or warm starts, stream: the results are streamed back in '
+                                      'chunks of')
+            self.set('analyse_photo', '   # pool_chunksize images and written by the main process')
+            self['analyse_photo']['   pool_mode'] = str(pool_mode)
+            self['analyse_photo']['   pool_chunksize'] = str(pool_chunksize)
 
             with open('config.ini', 'w') as configfile:
                 self.write(configfile)
@@ -0,0 +1,116 @@
+import os
+from typing import Dict
+
+import numpy as np
+
+from ledsa.core.file_handling import read_table
+
+
+class ImageCatalogue:
+    """
+    In-memory index of the images of an analysis, loaded once from 'image_infos_analysis.csv'.
+    Offers constant time lookups of image ids, names and experiment times.
+
+    :ivar img_ids: IDs of all images.
+    :vartype img_ids: np.ndarray
+    :ivar img_names: Names of all images, ordered like img_ids.
+    :vartype img_names: np.ndarray
+    :ivar capture_times: Capture times of all images, ordered like img_ids.
+    :vartype capture_times: np.ndarray
+    :ivar experiment_times: Experiment times of all images in seconds, ordered like img_ids.
+    :vartype experiment_times: np.ndarray
+    """
+    def __init__(self, file_path=os.path.join('analysis', 'image_infos_analysis.csv')):
+        """
+        :param file_path: Path of the image infos. Defaults to 'analysis/image_infos_analysis.csv'.
+        :type file_path: str
+        """
+        infos = read_table(file_path, ',', 'str', silent=True, atleast_2d=True)
+        self.img_ids = infos[:, 0].astype(int)
+        self.img_names = infos[:, 1]
+        self.capture_times = infos[:, 2]
+        self.experiment_times = infos[:, 3].astype(float)
+        self._idx_of_id: Dict[int, int] = {img_id: idx for idx, img_id in enumerate(self.img_ids)}
+        self._idx_of_name: Dict[str, int] = {img_name: idx for idx, img_name in enumerate(self.img_names)}
+
+    def __len__(self) -> int:
+        """
+        :return: The number of images.
+        :rtype: int
+        """
+        return len(self.img_ids)
+
+    def get_img_name(self, img_id) -> str:
+        """
+        Retrieves the name of the image with the given ID.
+
+        :param img_id: The ID of the image.
+        :type img_id: int or str
+        :return: The name of the image.
+        :rtype: str
+        :raises NameError: If no image name is found for the provided ID.
+        """
+        return self.img_names[self._get_idx_of_id(img_id)]
+
+    def get_img_id(self, img_name: str) -> int:
+        """
+        Retrieves the ID of the image with the given name.
+
+        :param img_name: The name of the image.
+        :type img_name: str
+        :return: The ID of the image.
+        :rtype: int
+        :raises NameError: If no image ID is found for the provided image name.
+        """
+        try:
+            return int(self.img_ids[self._idx_of_name[img_name]])
+        except KeyError:
+            raise NameError("Could not find an image id for {}.".format(img_name))
+
+    def get_experiment_time(self, img_id) -> float:
+        """
+        Retrieves the experiment time of the image with the given ID.
+
+        :param img_id: The ID of the image.
+        :type img_id: int or str
+        :return: The experiment time in seconds.
+        :rtype: float
+        :raises NameError: If no image is found for the provided ID.
+        """
+        return self.experiment_times[self._get_idx_of_id(img_id)]
+
+    def _get_idx_of_id(self, img_id) -> int:
+        """
+        :param img_id: The ID of the image.
+        :type img_id: int or str
+        :return: Row of the image in the image infos.
+        :rtype: int
+        :raises NameError: If no image is found for the provided ID.
+        """
+        try:
+            return self._idx_of_id[int(img_id)]
+        except KeyError:
+            raise NameError("Could not find an image name to id {}.".format(img_id))
+
+
+_catalogues: Dict[str, tuple] = {}
+
+
+def get_image_catalogue(path='.') -> ImageCatalogue:
+    """
+    Get the image catalogue of the analysis in the given directory. The catalogue is loaded once per process and only
+    loaded again if 'image_infos_analysis.csv' was rewritten since.
+
+    :param path: Directory path of the experiment, defaults to the current directory.
+    :type path: str
+    :return: The image catalogue.
+    :rtype: ImageCatalogue
+    """
+    file_path = os.path.abspath(os.path.join(path, 'analysis', 'image_infos_analysis.csv'))
+    stat = os.stat(file_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _catalogues.get(file_path)
+    if cached is None or cached[0] != version:
+        cached = (version, ImageCatalogue(file_path))
+        _catalogues[file_path] = cached
+    return cached[1]
@@ -0,0 +1,162 @@
+import json
+import os
+from typing import List
+
+import numpy as np
+
+from ledsa.core.ImageCatalogue import get_image_catalogue
+from ledsa.core.file_handling import read_hdf
+
+
+def get_result_cube_path(channel: int, path='.') -> str:
+    """
+    Get the path of the result cube of a channel. The metadata is stored next to it with the extension '.json'.
+
+    :param channel: The color channel.
+    :type channel: int
+    :param path: Directory path of the experiment, defaults to the current directory.
+    :type path: str
+    :return: Path of the result cube.
+    :rtype: str
+    """
+    return os.path.join(path, 'analysis', f'channel{channel}', 'all_parameters_cube.npy')
+
+
+def export_result_cube(channel: int, path='.', quantities=None) -> None:
+    """
+    Export the results of a channel from its HDF file to a dense cube with an image, a LED and a quantity axis.
+    The cube is written as a NumPy file which can be memory-mapped, the LEDs are sorted by LED array and id so that
+    the LEDs of every LED array form a contiguous block. Values of images or LEDs without results are NaN.
+
+    :param channel: The color channel.
+    :type channel: int
+    :param path: Directory path of the experiment, defaults to the current directory.
+    :type path: str
+    :param quantities: Quantities to export. Defaults to None, exporting all columns besides 'line'.
+    :type quantities: List[str], optional
+    """
+    fit_parameters = read_hdf(channel, path=path, columns=None if quantities is None else ['line'] + list(quantities))
+    fit_parameters = fit_parameters.reset_index()
+    if quantities is None:
+        quantities = [column for column in fit_parameters.columns if column not in ['img_id', 'led_id', 'line']]
+
+    img_ids = np.unique(fit_parameters['img_id'].to_numpy())
+    leds = fit_parameters[['led_id', 'line']].drop_duplicates('led_id').sort_values(['line', 'led_id'])
+    led_ids = leds['led_id'].to_numpy()
+    row_of_led = np.empty(led_ids.max() + 1, dtype=int)
+    row_of_led[led_ids] = np.arange(led_ids.shape[0])
+    try:
+        img_catalogue = get_image_catalogue(path)
+        experiment_times = [float(img_catalogue.get_experiment_time(img_id)) for img_id in img_ids]
+    except (OSError, NameError):
+        experiment_times = [None] * img_ids.shape[0]
+
+    cube_path = get_result_cube_path(channel, path)
+    tmp_cube_path = cube_path + '.tmp.npy'
+    cube = np.lib.format.open_memmap(tmp_cube_path, mode='w+', dtype=np.float64,
+                                     shape=(img_ids.shape[0], led_ids.shape[0], len(quantities)))
+    cube[:] = np.nan
+    img_rows = np.searchsorted(img_ids, fit_parameters['img_id'].to_numpy())
+    led_rows = row_of_led[fit_parameters['led_id'].to_numpy()]
+    cube[img_rows, led_rows] = fit_parameters[quantities].to_numpy(dtype=np.float64)
+    cube.flush()
+    del cube
+
+    metadata = {'quantities': list(quantities), 'img_ids': img_ids.tolist(), 'experiment_times': experiment_times,
+                'led_ids': led_ids.tolist(), 'lines': leds['line'].astype(int).tolist()}
+    with open(os.path.splitext(tmp_cube_path)[0] + '.json', 'w') as metadata_file:
+        json.dump(metadata, metadata_file)
+    os.replace(os.path.splitext(tmp_cube_path)[0] + '.json', os.path.splitext(cube_path)[0] + '.json')
+    os.replace(tmp_cube_path, cube_path)
+
+
+def get_result_cube(channel: int, path='.') -> 'ResultCube':
+    """
+    Get the result cube of a channel. The cube is exported first if it does not exist or if the HDF file of the
+    channel was written after it.
+
+    :param channel: The color channel.
+    :type channel: int
+    :param path: Directory path of the experiment, defaults to the current directory.
+    :type path: str
+    :return: The result cube.
+    :rtype: ResultCube
+    """
+    cube_path = get_result_cube_path(channel, path)
+    hdf_path = os.path.join(path, 'analysis', f'channel{channel}', 'all_parameters.h5')
+    if not os.path.exists(cube_path) or os.path.getmtime(cube_path) < os.path.getmtime(hdf_path):
+        export_result_cube(channel, path)
+    return ResultCube(channel, path)
+
+
+class ResultCube:
+    """
+    Read-only, memory-mapped view of the results of a channel as exported by export_result_cube.
+    Slices of the cube are views of the file, so that processes analysing the same channel share its pages.
+
+    :ivar data: Values with the axes image, LED and quantity.
+    :vartype data: np.memmap
+    :ivar quantities: Names of the quantities.
+    :vartype quantities: List[str]
+    :ivar img_ids: IDs of the images.
+    :vartype img_ids: np.ndarray
+    :ivar experiment_times: Experiment times of the images in seconds, NaN if unknown.
+    :vartype experiment_times: np.ndarray
+    :ivar led_ids: IDs of the LEDs, sorted by LED array and id.
+    :vartype led_ids: np.ndarray
+    :ivar lines: LED array of every LED.
+    :vartype lines: np.ndarray
+    """
+    def __init__(self, channel: int, path='.'):
+        """
+        :param channel: The color channel.
+        :type channel: int
+        :param path: Directory path of the experiment, defaults to the current directory.
+        :type path: str
+        """
+        cube_path = get_result_cube_path(channel, path)
+        with open(os.path.splitext(cube_path)[0] + '.json') as metadata_file:
+            metadata = json.load(metadata_file)
+        self.data = np.load(cube_path, mmap_mode='r')
+        self.quantities: List[str] = metadata['quantities']
+        self.img_ids = np.array(metadata['img_ids'], dtype=int)
+        self.experiment_times = np.array(metadata['experiment_times'], dtype=float)
+        self.led_ids = np.array(metadata['led_ids'], dtype=int)
+        self.lines = np.array(metadata['lines'], dtype=int)
+
+    def get_line_slice(self, line: int) -> slice:
+        """
+        Get the slice of the LED axis holding the LEDs of a LED array.
+
+        :param line: The LED array.
+        :type line: int
+        :return: Slice of the LEDs of the LED array.
+        :rtype: slice
+        """
+        return slice(np.searchsorted(self.lines, line, 'left'), np.searchsorted(self.lines, line, 'right'))
+
+    def get_values(self, quantity: str, line=None) -> np.ndarray:
+        """
+        Get the values of a quantity of all images, without copying them.
+
+        :param quantity: Name of the quantity.
+        :type quantity: str
+        :param line: LED array whose LEDs are selected. Defaults to None, selecting all LEDs.
+        :type line: int, optional
+        :return: View of the values with the axes image and LED.
+        :rtype: np.ndarray
+        :raises ValueError: If the quantity is not in the cube.
+        """
+        leds = slice(None) if line is None else self.get_line_slice(line)
+        return self.data[:, leds, self.quantities.index(quantity)]
+
+    def get_led_ids(self, line=None) -> np.ndarray:
+        """
+        Get the IDs of the LEDs along the LED axis of get_values.
+
+        :param line: LED array whose LEDs are selected. Defaults to None, selecting all LEDs.
+        :type line: int, optional
+        :return: IDs of the LEDs.
+        :rtype: np.ndarray
+        """
+        return self.led_ids if line is None else self.led_ids[self.get_line_slice(line)]
@@ -0,0 +1,103 @@
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# columns of the results of every LED, the fit columns are only written if the LEDs are fitted
+STATISTICS_COLUMNS = [('img_id', np.int64), ('led_id', np.int64), ('line', np.int64), ('sum_col_val', np.float64),
+                      ('mean_col_val', np.float64), ('max_col_val', np.float64)]
+FIT_COLUMNS = [('led_center_x', np.float64), ('led_center_y', np.float64), ('x', np.float64), ('y', np.float64),
+               ('dx', np.float64), ('dy', np.float64), ('A', np.float64), ('alpha', np.float64), ('wx', np.float64),
+               ('wy', np.float64), ('fit_success', np.bool_), ('fit_fun', np.float64), ('fit_nfev', np.int64),
+               ('fit_time', np.float64)]
+# columns the tables are indexed by, reads of the tables can be filtered by these columns on disk
+QUERYABLE_COLUMNS = ['img_id', 'led_id', 'line']
+
+
+def get_result_dtype(fit_leds: bool) -> np.dtype:
+    """
+    Get the structured data type of the results of the LEDs of an image.
+
+    :param fit_leds: Whether the results contain the fit parameters.
+    :type fit_leds: bool
+    :return: The data type.
+    :rtype: np.dtype
+    """
+    return np.dtype(STATISTICS_COLUMNS + FIT_COLUMNS if fit_leds else STATISTICS_COLUMNS)
+
+
+def get_result_store_path(channel: int, path='.') -> str:
+    """
+    Get the path of the result store of a channel.
+
+    :param channel: The color channel.
+    :type channel: int
+    :param path: Directory path of the experiment, defaults to the current directory.
+    :type path: str
+    :return: Path of the result store.
+    :rtype: str
+    """
+    return os.path.join(path, 'analysis', f'channel{channel}', 'all_parameters.h5')
+
+
+class ResultStore:
+    """
+    Appends the results of the analysed images as typed rows to one chunked HDF5 table per channel.
+    The tables are stored as 'all_parameters.h5' and are read by read_hdf without a conversion step. The rows are
+    appended in the order the images are processed, read_hdf sorts them by image and LED id.
+    Only a single process may write to the result store at a time.
+
+    :ivar channels: Channels the results are stored for.
+    :vartype channels: List[int]
+    """
+    def __init__(self, channels: List[int], path='.'):
+        """
+        Opens the tables of all channels. Existing tables are continued, unless their columns differ from the
+        results appended, e.g. after a restart with another fit mode. They are replaced then.
+
+        :param channels: Channels the results are stored for.
+        :type channels: List[int]
+        :param path: Directory path of the experiment, defaults to the current directory.
+        :type path: str
+        """
+        self.channels = list(channels)
+        self._stores = {channel: pd.HDFStore(get_result_store_path(channel, path), mode='a')
+                        for channel in self.channels}
+        self._checked_channels = set()
+
+    def __enter__(self) -> 'ResultStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def append(self, img_id: int, channel: int, results: np.ndarray) -> None:
+        """
+        Append the results of the LEDs of an image and flush them to the file.
+
+        :param img_id: Identifier of the image. Overrides the img_id field of the results.
+        :type img_id: int
+        :param channel: Color channel of the results.
+        :type channel: int
+        :param results: Structured array of the results with a data type as returned by get_result_dtype.
+        :type results: np.ndarray
+        """
+        results = np.array(results, dtype=results.dtype)
+        results['img_id'] = img_id
+        store = self._stores[channel]
+        if channel not in self._checked_channels:
+            if 'table' in store and list(store.select('table', stop=0).columns) != list(results.dtype.names):
+                store.remove('table')
+            self._checked_channels.add(channel)
+        store.append('table', pd.DataFrame(results), format='table', index=False, data_columns=QUERYABLE_COLUMNS)
+        store.flush()
+
+    def close(self) -> None:
+        """
+        Index the queryable columns of the tables of all channels and close the tables.
+        """
+        for store in self._stores.values():
+            if 'table' in store:
+                store.create_table_index('table', columns=QUERYABLE_COLUMNS, optlevel=9, kind='full')
+            store.close()
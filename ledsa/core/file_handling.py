@@ -1,20 +1,21 @@
 import os
-from typing import List, Union
+from typing import List, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
 import ledsa.core
 from ledsa.core.ConfigData import ConfigData
+from ledsa.core.ResultStore import QUERYABLE_COLUMNS
 
 
 def create_analysis_infos_avg():  # TODO: Move funtion somewhere else
     n_summarize = 2
     n_skip_images = 10
-    in_file_path = os.path.join('analysis', 'image_infos_analysis.csv')
-    image_infos = pd.read_csv(in_file_path)
-    img_names = image_infos['Name'].tolist()
-    exp_time = image_infos['Experiment_Time[s]']
+    from ledsa.core.ImageCatalogue import get_image_catalogue
+    img_catalogue = get_image_catalogue()
+    img_names = img_catalogue.img_names.tolist()
+    exp_time = pd.Series(img_catalogue.experiment_times)
     head_img_names = img_names[:n_skip_images]
     head_exp_times = exp_time[:n_skip_images]
     tail_img_names = img_names[n_skip_images:]
@@ -73,25 +74,35 @@ def read_table(filename: str, delim=' ', dtype='float', atleast_2d=False, silent
     return np.atleast_1d(data)
 
 
-def read_hdf(channel: int, path='.') -> pd.DataFrame:
+def read_hdf(channel: int, path='.', columns=None, line=None, img_id_range=None) -> pd.DataFrame:
     """
-    Reads data from an HDF file for a given channel. If the binary does not exist, it is created.
+    Reads data from an HDF file for a given channel. If the binary does not exist, it is created. If CSV files of
+    results were written after the binary, it is updated with them, otherwise the binary is only read.
+    The selection of columns, LED array and images is applied while reading the table, so that only the selected data
+    is read from disk.
 
     :param channel: Channel number for which data is to be read.
     :type channel: int
     :param path: Directory path where the HDF is stored, defaults to the current directory.
     :type path: str
+    :param columns: Columns to read. Defaults to None, reading all columns.
+    :type columns: List[str], optional
+    :param line: LED array whose LEDs are read. Defaults to None, reading all LED arrays.
+    :type line: int, optional
+    :param img_id_range: First and last ID of the images to read, either may be None. Defaults to None, reading all
+        images.
+    :type img_id_range: Tuple[int, int], optional
     :return: DataFrame with multi-index 'img_id' and 'led_id'.
     :rtype: pd.DataFrame
 
     :raises FileNotFoundError: If the HDF file is not found.
     """
     file_path = os.path.join(path, 'analysis', f'channel{channel}','all_parameters.h5',)
-    try:
-        fit_parameters = pd.read_hdf(file_path, 'table' )
-    except FileNotFoundError:
+    if not os.path.exists(file_path):
+        create_binary_data(channel)
+    elif os.path.samefile(path, '.') and _result_files_modified_since(channel, os.stat(file_path).st_mtime_ns):
         create_binary_data(channel)
-        fit_parameters = pd.read_hdf(file_path, 'table')
+    fit_parameters = _read_parameter_table(file_path, path, columns, line, img_id_range)
     fit_parameters.set_index(['img_id', 'led_id'], inplace=True)
     return fit_parameters
 
@@ -111,10 +122,10 @@ def read_hdf_avg(channel: int, path='.') -> pd.DataFrame:
     """
     file_path = os.path.join(path, 'analysis', f'channel{channel}','all_parameters.h5',)
     try:
-        fit_parameters = pd.read_hdf(file_path, 'table')
+        fit_parameters = _read_parameter_table(file_path, path)
     except FileNotFoundError:
         average_all_fitpar(channel)
-        fit_parameters = pd.read_hdf(file_path, 'table')
+        fit_parameters = _read_parameter_table(file_path, path)
     fit_parameters.set_index(['img_id', 'led_id'], inplace=True)
     return fit_parameters
 
@@ -156,35 +167,38 @@ def average_all_fitpar(channel, n_summarize=2, num_ref_imgs=10) -> None:  # TODO
 def extend_hdf(channel: int, quantity: str, values: np.ndarray) -> None:
     """
     Extends existing binary HDF file by adding new data columns.
+    Every added column is stored as a separate table with the image and LED id of every value, next to the table of
+    the parameters, which is not rewritten. Adding a column again replaces it.
 
     :param channel: Channel number for which the HDF is to be read extended.
     :type channel: int
     :param quantity: New column name to add.
     :type quantity: str
-    :param values: Data values for the new column.
+    :param values: Data values for the new column, in the order of the rows returned by read_hdf.
     :type values:  np.ndarray
     """
     file = os.path.join('analysis', f'channel{channel}', 'all_parameters.h5')
-    fit_parameters = pd.read_hdf(file, 'table')
-    fit_parameters[quantity] = values
-    fit_parameters.to_hdf(file, 'table')
+    derived_column = _read_parameter_table(file, columns=[])
+    derived_column[quantity] = values
+    with pd.HDFStore(file, mode='a') as store:
+        store.put(f'derived/{quantity}', derived_column, format='table', index=False, data_columns=['img_id'])
 
 
 def create_binary_data(channel: int) -> None:
     """
-    Creates binary file from the CSV files for a specified channel and writes to an HDF file.
+    Creates or updates the binary file of a specified channel from the CSV files of the analysed images.
+    The IDs of the images already in the binary file are stored alongside the table, only the CSV files of the other
+    images are read and their rows are appended. The rows are kept in the order of image and LED id. Images without a
+    CSV file which precede an analysed image are written with NaN values.
 
     :param channel: Channel number for which binary data is to be created.
     :type channel: int
     """
     config = ConfigData()
-    columns = _get_column_names(channel)
-
-    fit_params_list = []
-
-    fit_params = pd.DataFrame(columns=columns)
+    out_file_path = os.path.join('analysis', f'channel{channel}', 'all_parameters.h5')
+    ingested_img_ids, missing_img_ids = _read_ingest_record(out_file_path)
 
-    # find time and fit parameter for every image
+    # find time and fit parameter for every image not ingested yet
 
     first_img = int(config['analyse_photo']['first_img'])
     last_img = int(config['analyse_photo']['last_img'])
@@ -195,53 +209,258 @@ def create_binary_data(channel: int) -> None:
         max_id = 10 ** 7
     number_of_images = (max_id + last_img - first_img) % max_id + 1
     number_of_images //= int(config['analyse_photo']['skip_imgs']) + 1
-    print('Loading fit parameters...')
-    exception_counter = 0
-    for image_id in range(1, number_of_images + 1):
-        try:
-            in_file_path = os.path.join('analysis', f'channel{channel}', f'{image_id}_led_positions.csv')
-            parameters = ledsa.core.file_handling.read_table(in_file_path, delim=',', silent=True)
-        except (FileNotFoundError, IOError):
-            fit_params_fragment = fit_params.append(
-                _param_array_to_dataframe([[np.nan] * (fit_params.shape[1] - 1)], image_id,
-                                          columns),
-                ignore_index=True, sort=False)
-            fit_params_list.append(fit_params_fragment)
-            exception_counter += 1
-            continue
+    available_img_ids = [img_id for img_id in _find_result_file_img_ids(channel) if img_id <= number_of_images]
+    new_img_ids = [img_id for img_id in available_img_ids if img_id not in ingested_img_ids]
+    if len(new_img_ids) == 0:
+        return
+    available_img_ids = set(available_img_ids)
+    img_ids = [img_id for img_id in range(1, new_img_ids[-1] + 1) if img_id not in ingested_img_ids and
+               (img_id in available_img_ids or img_id not in missing_img_ids)]
 
-        parameters = parameters[parameters[:, 0].argsort()]  # sort for led_id
-        parameters = _append_coordinates(parameters)
-        fit_params_fragment = _param_array_to_dataframe(parameters, image_id, columns)
-        fit_params_list.append(fit_params_fragment)
-
-    fit_params = pd.concat(fit_params_list, ignore_index=True, sort=False)
+    print('Loading fit parameters...')
+    columns = _get_column_names(channel, new_img_ids[0])
+    num_of_cores = config['DEFAULT'].getint('num_of_cores', fallback=1)
+    fit_params = _load_result_files(channel, img_ids, columns, num_of_cores)
 
-    print(f'{number_of_images - exception_counter} of {number_of_images} loaded.')
+    print(f'{len(ingested_img_ids) + len(new_img_ids)} of {number_of_images} loaded.')
     fit_params['img_id'] = fit_params['img_id'].astype(int)
     fit_params['led_id'] = fit_params['led_id'].astype(int)
     fit_params['line'] = fit_params['line'].astype(int)
-    fit_params['max_col_val'] = fit_params['max_col_val'].astype(int)
-    fit_params['sum_col_val'] = fit_params['sum_col_val'].astype(int)
-    out_file_path = os.path.join('analysis', f'channel{channel}', 'all_parameters.h5')
-    fit_params.to_hdf(out_file_path, 'table', append=True)
+    loaded_img_ids = set(new_img_ids)
+    _write_binary_data(out_file_path, fit_params, ingested_img_ids | loaded_img_ids,
+                       (missing_img_ids | set(img_ids)) - loaded_img_ids)
+
+
+def _load_result_files(channel: int, img_ids: List[int], columns: List[str], num_of_cores=1) -> pd.DataFrame:
+    """
+    Load the CSV files of the given images of a channel into a single DataFrame.
+    The files are parsed on a pool of processes and their rows are written into one preallocated array with a slab
+    for every image, holding the rows of the LEDs of the first file in the order of their ids. The LED coordinates are
+    attached once to all slabs. The slabs of images without a file and values of LEDs missing in a file remain NaN.
+
+    :param channel: Channel number of the files.
+    :type channel: int
+    :param img_ids: IDs of the images, in ascending order.
+    :type img_ids: List[int]
+    :param columns: Column names of the parameters, see _get_column_names.
+    :type columns: List[str]
+    :param num_of_cores: Number of processes parsing the files. Defaults to 1.
+    :type num_of_cores: int
+    :return: DataFrame with a row for every image and LED.
+    :rtype: pd.DataFrame
+    """
+    file_paths = [os.path.join('analysis', f'channel{channel}', f'{img_id}_led_positions.csv') for img_id in img_ids]
+    coordinate_index = _read_led_coordinate_index()
+    if num_of_cores > 1 and len(file_paths) > 1:
+        from multiprocessing import Pool
+        with Pool(num_of_cores) as p:
+            chunksize = max(1, len(file_paths) // (4 * num_of_cores))
+            tables = p.map(_read_result_file, file_paths, chunksize)
+    else:
+        tables = map(_read_result_file, file_paths)
+
+    fit_params = None
+    for i, table in enumerate(tables):
+        if table is None:
+            continue
+        if fit_params is None:
+            led_ids = table[:, 0]
+            fit_params = np.full((len(img_ids), len(led_ids), len(columns)), np.nan)
+            fit_params[:, :, 0] = np.array(img_ids)[:, np.newaxis]
+            fit_params[:, :, 1:3] = table[:, 0:2]
+            fit_params[:, :, -2:] = _take_coordinates(led_ids, coordinate_index)
+        if table.shape[0] == led_ids.shape[0] and np.array_equal(table[:, 0], led_ids):
+            fit_params[i, :, 1:-2] = table
+        else:
+            rows = np.searchsorted(led_ids, table[:, 0]).clip(max=led_ids.shape[0] - 1)
+            found = led_ids[rows] == table[:, 0]
+            fit_params[i, rows[found], 1:-2] = table[found]
+    return pd.DataFrame(fit_params.reshape(-1, len(columns)), columns=columns)
+
+
+def _read_result_file(file_path: str) -> Union[np.ndarray, None]:
+    """
+    Read the CSV file of an image and sort its rows by LED id.
+
+    :param file_path: Path of the file.
+    :type file_path: str
+    :return: Array of the parameters with a row for every LED, or None if the file does not exist.
+    :rtype: np.ndarray or None
+    """
+    try:
+        parameters = pd.read_csv(file_path, header=None, comment='#', dtype=np.float64, engine='c').to_numpy()
+    except (FileNotFoundError, IOError):
+        return None
+    return parameters[parameters[:, 0].argsort(kind='stable')]  # sort for led_id
+
+
+def _find_result_file_img_ids(channel: int) -> List[int]:
+    """
+    Find the IDs of all images with a CSV file of results in the directory of a channel.
+
+    :param channel: Channel number of the results.
+    :type channel: int
+    :return: Sorted list of the image IDs.
+    :rtype: List[int]
+    """
+    suffix = '_led_positions.csv'
+    img_ids = [file_name[:-len(suffix)] for file_name in os.listdir(os.path.join('analysis', f'channel{channel}'))
+               if file_name.endswith(suffix)]
+    return sorted(int(img_id) for img_id in img_ids if img_id.isdigit())
+
+
+def _result_files_modified_since(channel: int, mtime_ns: int) -> bool:
+    """
+    Check whether any CSV file of results in the directory of a channel was modified after the given time.
+
+    :param channel: Channel number of the results.
+    :type channel: int
+    :param mtime_ns: Modification time in nanoseconds, e.g. of the binary file.
+    :type mtime_ns: int
+    :return: True if a CSV file was modified after the given time.
+    :rtype: bool
+    """
+    with os.scandir(os.path.join('analysis', f'channel{channel}')) as entries:
+        return any(entry.name.endswith('_led_positions.csv') and entry.stat().st_mtime_ns > mtime_ns
+                   for entry in entries)
+
 
-def _get_column_names(channel: int) -> List[str]:
+def _read_ingest_record(file_path: str) -> Tuple[set, set]:
+    """
+    Read the IDs of the images whose CSV files were already written to a binary file by create_binary_data and of the
+    images written without a CSV file.
+
+    :param file_path: Path of the HDF file.
+    :type file_path: str
+    :return: Sets of the IDs of the ingested and of the missing images. Empty if the file does not exist.
+    :rtype: Tuple[set, set]
+    """
+    if not os.path.exists(file_path):
+        return set(), set()
+    with pd.HDFStore(file_path, mode='r') as store:
+        if 'ingested_img_ids' not in store:
+            return set(), set()
+        return set(store['ingested_img_ids'].tolist()), set(store['missing_img_ids'].tolist())
+
+
+def _write_binary_data(file_path: str, fit_params: pd.DataFrame, ingested_img_ids: set, missing_img_ids: set) -> None:
+    """
+    Write the parameters of newly loaded images to a binary file together with the updated image IDs.
+    If all images follow the images already in the file, their rows are appended. Otherwise the table is written again,
+    with the rows of the new images replacing any old rows of the same images.
+
+    :param file_path: Path of the HDF file.
+    :type file_path: str
+    :param fit_params: Parameters of the new images, sorted by image and LED id.
+    :type fit_params: pd.DataFrame
+    :param ingested_img_ids: IDs of all images written from a CSV file, including the new images.
+    :type ingested_img_ids: set
+    :param missing_img_ids: IDs of all images written without a CSV file, including the new images.
+    :type missing_img_ids: set
+    """
+    new_img_ids = set(fit_params['img_id'].unique().tolist())
+    with pd.HDFStore(file_path, mode='a') as store:
+        old_img_ids = set()
+        if 'ingested_img_ids' in store:
+            old_img_ids = set(store['ingested_img_ids'].tolist()) | set(store['missing_img_ids'].tolist())
+        if 'table' not in store:
+            store.put('table', fit_params, format='table', index=False, data_columns=QUERYABLE_COLUMNS)
+        elif store.get_storer('table').is_table and min(new_img_ids) > max(old_img_ids, default=0):
+            store.append('table', fit_params, format='table', index=False)
+        else:
+            old_fit_params = store['table']
+            old_fit_params = old_fit_params[~old_fit_params['img_id'].isin(new_img_ids)]
+            fit_params = pd.concat([old_fit_params, fit_params], ignore_index=True, sort=False)
+            fit_params = fit_params.sort_values(['img_id', 'led_id'], ignore_index=True)
+            store.put('table', fit_params, format='table', index=False, data_columns=QUERYABLE_COLUMNS)
+        store.create_table_index('table', columns=QUERYABLE_COLUMNS, optlevel=9, kind='full')
+        store.put('ingested_img_ids', pd.Series(sorted(ingested_img_ids), dtype=np.int64))
+        store.put('missing_img_ids', pd.Series(sorted(missing_img_ids), dtype=np.int64))
+
+
+def _read_parameter_table(file_path: str, path='.', columns=None, line=None, img_id_range=None) -> pd.DataFrame:
+    """
+    Read the table of an HDF file with the parameters of all images and LEDs.
+    Tables written by the ResultStore during the analysis are sorted by image and LED id, images processed more than
+    once keep their last results and the LED coordinates are appended like in create_binary_data.
+    The selection is applied by a query on disk if the table is indexed by the queryable columns and after reading the
+    table otherwise. Columns added by extend_hdf are joined by image and LED id.
+
+    :param file_path: Path of the HDF file.
+    :type file_path: str
+    :param path: Directory path of the experiment, defaults to the current directory.
+    :type path: str
+    :param columns: Columns to read besides 'img_id' and 'led_id'. Defaults to None, reading all columns.
+    :type columns: List[str], optional
+    :param line: LED array whose LEDs are read. Defaults to None, reading all LED arrays.
+    :type line: int, optional
+    :param img_id_range: First and last ID of the images to read, either may be None. Defaults to None.
+    :type img_id_range: Tuple[int, int], optional
+    :return: DataFrame with the columns 'img_id' and 'led_id' and the parameters.
+    :rtype: pd.DataFrame
+    """
+    first_img_id, last_img_id = img_id_range if img_id_range is not None else (None, None)
+    conditions = [(column, operator, value) for column, operator, value in
+                  [('line', '==', line), ('img_id', '>=', first_img_id), ('img_id', '<=', last_img_id)]
+                  if value is not None]
+    with pd.HDFStore(file_path, mode='r') as store:
+        storer = store.get_storer('table')
+        queryable = storer.is_table and set(QUERYABLE_COLUMNS) <= set(storer.data_columns)
+        table_columns = storer.non_index_axes[0][1] if storer.is_table else None
+        read_columns = None
+        if queryable and columns is not None:
+            read_columns = [column for column in table_columns if column in ['img_id', 'led_id'] + list(columns)]
+        if queryable:
+            where = [f'{column} {operator} {int(value)}' for column, operator, value in conditions]
+            fit_parameters = store.select('table', where=where or None, columns=read_columns)
+        else:
+            fit_parameters = store.select('table')
+            for column, operator, value in conditions:
+                fit_parameters = fit_parameters.query(f'{column} {operator} {int(value)}')
+        quantities = [key[len('/derived/'):] for key in store.keys() if key.startswith('/derived/')]
+        if columns is not None:
+            quantities = [quantity for quantity in quantities if quantity in columns]
+        where = [f'{column} {operator} {int(value)}' for column, operator, value in conditions if column == 'img_id']
+        derived_columns = [store.select(f'derived/{quantity}', where=where or None) for quantity in quantities]
+
+    if 'width' not in fit_parameters.columns:
+        fit_parameters = fit_parameters.drop_duplicates(['img_id', 'led_id'], keep='last')
+        fit_parameters = fit_parameters.sort_values(['img_id', 'led_id'], ignore_index=True)
+        if columns is None or 'width' in columns or 'height' in columns:
+            coordinates = _take_coordinates(fit_parameters['led_id'].to_numpy(), _read_led_coordinate_index(path))
+            fit_parameters['width'] = coordinates[:, 0]
+            fit_parameters['height'] = coordinates[:, 1]
+    for quantity, derived_column in zip(quantities, derived_columns):
+        fit_parameters = fit_parameters.drop(columns=quantity, errors='ignore')
+        fit_parameters = fit_parameters.merge(derived_column, on=['img_id', 'led_id'], how='left')
+    if columns is not None:
+        fit_parameters = fit_parameters[['img_id', 'led_id'] + [column for column in columns
+                                                                if column not in ['img_id', 'led_id']]]
+    return fit_parameters.reset_index(drop=True)
+
+
+def _get_column_names(channel: int, img_id=1) -> List[str]:
     """
     Get the column names for the specified channel based on the structure of the CSV files.
+    Files with fit results have a last column with the fit time, except for files written by older versions, which
+    lacked the separator between the maximum pixel value and the LED center and are read without it.
 
     :param channel: Channel number for which column names are to be determined.
     :type channel: int
+    :param img_id: ID of the image whose CSV file is inspected. Defaults to 1.
+    :type img_id: int
     :return: List of column names.
     :rtype: List[str]
     """
-    file_path = os.path.join('analysis', f'channel{channel}', '1_led_positions.csv')
+    file_path = os.path.join('analysis', f'channel{channel}', f'{img_id}_led_positions.csv')
     parameters = ledsa.core.file_handling.read_table(file_path, delim=',', silent=True)
     columns = ["img_id", "led_id", "line",
                "sum_col_val", "mean_col_val", "max_col_val"]
     if parameters.shape[1] > len(columns):
         columns.extend(["led_center_x", "led_center_y"])
         columns.extend(["x", "y", "dx", "dy", "A", "alpha", "wx", "wy", "fit_success", "fit_fun", "fit_nfev"])
+        if parameters.shape[1] == len(columns):
+            columns.append("fit_time")
     if parameters.shape[1] != len(columns) - 1:
         columns = _get_old_columns(parameters)
     columns.extend(["width", "height"])
@@ -268,86 +487,43 @@ def _get_old_columns(params: np.ndarray) -> List[str]:
     return columns
 
 
-def _param_array_to_dataframe(array: Union[np.ndarray, List[List]], img_id: int,
-                              column_names: List[str]) -> pd.DataFrame:
-    """
-    Convert an array of parameters to a pandas DataFrame.
-
-    :param array: Array of parameters.
-    :type array: Union[np.ndarray, List[List]]
-    :param img_id: Image ID to append to each row.
-    :type img_id: int
-    :param column_names: List of column names for the DataFrame.
-    :type column_names: List[str]
-    :return: DataFrame representation of the provided array.
-    :rtype: pd.DataFrame
-    """
-    appended_array = np.empty((np.shape(array)[0], np.shape(array)[1] + 1))
-    appended_array[:, 0] = img_id
-    appended_array[:, 1:] = array
-    fit_params = pd.DataFrame(appended_array, columns=column_names)
-    return fit_params
-
-
-def _append_coordinates(params: np.ndarray) -> np.ndarray:
+def _read_led_coordinate_index(path='.') -> Tuple[np.ndarray, np.ndarray]:
     """
-    Append LED coordinates to the parameter array if available.
+    Read the width and height coordinates of the LEDs and index them by LED id.
+    LEDs without coordinates, like the ignored LEDs, are mapped to a last row of NaN values.
 
-    :param params: Array of parameters.
-    :type params: np.ndarray
-    :return: Updated parameter array with LED coordinates appended.
-    :rtype: np.ndarray
-
-    :raised: FileNotFoundError if led_search_areas_with_coordinates.csv' file is not found.
-    """
-    ac = _append_coordinates
-    if "coord" not in ac.__dict__:
-        try:
-            file_path =  os.path.join('analysis', 'led_search_areas_with_coordinates.csv')
-            ac.coord = ledsa.core.file_handling.read_table(file_path, delim=',', silent=True)[:, [0, -2, -1]]
-        except (FileNotFoundError, IOError):
-            ac.coord = False
-
-    if type(ac.coord) == bool:
-        return _append_nans_to_params(params)
-    else:
-        return _append_coordinates_to_params(params, ac.coord)
-
-
-def _append_nans_to_params(params: np.ndarray) -> np.ndarray:
-    """
-    Append NaN values to the parameter array.
-
-    :param params: Array of parameters.
-    :type params: np.ndarray
-    :return: Updated parameter array with NaN values appended.
-    :rtype: np.ndarray
+    :param path: Directory path of the experiment, defaults to the current directory.
+    :type path: str
+    :return: Row of every LED id in the coordinates, and the coordinates with the columns width and height.
+    :rtype: Tuple[np.ndarray, np.ndarray]
     """
-    p_with_nans = np.empty((np.shape(params)[0], np.shape(params)[1] + 2))
-    p_with_nans[:] = np.NaN
-    p_with_nans[:, :-2] = params
-    return p_with_nans
-
-
-def _append_coordinates_to_params(params: np.ndarray, coord: np.ndarray) -> np.ndarray:
+    try:
+        file_path = os.path.join(path, 'analysis', 'led_search_areas_with_coordinates.csv')
+        coord = ledsa.core.file_handling.read_table(file_path, delim=',', silent=True, atleast_2d=True)[:, [0, -2, -1]]
+    except (FileNotFoundError, IOError):
+        coord = np.empty((0, 3))
+    led_ids = coord[:, 0].astype(int)
+    row_of_led = np.full(led_ids.max(initial=-1) + 1, coord.shape[0])
+    row_of_led[led_ids] = np.arange(coord.shape[0])
+    coordinates = np.full((coord.shape[0] + 1, 2), np.nan)
+    coordinates[:-1] = coord[:, 1:]
+    return row_of_led, coordinates
+
+
+def _take_coordinates(led_ids: np.ndarray, coordinate_index: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
     """
-    Append coordinates to the parameter array.
+    Get the width and height coordinates of the given LEDs.
 
-    :param params: Array of parameters.
-    :type params: np.ndarray
-    :param coordinates: Array of LED coordinates.
-    :type coordinates: np.ndarray
-    :return: Updated parameter array with coordinates appended.
+    :param led_ids: IDs of the LEDs, in any order and number.
+    :type led_ids: np.ndarray
+    :param coordinate_index: LED coordinates indexed by LED id, as returned by _read_led_coordinate_index.
+    :type coordinate_index: Tuple[np.ndarray, np.ndarray]
+    :return: Array with the width and height of every LED, NaN for LEDs without coordinates.
     :rtype: np.ndarray
     """
-    p_with_c = np.empty((np.shape(params)[0], np.shape(params)[1] + 2))
-    p_with_c[:, :-2] = params
-
-    if p_with_c.shape[0] != coord.shape[0]:
-        mask = np.zeros(coord.shape)
-        for led_id in p_with_c[:, 0]:
-            mask = np.logical_or(mask, np.repeat((coord[:, 0] == led_id), coord.shape[1]).reshape(coord.shape))
-        coord = np.reshape(coord[mask], (params.shape[0], coord.shape[1]))
-
-    p_with_c[:, -2:] = coord[:, -2:]
-    return p_with_c
+    row_of_led, coordinates = coordinate_index
+    led_ids = np.asarray(led_ids).astype(int)
+    known = (led_ids >= 0) & (led_ids < row_of_led.shape[0])
+    rows = np.full(led_ids.shape, coordinates.shape[0] - 1)
+    rows[known] = row_of_led[led_ids[known]]
+    return coordinates[rows]
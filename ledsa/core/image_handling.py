@@ -1,6 +1,4 @@
-import os
-
-from ledsa.core.file_handling import read_table
+from ledsa.core.ImageCatalogue import get_image_catalogue
 
 
 def get_img_name(img_id: str) -> str:
@@ -13,12 +11,7 @@ def get_img_name(img_id: str) -> str:
     :rtype: str
     :raises NameError: If no image name is found for the provided ID.
     """
-    file_path = os.path.join('analysis', 'image_infos_analysis.csv')
-    infos = read_table(file_path, ',', 'str', silent=True, atleast_2d=True)
-    for i in range(infos.shape[0]):
-        if int(infos[i, 0]) == int(img_id):
-            return infos[i, 1]
-    raise NameError("Could not find an image name to id {}.".format(img_id))
+    return get_image_catalogue().get_img_name(img_id)
 
 
 def get_img_id(img_name: str) -> str:
@@ -31,9 +24,4 @@ def get_img_id(img_name: str) -> str:
     :rtype: str
     :raises NameError: If no image ID is found for the provided image name.
     """
-    file_path = os.path.join('analysis', 'image_infos_analysis.csv')
-    infos = read_table(file_path, ',', 'str', silent=True, atleast_2d=True)
-    for i in range(infos.shape[0]):
-        if infos[i, 1] == img_name:
-            return infos[i, 0]
-    raise NameError("Could not find an image id for {}.".format(img_name))
+    return str(get_image_catalogue().get_img_id(img_name))
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List, Tuple
 
 import exifread
 import numpy as np
@@ -6,11 +7,12 @@ import rawpy
 from matplotlib import pyplot as plt
 
 
-def read_img(filename: str, channel: int, color_depth=14) -> np.ndarray:
+def read_img(filename: str, channel: int, color_depth=14, bayer_planes=False, average_greens=True) -> np.ndarray:
     """
     Returns a 2D array of the image for a single color channel.
     8bit is default range for JPG. For RAW files the Bayer array is returned as a 2D array where
-    all channel values except the selected channel are masked.
+    all channel values except the selected channel are masked. If bayer_planes is set, the packed half-resolution
+    plane of the channel is returned instead.
 
     :param filename: The path of the image file to read.
     :type filename: str
@@ -18,29 +20,186 @@ def read_img(filename: str, channel: int, color_depth=14) -> np.ndarray:
     :type channel: int
     :param color_depth: The bit depth of the image color. Default is 14 for RAW images.
     :type color_depth: int
+    :param bayer_planes: If True, RAW files are returned as sub-sampled Bayer planes. Default is False.
+    :type bayer_planes: bool
+    :param average_greens: If True, the plane of channel 1 is the average of both green planes. Default is True.
+    :type average_greens: bool
     :return: A 2D array containing the processed image data for one channel.
     :rtype: np.ndarray
     """
+    return read_channels(filename, [channel], color_depth=color_depth, bayer_planes=bayer_planes,
+                         average_greens=average_greens)[0]
+
+
+def read_channels(filename: str, channels: List[int], color_depth=14, bayer_planes=False,
+                  average_greens=True) -> List[np.ndarray]:
+    """
+    Returns a list of 2D arrays of the image, one for each of the given color channels.
+    The image file is only read and decoded once, independent of the number of channels.
+    The returned arrays are the same as the ones of read_img for the respective channel.
+
+    :param filename: The path of the image file to read.
+    :type filename: str
+    :param channels: The color channels to process.
+    :type channels: List[int]
+    :param color_depth: The bit depth of the image color. Default is 14 for RAW images.
+    :type color_depth: int
+    :param bayer_planes: If True, RAW files are returned as sub-sampled Bayer planes. Default is False.
+    :type bayer_planes: bool
+    :param average_greens: If True, the plane of channel 1 is the average of both green planes. Default is True.
+    :type average_greens: bool
+    :return: A list of 2D arrays containing the processed image data, ordered like channels.
+    :rtype: List[np.ndarray]
+    """
     extension = os.path.splitext(filename)[-1]
     data = []
     if extension in ['.JPG', '.JPEG', '.jpg', '.jpeg', '.PNG', '.png']:
         data = plt.imread(filename)
     elif extension in ['.CR2']:
         with rawpy.imread(filename) as raw:
-            data = raw.raw_image_visible.copy()
-            filter_array = raw.raw_colors_visible
-            black_level = raw.black_level_per_channel[channel]
+            black_levels = raw.black_level_per_channel
             white_level = raw.white_level
-        channel_range = 2 ** color_depth - 1
-        channel_array = data.astype(np.int16) - black_level
-        channel_array = (channel_array * (channel_range / (white_level - black_level))).astype(np.int16)
-        channel_array = np.clip(channel_array, 0, channel_range)
-        if channel == 0 or channel == 2:
-            channel_array = np.where(filter_array == channel, channel_array, 0)
-        elif channel == 1:
-            channel_array = np.where((filter_array == 1) | (filter_array == 3), channel_array, 0)
-        return channel_array
-    return data[:, :, channel]
+            if bayer_planes:
+                raw_pattern = raw.raw_pattern
+                return [_read_bayer_plane(raw.raw_image_visible, raw_pattern, channel, black_levels, white_level,
+                                          color_depth, average_greens) for channel in channels]
+            data = raw.raw_image_visible.copy()
+            filter_array = raw.raw_colors_visible.copy()
+        return [_mask_raw_channel(data, filter_array, channel, black_levels[channel], white_level, color_depth)
+                for channel in channels]
+    return [data[:, :, channel] for channel in channels]
+
+
+def get_subsampling_factor(filename: str, bayer_planes: bool) -> int:
+    """
+    Returns the factor by which the arrays returned by read_channels are sub-sampled compared to the image.
+
+    :param filename: The path of the image file.
+    :type filename: str
+    :param bayer_planes: Whether RAW files are read as sub-sampled Bayer planes.
+    :type bayer_planes: bool
+    :return: 2 for RAW files read as Bayer planes, otherwise 1.
+    :rtype: int
+    """
+    extension = os.path.splitext(filename)[-1]
+    if bayer_planes and extension in ['.CR2']:
+        return 2
+    return 1
+
+
+def get_plane_offset(filename: str, channel: int, average_greens=True) -> Tuple[float, float]:
+    """
+    Returns the position on the image of the first pixel of the Bayer plane of a channel, as returned by read_channels
+    with bayer_planes set. Pixel (i, j) of the plane is pixel (2 * i + row, 2 * j + col) of the image.
+    The color filter pattern is read once per directory, since all images of a directory are taken by the same camera.
+
+    :param filename: The path of the RAW image file.
+    :type filename: str
+    :param channel: The color channel of the plane.
+    :type channel: int
+    :param average_greens: If True, the plane of channel 1 is the average of both green planes, which lies between
+        them. Default is True.
+    :type average_greens: bool
+    :return: Row and column of the first pixel of the plane on the image.
+    :rtype: Tuple[float, float]
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    if directory not in _raw_patterns:
+        with rawpy.imread(filename) as raw:
+            _raw_patterns[directory] = raw.raw_pattern.copy()
+    raw_pattern = _raw_patterns[directory]
+    if channel == 1 and average_greens:
+        row, col = np.mean([np.argwhere(raw_pattern == green)[0] for green in [1, 3]], axis=0)
+    else:
+        row, col = np.argwhere(raw_pattern == channel)[0]
+    return float(row), float(col)
+
+
+_raw_patterns: Dict[str, np.ndarray] = {}
+
+
+def _scale_raw_values(data: np.ndarray, black_level: int, white_level: int, color_depth: int) -> np.ndarray:
+    """
+    Subtracts the black level of raw values and scales them to the given color depth.
+
+    :param data: Raw sensor values.
+    :type data: np.ndarray
+    :param black_level: Black level of the channel.
+    :type black_level: int
+    :param white_level: White level of the sensor.
+    :type white_level: int
+    :param color_depth: The bit depth of the image color.
+    :type color_depth: int
+    :return: The scaled values, clipped to the range of the color depth.
+    :rtype: np.ndarray
+    """
+    channel_range = 2 ** color_depth - 1
+    channel_array = data.astype(np.int16) - black_level
+    channel_array = (channel_array * (channel_range / (white_level - black_level))).astype(np.int16)
+    return np.clip(channel_array, 0, channel_range)
+
+
+def _mask_raw_channel(data: np.ndarray, filter_array: np.ndarray, channel: int, black_level: int, white_level: int,
+                      color_depth: int) -> np.ndarray:
+    """
+    Scales the raw Bayer array to the given color depth and masks all values not belonging to the channel.
+
+    :param data: The visible raw Bayer array.
+    :type data: np.ndarray
+    :param filter_array: Color filter index of every pixel of the raw Bayer array.
+    :type filter_array: np.ndarray
+    :param channel: The color channel to process.
+    :type channel: int
+    :param black_level: Black level of the channel.
+    :type black_level: int
+    :param white_level: White level of the sensor.
+    :type white_level: int
+    :param color_depth: The bit depth of the image color.
+    :type color_depth: int
+    :return: A 2D array where all values except the ones of the selected channel are masked.
+    :rtype: np.ndarray
+    """
+    channel_array = _scale_raw_values(data, black_level, white_level, color_depth)
+    if channel == 0 or channel == 2:
+        channel_array = np.where(filter_array == channel, channel_array, 0)
+    elif channel == 1:
+        channel_array = np.where((filter_array == 1) | (filter_array == 3), channel_array, 0)
+    return channel_array
+
+
+def _read_bayer_plane(data: np.ndarray, raw_pattern: np.ndarray, channel: int, black_levels: List[int],
+                      white_level: int, color_depth: int, average_greens: bool) -> np.ndarray:
+    """
+    Extracts the packed half-resolution plane of a color channel from the raw Bayer array.
+    The plane is taken as a strided view of the sensor buffer, so only the scaled plane itself is allocated.
+    Channel 0 is red, 1 is the first green, 2 is blue and 3 is the second green.
+
+    :param data: The visible raw Bayer array.
+    :type data: np.ndarray
+    :param raw_pattern: The 2x2 color filter pattern of the sensor.
+    :type raw_pattern: np.ndarray
+    :param channel: The color channel to process.
+    :type channel: int
+    :param black_levels: Black levels of all four color filter indices.
+    :type black_levels: List[int]
+    :param white_level: White level of the sensor.
+    :type white_level: int
+    :param color_depth: The bit depth of the image color.
+    :type color_depth: int
+    :param average_greens: If True, the plane of channel 1 is the average of both green planes.
+    :type average_greens: bool
+    :return: A 2D array with half the height and width of the sensor containing the values of the channel.
+    :rtype: np.ndarray
+    """
+    if channel == 1 and average_greens:
+        green_1 = _read_bayer_plane(data, raw_pattern, 1, black_levels, white_level, color_depth, False)
+        green_2 = _read_bayer_plane(data, raw_pattern, 3, black_levels, white_level, color_depth, False)
+        rows = min(green_1.shape[0], green_2.shape[0])
+        cols = min(green_1.shape[1], green_2.shape[1])
+        return ((green_1[:rows, :cols].astype(np.int32) + green_2[:rows, :cols]) // 2).astype(np.int16)
+    row, col = np.argwhere(raw_pattern == channel)[0]
+    plane = data[row::2, col::2]
+    return _scale_raw_values(plane, black_levels[channel], white_level, color_depth)
 
 
 def get_exif_entry(filename: str, tag: str) -> str:
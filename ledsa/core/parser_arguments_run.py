@@ -1,6 +1,9 @@
 import argparse
 import os
 
+from ledsa.analysis import ExtinctionCoefficientsAnalytic as ECA
+from ledsa.analysis import ExtinctionCoefficientsJoint as ECJ
+from ledsa.analysis import ExtinctionCoefficientsLinear as ECL
 from ledsa.analysis import ExtinctionCoefficientsNumeric as ECN
 from ledsa.analysis.ConfigDataAnalysis import ConfigDataAnalysis
 from ledsa.analysis.Experiment import Experiment
@@ -8,7 +11,9 @@ from ledsa.analysis.ExperimentData import ExperimentData
 # from ledsa.analysis.__main__ import apply_cc_on_ref_property
 
 from ledsa.core.ConfigData import ConfigData
+from ledsa.core.ResultCube import get_result_cube
 from ledsa.data_extraction.DataExtractor import DataExtractor
+from ledsa.data_extraction.step_3_functions import read_journal_run
 
 
 def run_data_extraction_arguments(args: argparse.Namespace) -> None:
@@ -64,8 +69,14 @@ def run_data_extraction_arguments(args: argparse.Namespace) -> None:
         de.process_image_data()
 
     if args.restart:
-        channels = [0, 1, 2]  # TODO: just for testing
-        de = DataExtractor(build_experiment_infos=False, channels=channels, fit_leds=False)
+        # continue with the channels and the fit mode of the interrupted run, runs of older versions with the given
+        # channels and fits
+        fit_leds = True
+        journal_run = read_journal_run()
+        if journal_run is not None:
+            channels, fit_mode = journal_run
+            fit_leds = fit_mode != 'none'
+        de = DataExtractor(build_experiment_infos=False, channels=channels, fit_leds=fit_leds)
         de.setup_restart()
         de.process_image_data()
 
@@ -150,18 +161,39 @@ def extionction_coefficient_calculation(args) -> None:
     """
     ex_data = ExperimentData()
     ex_data.request_config_parameters()
+    result_cubes = {}
     for array in ex_data.led_arrays:
         for channel in ex_data.channels:
             out_file = os.path.join(os.getcwd(), '../analysis', 'AbsorptionCoefficients',
-                                    f'absorption_coefs_numeric_channel_{channel}_{ex_data.reference_property}_led_array_{array}.csv')
+                                    f'absorption_coefs_{ex_data.solver}_channel_{channel}_{ex_data.reference_property}_led_array_{array}.csv')
             if not os.path.exists(out_file):
                 ex = Experiment(layers=ex_data.layers, led_array=array, camera=ex_data.camera, channel=channel,
                                 merge_led_arrays=ex_data.merge_led_arrays)
-                eca = ECN.ExtinctionCoefficientsNumeric(ex, reference_property=ex_data.reference_property,
-                                                        num_ref_imgs=ex_data.num_ref_images,
-                                                        weighting_curvature=ex_data.weighting_curvature,
-                                                        weighting_preference=ex_data.weighting_preference,
-                                                        num_iterations=ex_data.num_iterations)
+                if ex_data.solver == 'numeric':
+                    eca = ECN.ExtinctionCoefficientsNumeric(ex, reference_property=ex_data.reference_property,
+                                                            num_ref_imgs=ex_data.num_ref_images,
+                                                            weighting_curvature=ex_data.weighting_curvature,
+                                                            weighting_preference=ex_data.weighting_preference,
+                                                            num_iterations=ex_data.num_iterations,
+                                                            linear_seeds=ex_data.linear_seeds)
+                elif ex_data.solver == 'linear':
+                    eca = ECL.ExtinctionCoefficientsLinear(ex, reference_property=ex_data.reference_property,
+                                                           num_ref_imgs=ex_data.num_ref_images,
+                                                           weighting_tikhonov=ex_data.weighting_tikhonov)
+                elif ex_data.solver == 'joint':
+                    eca = ECJ.ExtinctionCoefficientsJoint(ex, reference_property=ex_data.reference_property,
+                                                          num_ref_imgs=ex_data.num_ref_images,
+                                                          weighting_tikhonov=ex_data.weighting_tikhonov,
+                                                          weighting_temporal=ex_data.weighting_temporal,
+                                                          num_iterations=ex_data.num_iterations)
+                elif ex_data.solver == 'analytic':
+                    eca = ECA.ExtinctionCoefficientsAnalytic(ex, reference_property=ex_data.reference_property,
+                                                             num_ref_imgs=ex_data.num_ref_images)
+                else:
+                    exit(f"Unknown solver {ex_data.solver}! Choose linear, joint, numeric or analytic.")
+                if channel not in result_cubes:
+                    result_cubes[channel] = get_result_cube(channel)
+                eca.result_cube = result_cubes[channel]
                 if ex_data.n_cpus > 1:
                     print(f"Calculation of extinction coefficients runs on {ex_data.n_cpus} cpus!")
                     eca.calc_and_set_coefficients_mp(ex_data.n_cpus)
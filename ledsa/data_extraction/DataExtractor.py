@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import os
+from typing import List, Optional, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -12,6 +13,8 @@ import ledsa.data_extraction.step_1_functions
 import ledsa.data_extraction.step_2_functions
 import ledsa.data_extraction.step_3_functions
 from ledsa.core.ConfigData import ConfigData
+from ledsa.core.ImageCatalogue import get_image_catalogue
+from ledsa.core.ResultStore import ResultStore
 from ledsa.data_extraction import init_functions as led
 
 
@@ -29,6 +32,8 @@ class DataExtractor:
     :vartype search_areas: numpy.ndarray, optional
     :ivar line_indices: 2D list with dimension (# of LED arrays) x (# of LEDs per array) or None.
     :vartype line_indices: list[list[int]], optional
+    :ivar led_templates: LED shape parameters per channel and LED id, used if 'fit_mode' is 'template', or None.
+    :vartype led_templates: dict[int, dict[int, numpy.ndarray]], optional
     """
     def __init__(self, channels=(0), load_config_file=True, build_experiment_infos=True, fit_leds=True):
         """
@@ -49,6 +54,8 @@ class DataExtractor:
         self.search_areas = None
         # 2D list with dimension (# of LED arrays) x (# of LEDs per array)
         self.line_indices = None
+        # LED shape parameters per channel and LED id for the template fit mode
+        self.led_templates = None
 
         led.create_needed_directories(self.channels)
         led.request_config_parameters(self.config)
@@ -160,6 +167,10 @@ class DataExtractor:
         Process all the image data to detect changes in light intensity in the search areas across the images.
         Removes 'images_to_process.csv' file afterward.
         """
+        if os.path.getsize('images_to_process.csv') == 0:
+            print('All images are already processed')
+            os.remove('images_to_process.csv')
+            return
         config = self.config['analyse_photo']
         if self.search_areas is None:
             self.load_search_areas()
@@ -167,47 +178,283 @@ class DataExtractor:
             self.load_line_indices()
 
         img_filenames = ledsa.core.file_handling.read_table('images_to_process.csv', dtype=str)
-        num_of_cores = int(config['num_of_cores'])
-        if num_of_cores > 1:
-            from multiprocessing import Pool
-            print('images are getting processed, this may take a while')
-            with Pool(num_of_cores) as p:
-                p.map(self.process_img_file, img_filenames)
-        else:
-            for i in range(len(img_filenames)):
-                self.process_img_file(img_filenames[i])
-                print('image ', i + 1, '/', len(img_filenames), ' processed')
+        result_store = None
+        if config.get('result_format', fallback='csv') == 'hdf':
+            result_store = ResultStore(self.channels)
+        try:
+            if self.fit_leds and config.get('fit_mode', fallback='full') == 'template':
+                img_filenames = self.setup_led_templates(img_filenames, result_store)
+            num_of_cores = int(config['num_of_cores'])
+            num_prefetch = config.getint('num_prefetch_imgs', fallback=0)
+            warm_start_fits = config.getboolean('warm_start_fits', fallback=False) and self.fit_leds
+            if num_of_cores > 1 and config.get('pool_mode', fallback='map') == 'stream':
+                print('images are getting processed, this may take a while')
+                self.stream_img_files(img_filenames, num_of_cores, result_store)
+            elif num_of_cores > 1:
+                from multiprocessing import Pool
+                print('images are getting processed, this may take a while')
+                with Pool(num_of_cores) as p:
+                    if num_prefetch > 0 or warm_start_fits:
+                        results = p.imap_unordered(self.process_img_files,
+                                                   self.split_img_files(img_filenames, num_of_cores))
+                    else:
+                        results = p.imap_unordered(self.process_img_file, img_filenames)
+                    # the workers only return their results if they are stored by the single result store
+                    for img_results in results:
+                        self.save_img_results(img_results or [], result_store)
+            else:
+                self.process_img_files(img_filenames, result_store)
+        finally:
+            if result_store is not None:
+                result_store.close()
 
         os.remove('images_to_process.csv')
 
-    def process_img_file(self, img_filename: str) -> None:
+    def split_img_files(self, img_filenames: np.ndarray, num_of_cores: int) -> List[np.ndarray]:
+        """
+        Split the image files into chunks of consecutive images, which are processed one after another by a worker
+        process with prefetching and warm starts. If every worker writes its own results, there is one chunk per
+        worker. If 'result_format' is 'hdf', the results of a chunk are only persisted by the main process once the
+        chunk is finished, so the chunks hold at most 'pool_chunksize' images, but not less than one more than
+        'num_prefetch_imgs'.
+
+        :param img_filenames: The names of the image files to be processed.
+        :type img_filenames: numpy.ndarray
+        :param num_of_cores: Number of worker processes.
+        :type num_of_cores: int
+        :return: The chunks of image file names.
+        :rtype: List[numpy.ndarray]
+        """
+        config = self.config['analyse_photo']
+        num_of_chunks = num_of_cores
+        if config.get('result_format', fallback='csv') == 'hdf':
+            chunksize = max(config.getint('pool_chunksize', fallback=1),
+                            config.getint('num_prefetch_imgs', fallback=0) + 1)
+            num_of_chunks = max(num_of_cores, -(-len(img_filenames) // chunksize))
+        return [chunk for chunk in np.array_split(img_filenames, num_of_chunks) if len(chunk) > 0]
+
+    def setup_led_templates(self, img_filenames: np.ndarray, result_store=None) -> np.ndarray:
+        """
+        Load the LED shape templates of all channels. If they do not exist for the current search areas, reference
+        images and options, the first 'num_ref_imgs' images of the analysis are processed with full fits and the
+        templates are created from their results.
+
+        :param img_filenames: The names of the image files to be processed.
+        :type img_filenames: numpy.ndarray
+        :param result_store: Store for the results of the reference images. If None, they are written to result
+            files. Defaults to None.
+        :type result_store: ResultStore, optional
+        :return: The names of the image files that still need to be processed.
+        :rtype: numpy.ndarray
+        """
+        step_3 = ledsa.data_extraction.step_3_functions
+        num_ref_imgs = self.config['analyse_photo'].getint('num_ref_imgs', fallback=10)
+        ref_img_filenames = get_image_catalogue().img_names[:num_ref_imgs]
+        templates_hash = step_3.get_led_templates_hash(self.search_areas, list(ref_img_filenames), self.config)
+        self.led_templates = {channel: step_3.load_led_templates(channel, templates_hash) for channel in self.channels}
+        if all(led_templates is not None for led_templates in self.led_templates.values()):
+            return img_filenames
+
+        img_data_of_ref_imgs = {channel: [] for channel in self.channels}
+        for img_filename in ref_img_filenames:
+            img_id = ledsa.core.image_handling.get_img_id(img_filename)
+            img_data_of_channels = step_3.generate_analysis_data_of_channels(img_filename, self.channels,
+                                                                             self.search_areas, self.line_indices,
+                                                                             self.config, self.fit_leds)
+            for channel, img_data in zip(self.channels, img_data_of_channels):
+                if result_store is not None:
+                    self.save_img_results([(int(img_id), channel, step_3.create_result_array(img_data, int(img_id)))],
+                                          result_store)
+                else:
+                    step_3.create_fit_result_file(img_data, img_id, channel)
+                    step_3.append_to_journal(img_id, [channel], self.get_fit_mode())
+                img_data_of_ref_imgs[channel].append(img_data)
+            print('Reference image {} processed'.format(img_id))
+
+        for channel in self.channels:
+            self.led_templates[channel] = step_3.create_led_templates(img_data_of_ref_imgs[channel])
+            step_3.save_led_templates(self.led_templates[channel], channel, templates_hash)
+        return np.array([img_filename for img_filename in img_filenames if img_filename not in ref_img_filenames])
+
+    def process_img_files(self, img_filenames: List[str], result_store=None) -> List[Tuple[int, int, np.ndarray]]:
+        """
+        Process several image files one after another. The next 'num_prefetch_imgs' images are read in the background
+        while the current image is processed. If 'warm_start_fits' is set, the fits of every LED start from the
+        results of the previous image.
+
+        :param img_filenames: The names of the image files to be processed.
+        :type img_filenames: List[str]
+        :param result_store: Store for the results if 'result_format' is 'hdf'. Defaults to None.
+        :type result_store: ResultStore, optional
+        :return: The results of all images, see process_img_file, which were not appended to result_store.
+        :rtype: List[Tuple[int, int, numpy.ndarray]]
+        """
+        num_prefetch = self.config['analyse_photo'].getint('num_prefetch_imgs', fallback=0)
+        warm_start_params = None
+        if self.config['analyse_photo'].getboolean('warm_start_fits', fallback=False):
+            warm_start_params = {}
+        imgs = ledsa.data_extraction.step_3_functions.prefetch_rois_of_imgs(img_filenames, self.channels,
+                                                                             self.search_areas, self.config,
+                                                                             num_prefetch)
+        results = []
+        for i, (img_filename, img_rois) in enumerate(imgs):
+            img_results = self.process_img_file(img_filename, img_rois, warm_start_params)
+            if img_results is not None and result_store is not None:
+                self.save_img_results(img_results, result_store)
+            elif img_results is not None:
+                results.extend(img_results)
+            print('image ', i + 1, '/', len(img_filenames), ' processed')
+        return results
+
+    def stream_img_files(self, img_filenames: List[str], num_of_cores: int, result_store=None) -> None:
+        """
+        Process image files on a pool of worker processes. The extractor is sent to every worker only once and the
+        workers stream the results of every image back as soon as they are ready, in chunks of 'pool_chunksize'
+        images. The results are persisted by this process only, to the result store or to result files. If
+        'warm_start_fits' is set, every worker starts its fits from the results of the last image it processed.
+        Images are not prefetched in this mode.
+
+        :param img_filenames: The names of the image files to be processed.
+        :type img_filenames: List[str]
+        :param num_of_cores: Number of worker processes.
+        :type num_of_cores: int
+        :param result_store: Store for the results if 'result_format' is 'hdf'. If None, the results are written to
+            result files. Defaults to None.
+        :type result_store: ResultStore, optional
+        """
+        from multiprocessing import Pool
+        chunksize = self.config['analyse_photo'].getint('pool_chunksize', fallback=1)
+        with Pool(num_of_cores, initializer=_init_pool_worker, initargs=(self,)) as p:
+            for i, img_results in enumerate(p.imap_unordered(_process_img_file_in_pool_worker, img_filenames,
+                                                             chunksize)):
+                self.save_img_results(img_results, result_store)
+                print('image ', i + 1, '/', len(img_filenames), ' processed')
+
+    def save_img_results(self, img_results: List[Tuple[int, int, np.ndarray]], result_store=None) -> None:
+        """
+        Persist results returned by process_img_file and record them in the journal of processed images.
+
+        :param img_results: Image id, channel and structured array of the results of every channel.
+        :type img_results: List[Tuple[int, int, numpy.ndarray]]
+        :param result_store: Store to append the results to. If None, the results are written to result files.
+            Defaults to None.
+        :type result_store: ResultStore, optional
+        """
+        step_3 = ledsa.data_extraction.step_3_functions
+        for img_id, channel, channel_results in img_results:
+            if result_store is not None:
+                result_store.append(img_id, channel, channel_results)
+            else:
+                step_3.create_result_file(channel_results, img_id, channel)
+            step_3.append_to_journal(img_id, [channel], self.get_fit_mode())
+
+    def process_img_file(self, img_filename: str, img_rois=None, warm_start_params=None,
+                         return_results=False) -> Optional[List[Tuple[int, int, np.ndarray]]]:
         """
         Process a single image file to extract relevant data. This is a workaround for pool.map.
+        If 'result_format' is 'hdf' or return_results is set, the results are returned instead of being written, so
+        that they can be persisted by a single process.
 
         :param img_filename: The name of the image file to be processed.
         :type img_filename: str
+        :param img_rois: Already read ROI stacks and sub-sampling factor of the image. Defaults to None.
+        :type img_rois: tuple, optional
+        :param warm_start_params: Fit parameters of the previous image per channel and LED id. Defaults to None.
+        :type warm_start_params: dict, optional
+        :param return_results: Return the results instead of writing result files. Defaults to False.
+        :type return_results: bool, optional
+        :return: Image id, channel and structured array of the results of every channel, or None if the results were
+            written to result files.
+        :rtype: List[Tuple[int, int, numpy.ndarray]], optional
         """
+        step_3 = ledsa.data_extraction.step_3_functions
         img_id = ledsa.core.image_handling.get_img_id(img_filename)
-        for channel in self.channels:
-            img_data = ledsa.data_extraction.step_3_functions.generate_analysis_data(img_filename, channel,
-                                                                                     self.search_areas,
-                                                                                     self.line_indices,
-                                                                                     self.config, self.fit_leds)
-            ledsa.data_extraction.step_3_functions.create_fit_result_file(img_data, img_id, channel)
+        store_results = return_results or self.config['analyse_photo'].get('result_format', fallback='csv') == 'hdf'
+        results = [] if store_results else None
+        if not self.fit_leds:
+            img_statistics_of_channels = step_3.generate_statistics_of_channels(
+                img_filename, self.channels, self.search_areas, self.line_indices, self.config, img_rois)
+            for channel, img_statistics in zip(self.channels, img_statistics_of_channels):
+                if store_results:
+                    results.append((int(img_id), channel,
+                                    step_3.create_statistics_result_array(img_statistics, int(img_id))))
+                else:
+                    step_3.create_statistics_result_file(img_statistics, img_id, channel)
+            if not store_results:
+                step_3.append_to_journal(img_id, self.channels, self.get_fit_mode())
+            print('Image {} processed'.format(img_id))
+            return results
+        img_data_of_channels = step_3.generate_analysis_data_of_channels(
+            img_filename, self.channels, self.search_areas, self.line_indices, self.config, self.fit_leds,
+            img_rois, warm_start_params, self.led_templates)
+        for channel, img_data in zip(self.channels, img_data_of_channels):
+            if store_results:
+                results.append((int(img_id), channel, step_3.create_result_array(img_data, int(img_id))))
+            else:
+                step_3.create_fit_result_file(img_data, img_id, channel)
+        if not store_results:
+            step_3.append_to_journal(img_id, self.channels, self.get_fit_mode())
         print('Image {} processed'.format(img_id))
+        return results
+
+    def get_fit_mode(self) -> str:
+        """
+        Get the fit mode the images are processed with, as recorded in the journal of processed images.
+
+        :return: 'full' or 'template' if the LEDs are fitted, 'none' otherwise.
+        :rtype: str
+        """
+        if not self.fit_leds:
+            return 'none'
+        return self.config['analyse_photo'].get('fit_mode', fallback='full')
 
     def setup_step3(self) -> None:
         """
         Setup the third step of the data extraction process by creating 'image_infos_analysis.csv' and 'images_to_process.csv' files.
+        The journal and the binary results of an earlier run are removed, since all images are processed again, and a
+        new journal recording the channels and the fit mode of the run is started.
         """
         led.generate_image_infos_csv(self.config, build_analysis_infos=True)
         ledsa.data_extraction.step_3_functions.create_imgs_to_process_file()
+        ledsa.data_extraction.step_3_functions.start_journal(self.channels, self.get_fit_mode())
+        ledsa.data_extraction.step_3_functions.remove_binary_results(self.channels)
 
     def setup_restart(self) -> None:
         """
-        Setup a restart in case the data extraction process was interrupted earlier.
+        Setup a restart in case the data extraction process was interrupted earlier. Images are processed again if
+        their results are missing in any of the channels.
         """
-        # if len(self.channels) > 1: #TODO: deactivated for testing
-        #     print('Restart of a run currently only supports one channel. \nExiting...')
-        #     exit(1)
-        ledsa.data_extraction.step_3_functions.find_and_save_not_analysed_imgs(self.channels[0])
+        result_format = self.config['analyse_photo'].get('result_format', fallback='csv')
+        ledsa.data_extraction.step_3_functions.find_and_save_not_analysed_imgs(self.channels, self.get_fit_mode(),
+                                                                              result_format)
+
+
+# state of a worker process of DataExtractor.stream_img_files
+_pool_extractor = None
+_pool_warm_start_params = None
+
+
+def _init_pool_worker(extractor: DataExtractor) -> None:
+    """
+    Initialize a worker process of DataExtractor.stream_img_files with the extractor whose images it processes.
+
+    :param extractor: The extractor.
+    :type extractor: DataExtractor
+    """
+    global _pool_extractor, _pool_warm_start_params
+    _pool_extractor = extractor
+    if extractor.config['analyse_photo'].getboolean('warm_start_fits', fallback=False):
+        _pool_warm_start_params = {}
+
+
+def _process_img_file_in_pool_worker(img_filename: str) -> List[Tuple[int, int, np.ndarray]]:
+    """
+    Process a single image file in a worker process of DataExtractor.stream_img_files.
+
+    :param img_filename: The name of the image file to be processed.
+    :type img_filename: str
+    :return: Image id, channel and structured array of the results of every channel.
+    :rtype: List[Tuple[int, int, numpy.ndarray]]
+    """
+    return _pool_extractor.process_img_file(img_filename, warm_start_params=_pool_warm_start_params,
+                                            return_results=True)
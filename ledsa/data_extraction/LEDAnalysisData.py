@@ -8,9 +8,9 @@ class LEDAnalysisData:
     :vartype led_array: int
     :ivar fit_leds: Indicates whether to fit LEDs or not.
     :vartype fit_leds: bool
-    :ivar led_center_x: X-coordinate of LED's center.
+    :ivar led_center_x: X-coordinate of LED's center in image pixels.
     :vartype led_center_x: float
-    :ivar led_center_y: Y-coordinate of LED's center.
+    :ivar led_center_y: Y-coordinate of LED's center in image pixels.
     :vartype led_center_y: float
     :ivar mean_color_value: Mean color value of the LED over the search area.
     :vartype mean_color_value: float
@@ -18,7 +18,8 @@ class LEDAnalysisData:
     :vartype sum_color_value: float
     :ivar max_color_value: Maximum color value observed for the LED.
     :vartype max_color_value: float
-    :ivar fit_results: Fit results after fitting.
+    :ivar fit_results: Fit results after fitting. The parameters are in pixels of the search area window, which are
+        pixels of the Bayer plane if the image is analysed on Bayer planes.
     :vartype fit_results: OptimizeResult
     :ivar fit_time: Time taken for fitting.
     :vartype fit_time: float
@@ -54,7 +55,7 @@ class LEDAnalysisData:
         """
         out_str = self.get_main_data_string()
         if self.fit_leds:
-            out_str += self.get_fit_data_string()
+            out_str += ',' + self.get_fit_data_string()
         out_str += "\n"
         return out_str
 
@@ -0,0 +1,108 @@
+from typing import List
+
+import numpy as np
+
+from ledsa.data_extraction.model import W0
+
+
+class LEDFitObjective:
+    """
+    Cost function of the LED optimization problem, prepared once for the window of a single LED.
+    Evaluating the object gives the same value as target_function, but the thresholded data and the extent of the
+    mesh are computed only once and all intermediate arrays are written into preallocated buffers, so that an
+    evaluation does not allocate any arrays.
+
+    :ivar data: Thresholded LED data, see threshold_data.
+    :vartype data: np.ndarray
+    :ivar x: Mesh grid values in x direction.
+    :vartype x: np.ndarray
+    :ivar y: Mesh grid values in y direction.
+    :vartype y: np.ndarray
+    :ivar nx: Maximal mesh value in x direction.
+    :vartype nx: float
+    :ivar ny: Maximal mesh value in y direction.
+    :vartype ny: float
+    """
+    def __init__(self, search_area: np.ndarray, mesh: List[np.ndarray]):
+        """
+        Initializes the LEDFitObjective instance.
+
+        :param search_area: Part of the image where the LED is located.
+        :type search_area: np.ndarray
+        :param mesh: Mesh grid values of x and y of the search area.
+        :type mesh: List[np.ndarray]
+        """
+        self.x, self.y = mesh
+        self.nx = np.max(self.x)
+        self.ny = np.max(self.y)
+        self.data = np.array(search_area, dtype=float)
+        self.data[self.data < 0.05 * np.max(self.data)] = 0
+        self._buffers = [np.empty(np.broadcast(self.x, self.y, self.data).shape) for _ in range(4)]
+
+    def __call__(self, params: np.ndarray) -> float:
+        """
+        Calculates the cost of the given parameters, see target_function.
+
+        :param params: Input parameters for the LED model x0, y0, dx, dy, a, alpha, wx and wy.
+        :type params: np.ndarray
+        :return: The cost value (L2 norm + penalty).
+        :rtype: float
+        """
+        x0, y0, dx, dy, a, alpha, wx, wy = params
+        l2 = np.sqrt(self.squared_error(params)) / self.data.size
+
+        penalty = 0
+        if x0 < 0 or x0 > self.nx or y0 < 0 or y0 > self.ny:
+            penalty += 1e3 * np.abs(x0 - self.nx) + 1e3 * np.abs(y0 - self.ny)
+        if dx < 1 or dy < 1:
+            penalty += 1. / (np.abs(dx)) ** 4 + 1. / (np.abs(dy)) ** 4
+        if wx < W0 or wy < W0:
+            penalty += np.abs(wx - W0) * 1e6 + np.abs(wy - W0) * 1e6
+        if np.abs(alpha) > np.pi / 2:
+            penalty += (np.abs(alpha) - np.pi / 2) * 1e6
+
+        return l2 + penalty
+
+    def squared_error(self, params: np.ndarray) -> float:
+        """
+        Calculates the sum of the squared differences between the LED model and the thresholded data.
+
+        :param params: Input parameters for the LED model x0, y0, dx, dy, a, alpha, wx and wy.
+        :type params: np.ndarray
+        :return: Sum of the squared residuals.
+        :rtype: float
+        """
+        x0, y0, dx, dy, a, alpha, wx, wy = params
+        dist_x, dist_y, r, phi = self._buffers
+
+        np.subtract(self.x, x0, out=dist_x)
+        np.subtract(self.y, y0, out=dist_y)
+        np.hypot(dist_x, dist_y, out=r)
+        np.arctan2(dist_y, dist_x, out=phi)
+        phi += np.pi + alpha
+
+        # with sin(phi)^2 = 1 - cos(phi)^2, dx^2 cos(phi)^2 + dy^2 sin(phi)^2 = dy^2 + (dx^2 - dy^2) cos(phi)^2
+        # dist_x is reused for cos(phi)^2, phi for the radius of the LED and dist_y for the width of its edge
+        cos_sq = dist_x
+        np.cos(phi, out=cos_sq)
+        np.square(cos_sq, out=cos_sq)
+        dr = phi
+        np.multiply(cos_sq, dx ** 2 - dy ** 2, out=dr)
+        dr += dy ** 2
+        np.sqrt(dr, out=dr)
+        np.divide(dx * dy, dr, out=dr)
+        dw = dist_y
+        np.multiply(cos_sq, wx ** 2 - wy ** 2, out=dw)
+        dw += wy ** 2
+        np.sqrt(dw, out=dw)
+        np.divide(wx * wy, dw, out=dw)
+
+        residuals = r
+        residuals -= dr
+        residuals /= dw
+        np.tanh(residuals, out=residuals)
+        residuals *= -0.5 * a
+        residuals += 0.5 * a
+        residuals -= self.data
+        residuals = residuals.ravel()
+        return np.dot(residuals, residuals)
@@ -0,0 +1,185 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ledsa.data_extraction.model import led_model, led_model_jacobian, get_parameter_bounds
+
+
+def fit_led_model_batched(windows: np.ndarray, x0: Optional[np.ndarray] = None, max_iterations=200, ftol=1e-8,
+                          xtol=1e-8, gtol=1e-8) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fit the LED model to the windows of several LEDs simultaneously with a batched Levenberg-Marquardt method.
+    Model, Jacobian and the 8x8 normal equations of all LEDs are evaluated in single vectorized operations.
+    LEDs are removed from the iteration as soon as they have converged, or as soon as no step decreases their cost
+    anymore, which is not counted as converged. The penalties of target_function are
+    replaced by projecting the parameters onto the bounds of get_parameter_bounds, parameters at a bound which the
+    gradient points out of are held fixed for the step.
+
+    :param windows: 3D array with dimension (# of LEDs) x (window size x) x (window size y).
+    :type windows: np.ndarray
+    :param x0: Initial parameters with dimension (# of LEDs) x 8. If None, every fit starts in the center of its
+        window. Default is None.
+    :type x0: Optional[np.ndarray]
+    :param max_iterations: Maximal number of iterations. Default is 200.
+    :type max_iterations: int
+    :param ftol: Tolerance for the relative change of the cost. Default is 1e-8, as for scipy.optimize.least_squares.
+    :type ftol: float
+    :param xtol: Tolerance for the relative change of the parameters. Default is 1e-8.
+    :type xtol: float
+    :param gtol: Tolerance for the maximum norm of the projected gradient, relative to the cost. Default is 1e-8.
+    :type gtol: float
+    :return: The fitted parameters, whether each fit converged, the value of target_function at the solution and the
+        number of model evaluations of every LED.
+    :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+    """
+    num_leds, nx, ny = windows.shape
+    x = np.linspace(0.5, nx - 0.5, nx)
+    y = np.linspace(0.5, ny - 0.5, ny)
+    mesh = np.meshgrid(x, y)
+    lower, upper = get_parameter_bounds(mesh)
+    # the model is periodic in alpha with period pi, so alpha is wrapped into its bounds instead of being clipped
+    lower[5], upper[5] = -np.inf, np.inf
+    has_lower, has_upper = np.isfinite(lower), np.isfinite(upper)
+
+    data = np.array(windows, dtype=float)
+    data[data < 0.05 * data.max(axis=(1, 2), keepdims=True)] = 0
+
+    if x0 is None:
+        x0 = np.tile([nx // 2, ny // 2, 2., 2., 200., 1.0, 1.0, 1.0], (num_leds, 1))
+    params = _project_parameters(np.array(x0, dtype=float), lower, upper)
+
+    residuals = _batched_residuals(params, data, mesh)
+    cost = np.sum(residuals ** 2, axis=1)
+    damping = np.full(num_leds, 1.0)
+    nfev = np.ones(num_leds, dtype=int)
+    success = np.zeros(num_leds, dtype=bool)
+    active = np.isfinite(cost)
+
+    for _ in range(max_iterations):
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        jacobian = _batched_jacobian(params[idx], mesh).reshape(idx.size, -1, 8)
+        gradient = np.einsum('nki,nk->ni', jacobian, residuals[idx])
+        blocked = ((params[idx] <= lower) & (gradient > 0)) | ((params[idx] >= upper) & (gradient < 0))
+        jacobian[np.broadcast_to(blocked[:, None, :], jacobian.shape)] = 0
+        gradient[blocked] = 0
+
+        # the projected gradient vanishes, the fit is at a minimum within the bounds
+        stationary = np.linalg.norm(gradient, np.inf, axis=1) <= gtol * cost[idx]
+        success[idx[stationary]] = True
+        active[idx[stationary]] = False
+        idx, jacobian, gradient = idx[~stationary], jacobian[~stationary], gradient[~stationary]
+        if idx.size == 0:
+            break
+        jtj = np.einsum('nki,nkj->nij', jacobian, jacobian)
+
+        diagonal = np.maximum(np.diagonal(jtj, axis1=1, axis2=2), 1e-12)
+        system = jtj + damping[idx, None, None] * diagonal[:, :, None] * np.eye(8)
+        try:
+            step = -np.linalg.solve(system, gradient[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            step = _solve_systems_separately(system, gradient, diagonal)
+
+        # a single step covers at most 90 % of the distance to a bound, to not collapse the widths of the LED edge
+        new_params = np.clip(params[idx] + step, np.where(has_lower, 0.9 * lower + 0.1 * params[idx], -np.inf),
+                             np.where(has_upper, 0.9 * upper + 0.1 * params[idx], np.inf))
+        new_params = _project_parameters(new_params, lower, upper)
+        new_residuals = _batched_residuals(new_params, data[idx], mesh)
+        new_cost = np.sum(new_residuals ** 2, axis=1)
+        nfev[idx] += 1
+
+        improved = np.isfinite(new_cost) & (new_cost < cost[idx])
+        step_norm = np.linalg.norm(step, axis=1)
+        converged = improved & ((cost[idx] - new_cost <= ftol * cost[idx]) |
+                                (step_norm <= xtol * (np.linalg.norm(params[idx], axis=1) + xtol)))
+
+        accepted = idx[improved]
+        params[accepted] = new_params[improved]
+        residuals[accepted] = new_residuals[improved]
+        cost[accepted] = new_cost[improved]
+        damping[accepted] /= 10
+        damping[idx[~improved]] *= 10
+
+        success[idx[converged]] = True
+        # no decrease of the cost is found even for tiny steps, the fit is stopped without having converged
+        stalled = idx[~improved & (damping[idx] > 1e10)]
+        active[idx[converged]] = False
+        active[stalled] = False
+
+    fun = np.sqrt(cost) / (nx * ny)
+    return params, success, fun, nfev
+
+
+def _solve_systems_separately(system: np.ndarray, gradient: np.ndarray, diagonal: np.ndarray) -> np.ndarray:
+    """
+    Solve the damped normal equations of several LEDs one after another, if some of them are singular. The step of an
+    LED with a singular system is a gradient step scaled by the diagonal of its normal equations instead.
+
+    :param system: Damped normal equations with dimension (# of LEDs) x 8 x 8.
+    :type system: np.ndarray
+    :param gradient: Gradients with dimension (# of LEDs) x 8.
+    :type gradient: np.ndarray
+    :param diagonal: Diagonals of the normal equations with dimension (# of LEDs) x 8.
+    :type diagonal: np.ndarray
+    :return: Steps with dimension (# of LEDs) x 8.
+    :rtype: np.ndarray
+    """
+    step = np.empty_like(gradient)
+    for led_idx in range(gradient.shape[0]):
+        try:
+            step[led_idx] = -np.linalg.solve(system[led_idx], gradient[led_idx])
+        except np.linalg.LinAlgError:
+            step[led_idx] = -gradient[led_idx] / diagonal[led_idx]
+    return step
+
+
+def _project_parameters(params: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """
+    Clip the parameters of several LEDs to their bounds and wrap alpha into [-pi/2, pi/2).
+
+    :param params: Parameters with dimension (# of LEDs) x 8.
+    :type params: np.ndarray
+    :param lower: Lower bounds of the parameters.
+    :type lower: np.ndarray
+    :param upper: Upper bounds of the parameters.
+    :type upper: np.ndarray
+    :return: The projected parameters.
+    :rtype: np.ndarray
+    """
+    params = np.clip(params, lower, upper)
+    params[:, 5] = (params[:, 5] + np.pi / 2) % np.pi - np.pi / 2
+    return params
+
+
+def _batched_residuals(params: np.ndarray, data: np.ndarray, mesh) -> np.ndarray:
+    """
+    Calculate the flattened residuals between the LED model and the thresholded data of several LEDs.
+
+    :param params: Parameters with dimension (# of LEDs) x 8.
+    :type params: np.ndarray
+    :param data: Thresholded windows with dimension (# of LEDs) x (window size x) x (window size y).
+    :type data: np.ndarray
+    :param mesh: Mesh grid values of x and y.
+    :type mesh: List[np.ndarray]
+    :return: Residuals with dimension (# of LEDs) x (# of pixels).
+    :rtype: np.ndarray
+    """
+    x, y = mesh
+    model = led_model(x, y, *params.T[:, :, None, None])
+    return (model - data).reshape(params.shape[0], -1)
+
+
+def _batched_jacobian(params: np.ndarray, mesh) -> np.ndarray:
+    """
+    Calculate the Jacobian of the LED model of several LEDs.
+
+    :param params: Parameters with dimension (# of LEDs) x 8.
+    :type params: np.ndarray
+    :param mesh: Mesh grid values of x and y.
+    :type mesh: List[np.ndarray]
+    :return: Jacobian with dimension (# of LEDs) x (window size y) x (window size x) x 8.
+    :rtype: np.ndarray
+    """
+    x, y = mesh
+    return led_model_jacobian(x, y, *params.T[:, :, None, None])
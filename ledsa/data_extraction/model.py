@@ -2,6 +2,9 @@ from typing import Tuple
 
 import numpy as np
 
+# minimal width of the LED edge, see the penalty in target_function
+W0 = 0.001
+
 
 # cost function for the LED optimization problem
 def target_function(params: np.ndarray, *args: Tuple) -> float:
@@ -47,7 +50,7 @@ def target_function(params: np.ndarray, *args: Tuple) -> float:
         penalty += 1e3 * np.abs(x0 - nx) + 1e3 * np.abs(y0 - ny)
     if dx < 1 or dy < 1:
         penalty += 1. / (np.abs(dx)) ** 4 + 1. / (np.abs(dy)) ** 4
-    w0 = 0.001
+    w0 = W0
     if wx < w0 or wy < w0:
         penalty += np.abs(wx - w0) * 1e6 + np.abs(wy - w0) * 1e6
 
@@ -57,6 +60,69 @@ def target_function(params: np.ndarray, *args: Tuple) -> float:
     return l2 + penalty
 
 
+def residual_function(params: np.ndarray, *args: Tuple) -> np.ndarray:
+    """
+    Calculates the residuals between the LED model and the thresholded data for a least squares fit.
+
+    :param params: Input parameters for the LED model, see target_function.
+    :type params: numpy.ndarray
+    :param args: Extra arguments containing:
+        - data: Observed LED data, already thresholded with threshold_data.
+        - mesh: Mesh grid values of x and y.
+    :type args: Tuple
+    :return: Flattened residuals of all pixels.
+    :rtype: np.ndarray
+    """
+    data, mesh = args
+    x, y = mesh
+    return (led_model(x, y, *params) - data).ravel()
+
+
+def residual_jacobian(params: np.ndarray, *args: Tuple) -> np.ndarray:
+    """
+    Calculates the Jacobian of residual_function with respect to the parameters.
+
+    :param params: Input parameters for the LED model, see target_function.
+    :type params: numpy.ndarray
+    :param args: Extra arguments, see residual_function.
+    :type args: Tuple
+    :return: Jacobian with dimension (# of pixels) x (# of parameters).
+    :rtype: np.ndarray
+    """
+    data, mesh = args
+    x, y = mesh
+    return led_model_jacobian(x, y, *params).reshape(-1, len(params))
+
+
+def threshold_data(data: np.ndarray) -> np.ndarray:
+    """
+    Returns a copy of the data where all values below 5 % of the maximum are set to zero, as done in target_function.
+
+    :param data: Observed LED data.
+    :type data: np.ndarray
+    :return: Thresholded data.
+    :rtype: np.ndarray
+    """
+    data = np.array(data, dtype=float)
+    data[data < 0.05 * np.max(data)] = 0
+    return data
+
+
+def get_parameter_bounds(mesh: Tuple[np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns lower and upper bounds of the LED model parameters corresponding to the penalties of target_function.
+
+    :param mesh: Mesh grid values of x and y.
+    :type mesh: Tuple[np.ndarray, np.ndarray]
+    :return: Lower and upper bounds of x0, y0, dx, dy, a, alpha, wx and wy.
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    x, y = mesh
+    lower = np.array([0, 0, 1, 1, -np.inf, -np.pi / 2, W0, W0])
+    upper = np.array([np.max(x), np.max(y), np.inf, np.inf, np.inf, np.pi / 2, np.inf, np.inf])
+    return lower, upper
+
+
 def led_model(x: np.ndarray, y: np.ndarray, x0: float, y0: float, dx: float, dy: float, a: float, alpha: float, wx: float, wy: float) -> np.ndarray:
     """
     Defines a mathematical model for an LED based on given parameters.
@@ -101,3 +167,72 @@ def led_model(x: np.ndarray, y: np.ndarray, x0: float, y0: float, dx: float, dy:
     a = a * 0.5 * (1 - np.tanh((r - dr) / dw))
 
     return a
+
+
+def led_model_jacobian(x: np.ndarray, y: np.ndarray, x0: float, y0: float, dx: float, dy: float, a: float,
+                       alpha: float, wx: float, wy: float) -> np.ndarray:
+    """
+    Calculates the analytic partial derivatives of led_model with respect to all of its parameters.
+
+    :param x: Mesh grid values in x direction.
+    :type x: np.ndarray
+    :param y: Mesh grid values in y direction.
+    :type y: np.ndarray
+    :param x0: Center position in the x-direction.
+    :type x0: float
+    :param y0: Center position in the y-direction.
+    :type y0: float
+    :param dx: Deviation in the x direction.
+    :type dx: float
+    :param dy: Deviation in the y direction.
+    :type dy: float
+    :param a: Amplitude of the LED.
+    :type a: float
+    :param alpha: Angle of orientation of the LED in radians.
+    :type alpha: float
+    :param wx: Width of the LED model in x direction.
+    :type wx: float
+    :param wy: Width of the LED model in y direction.
+    :type wy: float
+    :return: Array with the broadcast shape of the inputs and an additional last axis holding the derivatives w.r.t.
+        x0, y0, dx, dy, a, alpha, wx and wy.
+    :rtype: np.ndarray
+    """
+    nx = x - x0
+    ny = y - y0
+    r = np.sqrt(nx ** 2 + ny ** 2)
+    r_sq = np.maximum(r ** 2, np.finfo(float).tiny)
+    r = np.maximum(r, np.finfo(float).tiny)
+
+    phi = np.arctan2(ny, nx) + np.pi + alpha
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+
+    q = np.sqrt((dx * cos_phi) ** 2 + (dy * sin_phi) ** 2)
+    p = np.sqrt((wx * cos_phi) ** 2 + (wy * sin_phi) ** 2)
+    dr = dx * dy / q
+    dw = wx * wy / p
+    u = (r - dr) / dw
+    tanh_u = np.tanh(u)
+
+    # derivatives of dr and dw with respect to their parameters and phi
+    ddr_ddx = dy ** 3 * sin_phi ** 2 / q ** 3
+    ddr_ddy = dx ** 3 * cos_phi ** 2 / q ** 3
+    ddr_dphi = -dx * dy * sin_phi * cos_phi * (dy ** 2 - dx ** 2) / q ** 3
+    ddw_dwx = wy ** 3 * sin_phi ** 2 / p ** 3
+    ddw_dwy = wx ** 3 * cos_phi ** 2 / p ** 3
+    ddw_dphi = -wx * wy * sin_phi * cos_phi * (wy ** 2 - wx ** 2) / p ** 3
+
+    df_du = -a * 0.5 * (1 - tanh_u ** 2)
+    du_dphi = -ddr_dphi / dw - u / dw * ddw_dphi
+
+    jacobian = np.empty(np.shape(u) + (8,))
+    jacobian[..., 0] = df_du * (-nx / r / dw + du_dphi * ny / r_sq)
+    jacobian[..., 1] = df_du * (-ny / r / dw - du_dphi * nx / r_sq)
+    jacobian[..., 2] = df_du * -ddr_ddx / dw
+    jacobian[..., 3] = df_du * -ddr_ddy / dw
+    jacobian[..., 4] = 0.5 * (1 - tanh_u)
+    jacobian[..., 5] = df_du * du_dphi
+    jacobian[..., 6] = df_du * -u / dw * ddw_dwx
+    jacobian[..., 7] = df_du * -u / dw * ddw_dwy
+    return jacobian
@@ -0,0 +1,148 @@
+import hashlib
+import os
+from typing import List, Optional
+
+import numpy as np
+
+
+def extract_roi_stack(data: np.ndarray, search_areas: np.ndarray, window_radius: int) -> np.ndarray:
+    """
+    Extract the square windows around all search areas of an image into a single array.
+    Parts of a window lying outside the image are filled with zeros, so the windows of LEDs at the image border have
+    the full size as well. Their mean value is taken over the full window and their fit sees the part outside of
+    the image as dark pixels. Earlier versions truncated these windows at the bottom and right border of the image
+    and failed on empty windows at the top and left border.
+
+    :param data: 2D array of the image data of one channel.
+    :type data: np.ndarray
+    :param search_areas: 2D array with dimension (# of LEDs) x (LED_id, x, y).
+    :type search_areas: np.ndarray
+    :param window_radius: Radius of the search area.
+    :type window_radius: int
+    :return: 3D array with dimension (# of LEDs) x (2 * window_radius) x (2 * window_radius).
+    :rtype: np.ndarray
+    """
+    size = 2 * window_radius
+    origins_x = search_areas[:, 1].astype(int) - window_radius
+    origins_y = search_areas[:, 2].astype(int) - window_radius
+    inside = (origins_x >= 0) & (origins_y >= 0) & \
+             (origins_x + size <= data.shape[0]) & (origins_y + size <= data.shape[1])
+
+    rois = np.zeros((search_areas.shape[0], size, size), dtype=data.dtype)
+    windows = np.lib.stride_tricks.sliding_window_view(data, (size, size))
+    rois[inside] = windows[origins_x[inside], origins_y[inside]]
+
+    for led_idx in np.flatnonzero(~inside):
+        x_start, y_start = max(origins_x[led_idx], 0), max(origins_y[led_idx], 0)
+        x_end = min(origins_x[led_idx] + size, data.shape[0])
+        y_end = min(origins_y[led_idx] + size, data.shape[1])
+        if x_end <= x_start or y_end <= y_start:
+            continue
+        rois[led_idx, x_start - origins_x[led_idx]:x_end - origins_x[led_idx],
+             y_start - origins_y[led_idx]:y_end - origins_y[led_idx]] = data[x_start:x_end, y_start:y_end]
+    return rois
+
+
+def get_search_areas_hash(search_areas: np.ndarray, window_radius: int, read_options: str) -> str:
+    """
+    Compute a hash identifying the ROI stacks created from the given search areas.
+
+    :param search_areas: 2D array with dimension (# of LEDs) x (LED_id, x, y).
+    :type search_areas: np.ndarray
+    :param window_radius: Radius of the search area.
+    :type window_radius: int
+    :param read_options: String representation of the options used to read the images.
+    :type read_options: str
+    :return: Hexadecimal SHA-1 digest.
+    :rtype: str
+    """
+    sha = hashlib.sha1()
+    sha.update(np.ascontiguousarray(search_areas, dtype=np.int64).tobytes())
+    sha.update(f'{window_radius},{read_options}'.encode())
+    return sha.hexdigest()
+
+
+def get_roi_stack_path(img_filename: str, channel: int, search_areas_hash: str) -> str:
+    """
+    Get the path of the ROI stack of an image and channel.
+
+    :param img_filename: The filename of the image.
+    :type img_filename: str
+    :param channel: The color channel of the ROI stack.
+    :type channel: int
+    :param search_areas_hash: Hash of the search areas the ROI stack was created from.
+    :type search_areas_hash: str
+    :return: Path of the ROI stack.
+    :rtype: str
+    """
+    img_name = os.path.splitext(os.path.basename(img_filename))[0]
+    return os.path.join('analysis', 'roi_cache', search_areas_hash, f'channel{channel}', f'{img_name}_rois.npy')
+
+
+def load_roi_stacks(img_filename: str, channels: List[int], search_areas_hash: str) -> Optional[List[np.ndarray]]:
+    """
+    Load the memory-mapped ROI stacks of an image for all given channels.
+
+    :param img_filename: The filename of the image.
+    :type img_filename: str
+    :param channels: The color channels to load.
+    :type channels: List[int]
+    :param search_areas_hash: Hash of the search areas the ROI stacks were created from.
+    :type search_areas_hash: str
+    :return: The ROI stacks ordered like channels, or None if any of them does not exist.
+    :rtype: Optional[List[np.ndarray]]
+    """
+    file_paths = [get_roi_stack_path(img_filename, channel, search_areas_hash) for channel in channels]
+    if not all(os.path.exists(file_path) for file_path in file_paths):
+        return None
+    return [np.load(file_path, mmap_mode='r') for file_path in file_paths]
+
+
+def save_roi_stacks(img_filename: str, channels: List[int], rois: List[np.ndarray], search_areas_hash: str) -> None:
+    """
+    Save the ROI stacks of an image. Every file is written to a temporary path first and then renamed, so that
+    concurrent or interrupted runs never leave a partially written stack.
+
+    :param img_filename: The filename of the image.
+    :type img_filename: str
+    :param channels: The color channels of the ROI stacks.
+    :type channels: List[int]
+    :param rois: The ROI stacks ordered like channels.
+    :type rois: List[np.ndarray]
+    :param search_areas_hash: Hash of the search areas the ROI stacks were created from.
+    :type search_areas_hash: str
+    """
+    for channel, channel_rois in zip(channels, rois):
+        file_path = get_roi_stack_path(img_filename, channel, search_areas_hash)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_file_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(tmp_file_path, 'wb') as out_file:
+            np.save(out_file, channel_rois)
+        os.replace(tmp_file_path, file_path)
+
+
+def calc_roi_statistics(rois: np.ndarray, led_ids: np.ndarray, lines: np.ndarray) -> np.ndarray:
+    """
+    Compute the sum, mean and maximum of the windows of several LEDs at once.
+    The mean is the sum divided by the full window size, also for windows reaching beyond the image border, see
+    extract_roi_stack.
+
+    :param rois: 3D array with the windows around all search areas, indexed by LED id.
+    :type rois: np.ndarray
+    :param led_ids: IDs of the LEDs to evaluate.
+    :type led_ids: np.ndarray
+    :param lines: Index of the LED array of every LED in led_ids.
+    :type lines: np.ndarray
+    :return: Structured array with the fields led_id, line, sum_col_val, mean_col_val and max_col_val.
+    :rtype: np.ndarray
+    """
+    windows = np.asarray(rois[led_ids]).reshape(len(led_ids), -1)
+    statistics = np.empty(len(led_ids), dtype=[('led_id', np.int64), ('line', np.int64),
+                                               ('sum_col_val', np.float64), ('mean_col_val', np.float64),
+                                               ('max_col_val', windows.dtype)])
+    statistics['led_id'] = led_ids
+    statistics['line'] = lines
+    statistics['sum_col_val'] = windows.sum(axis=1)
+    statistics['mean_col_val'] = statistics['sum_col_val'] / windows.shape[1]
+    statistics['max_col_val'] = windows.max(axis=1)
+    return statistics
@@ -1,17 +1,26 @@
 import os
 import re
 import time
-from typing import List, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 import numpy as np
 import scipy.optimize
 
 from ledsa.core.ConfigData import ConfigData
+from ledsa.core.ResultCube import get_result_cube_path
+from ledsa.core.ResultStore import get_result_dtype, get_result_store_path
 from ledsa.core.file_handling import read_table
-from ledsa.core.image_handling import get_img_name
-from ledsa.core.image_reading import read_img
+from ledsa.core.ImageCatalogue import get_image_catalogue
+from ledsa.core.image_reading import read_channels, get_subsampling_factor, get_plane_offset
 from ledsa.data_extraction.LEDAnalysisData import LEDAnalysisData
-from ledsa.data_extraction.model import target_function
+from ledsa.data_extraction.LEDFitObjective import LEDFitObjective
+from ledsa.data_extraction.roi_functions import calc_roi_statistics, extract_roi_stack, get_search_areas_hash, \
+    load_roi_stacks, save_roi_stacks
+from ledsa.data_extraction.model import target_function, residual_function, residual_jacobian, threshold_data, \
+    get_parameter_bounds, led_model
+from ledsa.data_extraction.batched_fit import fit_led_model_batched
 
 
 def generate_analysis_data(img_filename: str, channel: int, search_areas: np.ndarray, line_indices: List[List[int]],
@@ -38,27 +47,223 @@ def generate_analysis_data(img_filename: str, channel: int, search_areas: np.nda
     :return: A list of LEDAnalysisData objects containing analysis results.
     :rtype: List[LEDAnalysisData]
     """
-    file_path = os.path.join(conf['DEFAULT']['img_directory'], img_filename)
-    data = read_img(file_path, channel=channel)
-    window_radius = int(conf['find_search_areas']['window_radius'])
-    img_analysis_data = []
+    rois, subsampling = _read_rois_of_img(img_filename, [channel], search_areas, conf)
+    return _generate_img_analysis_data(img_filename, channel, rois[0], search_areas, line_indices, conf,
+                                       fit_leds, debug, debug_led, subsampling)
 
-    if debug:
-        analysis_res = _generate_led_analysis_data(conf, channel, data, debug, debug_led, img_filename, 0, search_areas,
-                                                   window_radius, fit_leds)
-        return analysis_res
 
-    num_of_arrays = len(line_indices)
-    for led_array_idx in range(num_of_arrays):
-        print('processing LED array ', led_array_idx, '...')
-        for iled in line_indices[led_array_idx]:
-            if iled % (int(conf['analyse_photo']['skip_leds']) + 1) == 0:
-                led_analysis_data = _generate_led_analysis_data(conf, channel, data, debug, iled, img_filename,
-                                                                led_array_idx, search_areas, window_radius, fit_leds)
-                img_analysis_data.append(led_analysis_data)
+def generate_analysis_data_of_channels(img_filename: str, channels: List[int], search_areas: np.ndarray,
+                                       line_indices: List[List[int]], conf: ConfigData, fit_leds=True,
+                                       img_rois: Optional[Tuple[List[np.ndarray], int]] = None,
+                                       warm_start_params: Optional[Dict[int, Dict[int, np.ndarray]]] = None,
+                                       led_templates: Optional[Dict[int, Dict[int, np.ndarray]]] = None
+                                       ) -> List[List[LEDAnalysisData]]:
+    """
+    Generate LED analysis data for several color channels of the given image.
+    The image is read and decoded only once for all channels, or not at all if its ROI stacks were already read.
+
+    :param img_filename: The filename of the image to be analyzed.
+    :type img_filename: str
+    :param channels: The color channels to be considered during analysis.
+    :type channels: List[int]
+    :param search_areas: A numpy array containing the search areas for LEDs.
+    :type search_areas: np.ndarray
+    :param line_indices: IDs indicating the LEDs in the arrays.
+    :type line_indices: List[List[int]]
+    :param conf: Configuration data for analysis.
+    :type conf: ConfigData
+    :param fit_leds: Whether to fit the LED model to the data. Default is True.
+    :type fit_leds: bool
+    :param img_rois: Already read ROI stacks and sub-sampling factor of the image, as yielded by prefetch_rois_of_imgs.
+        The image is read if None. Default is None.
+    :type img_rois: Optional[Tuple[List[np.ndarray], int]]
+    :param warm_start_params: Converged fit parameters of the previous image per channel and LED id. The fits are
+        started from these parameters and the dictionaries are updated with the results of this image. The default
+        initial guess is used for all LEDs if None. Default is None.
+    :type warm_start_params: Optional[Dict[int, Dict[int, np.ndarray]]]
+    :param led_templates: Shape parameters per channel and LED id as returned by create_led_templates. If given, only
+        the amplitude of LEDs with a template is fitted. Default is None.
+    :type led_templates: Optional[Dict[int, Dict[int, np.ndarray]]]
+    :return: A list, ordered like channels, of lists of LEDAnalysisData objects containing analysis results.
+    :rtype: List[List[LEDAnalysisData]]
+    """
+    if img_rois is None:
+        img_rois = _read_rois_of_img(img_filename, channels, search_areas, conf)
+    rois_of_channels, subsampling = img_rois
+    img_analysis_data = []
+    for channel, rois in zip(channels, rois_of_channels):
+        channel_warm_start_params = None
+        if warm_start_params is not None:
+            channel_warm_start_params = warm_start_params.setdefault(channel, {})
+        channel_led_templates = led_templates.get(channel) if led_templates is not None else None
+        img_analysis_data.append(_generate_img_analysis_data(img_filename, channel, rois, search_areas, line_indices,
+                                                             conf, fit_leds, subsampling=subsampling,
+                                                             warm_start_params=channel_warm_start_params,
+                                                             led_templates=channel_led_templates))
     return img_analysis_data
 
 
+def generate_statistics_of_channels(img_filename: str, channels: List[int], search_areas: np.ndarray,
+                                    line_indices: List[List[int]], conf: ConfigData,
+                                    img_rois: Optional[Tuple[List[np.ndarray], int]] = None) -> List[np.ndarray]:
+    """
+    Compute the pixel value statistics of all LEDs for several color channels of the given image without fitting.
+    The statistics of all LEDs of a channel are computed at once on the ROI stack.
+
+    :param img_filename: The filename of the image to be analyzed.
+    :type img_filename: str
+    :param channels: The color channels to be considered during analysis.
+    :type channels: List[int]
+    :param search_areas: A numpy array containing the search areas for LEDs.
+    :type search_areas: np.ndarray
+    :param line_indices: IDs indicating the LEDs in the arrays.
+    :type line_indices: List[List[int]]
+    :param conf: Configuration data for analysis.
+    :type conf: ConfigData
+    :param img_rois: Already read ROI stacks and sub-sampling factor of the image, as yielded by prefetch_rois_of_imgs.
+        The image is read if None. Default is None.
+    :type img_rois: Optional[Tuple[List[np.ndarray], int]]
+    :return: A list, ordered like channels, of structured arrays as returned by calc_roi_statistics.
+    :rtype: List[np.ndarray]
+    """
+    if img_rois is None:
+        img_rois = _read_rois_of_img(img_filename, channels, search_areas, conf)
+    rois_of_channels, _ = img_rois
+    led_ids, lines = _get_leds_to_analyse(line_indices, conf)
+    return [calc_roi_statistics(rois, led_ids, lines) for rois in rois_of_channels]
+
+
+def prefetch_rois_of_imgs(img_filenames: List[str], channels: List[int], search_areas: np.ndarray, conf: ConfigData,
+                          num_prefetch: int) -> Iterator[Tuple[str, Tuple[List[np.ndarray], int]]]:
+    """
+    Read the ROI stacks of the given color channels of several images in order. The next num_prefetch images are read
+    on a thread pool while the current image is processed by the caller. No image is read in advance if num_prefetch
+    is 0.
+
+    :param img_filenames: The filenames of the images to be read.
+    :type img_filenames: List[str]
+    :param channels: The color channels to be read.
+    :type channels: List[int]
+    :param search_areas: A numpy array containing the search areas for LEDs.
+    :type search_areas: np.ndarray
+    :param conf: Configuration data for analysis.
+    :type conf: ConfigData
+    :param num_prefetch: Number of images to read in advance.
+    :type num_prefetch: int
+    :return: Iterator over the filename and the ROI stacks with their sub-sampling factor of every image.
+    :rtype: Iterator[Tuple[str, Tuple[List[np.ndarray], int]]]
+    """
+    if num_prefetch < 1:
+        for img_filename in img_filenames:
+            yield img_filename, _read_rois_of_img(img_filename, channels, search_areas, conf)
+        return
+
+    with ThreadPoolExecutor(max_workers=num_prefetch) as executor:
+        pending_imgs = deque()
+        for img_filename in img_filenames:
+            pending_imgs.append((img_filename, executor.submit(_read_rois_of_img, img_filename, channels,
+                                                               search_areas, conf)))
+            if len(pending_imgs) > num_prefetch:
+                next_img_filename, img_rois = pending_imgs.popleft()
+                yield next_img_filename, img_rois.result()
+        while pending_imgs:
+            next_img_filename, img_rois = pending_imgs.popleft()
+            yield next_img_filename, img_rois.result()
+
+
+def create_led_templates(img_data_of_ref_imgs: List[List[LEDAnalysisData]]) -> Dict[int, np.ndarray]:
+    """
+    Create the shape template of every LED from the full fits of the reference images of one channel.
+    The template of an LED is the median of its successfully fitted parameters.
+
+    :param img_data_of_ref_imgs: The analysis data of all reference images.
+    :type img_data_of_ref_imgs: List[List[LEDAnalysisData]]
+    :return: The fit parameters of the template per LED id.
+    :rtype: Dict[int, np.ndarray]
+    """
+    params_per_led = {}
+    for img_data in img_data_of_ref_imgs:
+        for led_data in img_data:
+            if led_data.fit_results.success:
+                params_per_led.setdefault(led_data.led_id, []).append(led_data.fit_results.x)
+    return {led_id: np.median(params, axis=0) for led_id, params in params_per_led.items()}
+
+
+def get_led_templates_hash(search_areas: np.ndarray, ref_img_filenames: List[str], conf: ConfigData) -> str:
+    """
+    Compute a hash identifying the LED shape templates created from the given search areas and reference images with
+    the options in the 'analyse_photo' section, like the ROI stacks are identified by get_search_areas_hash.
+
+    :param search_areas: A numpy array containing the search areas for LEDs.
+    :type search_areas: np.ndarray
+    :param ref_img_filenames: Names of the reference images the templates are created from.
+    :type ref_img_filenames: List[str]
+    :param conf: Configuration data for analysis.
+    :type conf: ConfigData
+    :return: Hexadecimal SHA-1 digest.
+    :rtype: str
+    """
+    window_radius = int(conf['find_search_areas']['window_radius'])
+    bayer_planes = conf['analyse_photo'].getboolean('bayer_planes', fallback=False)
+    average_greens = conf['analyse_photo'].getboolean('average_greens', fallback=True)
+    fit_solver = conf['analyse_photo'].get('fit_solver', 'nelder-mead')
+    return get_search_areas_hash(search_areas, window_radius,
+                                 f'{bayer_planes},{average_greens},{fit_solver},{",".join(ref_img_filenames)}')
+
+
+def _get_led_templates_path(channel: int, templates_hash: str) -> str:
+    """
+    Get the path of the LED shape templates of a channel.
+
+    :param channel: Color channel of the templates.
+    :type channel: int
+    :param templates_hash: Hash of the search areas and options the templates are created with, see
+        get_led_templates_hash.
+    :type templates_hash: str
+    :return: Path of the templates.
+    :rtype: str
+    """
+    return os.path.join('analysis', f'channel{channel}', f'led_templates_{templates_hash}.csv')
+
+
+def save_led_templates(led_templates: Dict[int, np.ndarray], channel: int, templates_hash: str) -> None:
+    """
+    Save the LED shape templates of a channel to 'led_templates_<templates_hash>.csv'.
+
+    :param led_templates: The fit parameters of the template per LED id.
+    :type led_templates: Dict[int, np.ndarray]
+    :param channel: Color channel of the templates.
+    :type channel: int
+    :param templates_hash: Hash of the search areas and options the templates are created with, see
+        get_led_templates_hash.
+    :type templates_hash: str
+    """
+    file_path = _get_led_templates_path(channel, templates_hash)
+    templates = [[led_id, *params] for led_id, params in sorted(led_templates.items())]
+    np.savetxt(file_path, np.reshape(templates, (-1, 9)), delimiter=',', header='id,x,y,dx,dy,A,alpha,wx,wy',
+               fmt=['%d'] + ['%.10e'] * 8)
+
+
+def load_led_templates(channel: int, templates_hash: str) -> Optional[Dict[int, np.ndarray]]:
+    """
+    Load the LED shape templates of a channel from 'led_templates_<templates_hash>.csv'. Templates created from other
+    search areas or with other options are not loaded.
+
+    :param channel: Color channel of the templates.
+    :type channel: int
+    :param templates_hash: Hash of the search areas and options the templates are created with, see
+        get_led_templates_hash.
+    :type templates_hash: str
+    :return: The fit parameters of the template per LED id or None if the file does not exist.
+    :rtype: Optional[Dict[int, np.ndarray]]
+    """
+    file_path = _get_led_templates_path(channel, templates_hash)
+    if not os.path.exists(file_path):
+        return None
+    templates = read_table(file_path, delim=',', silent=True, atleast_2d=True)
+    return {int(template[0]): template[1:] for template in templates if template.size == 9}
+
+
 def create_fit_result_file(img_data: List[LEDAnalysisData], img_id: int, channel: int) -> None: # TODO: rename because misleading
     """
       Create a result file for a single image, containing the pixel values and, if applicable, the fit results of all LEDs.
@@ -70,45 +275,436 @@ def create_fit_result_file(img_data: List[LEDAnalysisData], img_id: int, channel
       :param channel: Color channel being analyzed.
       :type channel: int
       """
-    file_path = os.path.join('analysis', 'image_infos_analysis.csv')
-    img_infos = read_table(file_path, dtype='str', delim=',', silent=True, atleast_2d=True)
+    img_catalogue = get_image_catalogue()
+    basename = os.path.basename(os.getcwd())
+    img_filename = img_catalogue.get_img_name(img_id)
+    experiment_time = img_catalogue.get_experiment_time(img_id)
+
+    _save_results_in_file(channel, img_data, img_filename, img_id, experiment_time, basename)
+
+
+def create_statistics_result_file(img_statistics: np.ndarray, img_id: int, channel: int) -> None:
+    """
+    Create a result file for a single image, containing the pixel value statistics of all LEDs.
+    The file has the same format as the one written by create_fit_result_file without fits.
+
+    :param img_statistics: Structured array with the pixel value statistics of all LEDs.
+    :type img_statistics: np.ndarray
+    :param img_id: Identifier for the image.
+    :type img_id: int
+    :param channel: Color channel being analyzed.
+    :type channel: int
+    """
+    img_catalogue = get_image_catalogue()
+    basename = os.path.basename(os.getcwd())
+    img_filename = img_catalogue.get_img_name(img_id)
+    experiment_time = img_catalogue.get_experiment_time(img_id)
+
+    max_fmt = '%d' if np.issubdtype(img_statistics.dtype['max_col_val'], np.integer) else '%.8g'
+    file_path = os.path.join('analysis', f'channel{channel}', f'{img_id}_led_positions.csv')
+    with open(file_path, 'w') as out_file:
+        out_file.write(_create_header(channel, img_id, img_filename, experiment_time, basename, False))
+        np.savetxt(out_file, img_statistics, fmt=['%4d', '%2d', '%10.4e', '%10.4e', max_fmt], delimiter=',')
+
+
+def create_result_array(img_data: List[LEDAnalysisData], img_id: int) -> np.ndarray:
+    """
+    Convert the analysis data of all LEDs of an image into typed rows for the result store.
+
+    :param img_data: A list, containing LEDAnalysisData objects with pixel values and, if applicable, the fit results of all LEDs.
+    :type img_data: List[LEDAnalysisData]
+    :param img_id: Identifier for the image.
+    :type img_id: int
+    :return: Structured array with a data type as returned by get_result_dtype.
+    :rtype: np.ndarray
+    """
+    fit_leds = len(img_data) > 0 and img_data[0].fit_leds
+    results = np.zeros(len(img_data), dtype=get_result_dtype(fit_leds))
+    results['img_id'] = img_id
+    results['led_id'] = [led_data.led_id for led_data in img_data]
+    results['line'] = [led_data.led_array for led_data in img_data]
+    results['sum_col_val'] = [led_data.sum_color_value for led_data in img_data]
+    results['mean_col_val'] = [led_data.mean_color_value for led_data in img_data]
+    results['max_col_val'] = [led_data.max_color_value for led_data in img_data]
+    if fit_leds:
+        results['led_center_x'] = [led_data.led_center_x for led_data in img_data]
+        results['led_center_y'] = [led_data.led_center_y for led_data in img_data]
+        fit_params = np.array([led_data.fit_results.x for led_data in img_data]).reshape(-1, 8)
+        for idx, column in enumerate(['x', 'y', 'dx', 'dy', 'A', 'alpha', 'wx', 'wy']):
+            results[column] = fit_params[:, idx]
+        results['fit_success'] = [led_data.fit_results.success for led_data in img_data]
+        results['fit_fun'] = [led_data.fit_results.fun for led_data in img_data]
+        results['fit_nfev'] = [led_data.fit_results.nfev for led_data in img_data]
+        results['fit_time'] = [led_data.fit_time for led_data in img_data]
+    return results
+
+
+def create_statistics_result_array(img_statistics: np.ndarray, img_id: int) -> np.ndarray:
+    """
+    Convert the pixel value statistics of all LEDs of an image into typed rows for the result store.
+
+    :param img_statistics: Structured array with the pixel value statistics of all LEDs.
+    :type img_statistics: np.ndarray
+    :param img_id: Identifier for the image.
+    :type img_id: int
+    :return: Structured array with a data type as returned by get_result_dtype.
+    :rtype: np.ndarray
+    """
+    results = np.zeros(len(img_statistics), dtype=get_result_dtype(False))
+    results['img_id'] = img_id
+    for column in img_statistics.dtype.names:
+        results[column] = img_statistics[column]
+    return results
+
+
+def create_result_file(results: np.ndarray, img_id: int, channel: int) -> None:
+    """
+    Create a result file for a single image from the typed rows of the result store.
+    The file has a column for every field of the rows except the image id, in the order of the header written by
+    _create_header. With fits, these are the pixel value statistics, the LED center, the eight fit parameters, the fit
+    success, the residual, the number of function evaluations and the fit time.
+
+    :param results: Structured array with a data type as returned by get_result_dtype.
+    :type results: np.ndarray
+    :param img_id: Identifier for the image.
+    :type img_id: int
+    :param channel: Color channel being analyzed.
+    :type channel: int
+    """
+    img_catalogue = get_image_catalogue()
     basename = os.path.basename(os.getcwd())
-    img_filename = get_img_name(img_id)
+    img_filename = img_catalogue.get_img_name(img_id)
+    experiment_time = img_catalogue.get_experiment_time(img_id)
 
-    _save_results_in_file(channel, img_data, img_filename, img_id, img_infos, basename)
+    fit_leds = 'fit_success' in results.dtype.names
+    columns = [name for name in results.dtype.names if name != 'img_id']
+    fmt = ['%4d', '%2d', '%10.4e', '%10.4e', '%.8g']
+    if fit_leds:
+        fmt += ['%10.4e'] * 10 + ['%12d', '%10.4e', '%9d', '%10.4e']
+    file_path = os.path.join('analysis', f'channel{channel}', f'{img_id}_led_positions.csv')
+    with open(file_path, 'w') as out_file:
+        out_file.write(_create_header(channel, img_id, img_filename, experiment_time, basename, fit_leds))
+        np.savetxt(out_file, results[columns], fmt=fmt, delimiter=',')
 
 
 def create_imgs_to_process_file() -> None:
     """
     Create a file with filenames of images that need to be processed.
     """
-    file_path = os.path.join('analysis', 'image_infos_analysis.csv')
-    image_infos = read_table(file_path, dtype='str', delim=',', atleast_2d=True)
-    img_filenames = image_infos[:, 1]
+    img_filenames = get_image_catalogue().img_names
     out_file = open('images_to_process.csv', 'w')
     for img in img_filenames:
         out_file.write('{}\n'.format(img))
     out_file.close()
 
 
-def find_and_save_not_analysed_imgs(channel: int) -> None:
+def start_journal(channels: List[int], fit_mode: str) -> None:
     """
-    Find and save filenames of images that have not yet been analyzed.
+    Start a new journal of processed images, recording the channels and the fit mode of the run in its first line,
+    so that a restart continues the run with the same settings.
 
-    :param channel: Channel to check for analyzed images.
-    :type channel: int
+    :param channels: Color channels processed in the run.
+    :type channels: List[int]
+    :param fit_mode: 'full' or 'template' if the LEDs are fitted, 'none' otherwise.
+    :type fit_mode: str
     """
-    file_path = os.path.join('analysis', 'image_infos_analysis.csv')
-    image_infos = read_table(file_path, dtype='str', delim=',', atleast_2d=True)
-    all_imgs = image_infos[:, 1]
-    processed_img_ids = _find_analysed_img_ids(channel)
-    processed_imgs = np.frompyfunc(get_img_name, 1, 1)(processed_img_ids)
-    remaining_imgs = set(all_imgs)-set(processed_imgs)
+    with open(_get_journal_path(), 'w') as out_file:
+        out_file.write(f'# run,{fit_mode},{" ".join(str(channel) for channel in channels)}\n')
+
+
+def read_journal_run() -> Optional[Tuple[List[int], str]]:
+    """
+    Read the channels and the fit mode of the run recorded by start_journal.
+
+    :return: The channels and the fit mode, or None if there is no journal or it was written by an older version.
+    :rtype: Optional[Tuple[List[int], str]]
+    """
+    if not os.path.exists(_get_journal_path()):
+        return None
+    with open(_get_journal_path()) as in_file:
+        first_line = in_file.readline()
+    if not first_line.startswith('# run,') or not first_line.endswith('\n'):
+        return None
+    _, fit_mode, channels = first_line.rstrip('\n').split(',')
+    return [int(channel) for channel in channels.split()], fit_mode
+
+
+def append_to_journal(img_id: int, channels: List[int], fit_mode: str) -> None:
+    """
+    Record in the journal 'analysis/processed_imgs.csv' that the results of an image were persisted.
+    The entries are written with a single write call to the end of the file, so that entries of concurrent processes
+    do not interleave and an interrupted run leaves at most an incomplete last line, which is ignored when reading.
+    The entries are started on a new line if the file does not end with one.
+
+    :param img_id: Identifier for the image.
+    :type img_id: int
+    :param channels: Color channels whose results were persisted.
+    :type channels: List[int]
+    :param fit_mode: 'full' or 'template' if the LEDs were fitted, 'none' otherwise.
+    :type fit_mode: str
+    """
+    entries = ''.join(f'{int(img_id)},{channel},{fit_mode}\n' for channel in channels)
+    fd = os.open(_get_journal_path(), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        size = os.fstat(fd).st_size
+        if size > 0 and os.pread(fd, 1, size - 1) != b'\n':
+            entries = '\n' + entries
+        os.write(fd, entries.encode())
+    finally:
+        os.close(fd)
+
+
+def read_journal() -> Optional[Set[Tuple[int, int, str]]]:
+    """
+    Read the journal of processed images.
+
+    :return: The (img_id, channel, fit_mode) entries of the journal, or None if there is no journal.
+    :rtype: Optional[Set[Tuple[int, int, str]]]
+    """
+    file_path = _get_journal_path()
+    if not os.path.exists(file_path):
+        return None
+    entries = set()
+    with open(file_path) as in_file:
+        for line in in_file:
+            if not line.endswith('\n') or line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split(',')
+            # the remainder of an interrupted entry is followed by the entries of the next run on a new line
+            if len(fields) != 3 or fields[2] not in ['none', 'full', 'template']:
+                continue
+            img_id, channel, fit_mode = fields
+            entries.add((int(img_id), int(channel), fit_mode))
+    return entries
+
+
+def remove_binary_results(channels: List[int]) -> None:
+    """
+    Remove the binary results of the given channels, if they exist. These are the result store or the binary file
+    converted from the result files, which also holds the record of the converted images and the derived quantities,
+    and the result cube exported from it.
+
+    :param channels: Channels whose binary results are removed.
+    :type channels: List[int]
+    """
+    for channel in channels:
+        cube_path = get_result_cube_path(channel)
+        for file_path in [get_result_store_path(channel), cube_path, os.path.splitext(cube_path)[0] + '.json']:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+def find_and_save_not_analysed_imgs(channels: List[int], fit_mode: str, result_format='csv') -> None:
+    """
+    Find and save filenames of images that have not yet been analyzed in all of the given channels.
+    The processed images are taken from the journal. If the results are written to result files, images whose result
+    files were removed since are analysed again. Without journal, e.g. for runs of older versions, the result files in
+    the channel directories are used.
+
+    :param channels: Channels to check for analyzed images.
+    :type channels: List[int]
+    :param fit_mode: 'full' or 'template' if the LEDs are fitted, 'none' otherwise. Images processed with another
+        fit mode are analysed again.
+    :type fit_mode: str
+    :param result_format: 'csv' if the results are written to result files, 'hdf' if they are appended to the result
+        store. Defaults to 'csv'.
+    :type result_format: str
+    """
+    img_catalogue = get_image_catalogue()
+    processed = read_journal()
+    analysed_img_ids = {channel: set(_find_analysed_img_ids(channel)) for channel in channels}
+    if processed is None:
+        processed = {(img_id, channel, fit_mode) for channel in channels for img_id in analysed_img_ids[channel]}
+    elif result_format != 'hdf':
+        processed = {(img_id, channel, img_fit_mode) for img_id, channel, img_fit_mode in processed
+                     if channel not in analysed_img_ids or img_id in analysed_img_ids[channel]}
+    remaining_imgs = [img_filename for img_id, img_filename in zip(img_catalogue.img_ids, img_catalogue.img_names)
+                      if any((int(img_id), channel, fit_mode) not in processed for channel in channels)]
 
     _save_list_of_remaining_imgs_needed_to_be_processed(remaining_imgs)
 
 
-def _generate_led_analysis_data(conf: ConfigData, channel: int, data: np.ndarray, debug: bool, iled: int, img_filename: str, led_array_idx: int, search_areas: np.ndarray, window_radius: int, fit_leds: bool = True) -> LEDAnalysisData:
+def _read_rois_of_img(img_filename: str, channels: List[int], search_areas: np.ndarray,
+                      conf: ConfigData) -> Tuple[List[np.ndarray], int]:
+    """
+    Read the ROI stacks of the given color channels of an image according to the options in the 'analyse_photo'
+    section. If 'cache_rois' is set, existing ROI stacks are loaded instead of decoding the image and the ROI stacks of
+    newly decoded images are saved.
+
+    :param img_filename: The filename of the image to be read.
+    :type img_filename: str
+    :param channels: The color channels to be read.
+    :type channels: List[int]
+    :param search_areas: A numpy array containing the search areas for LEDs.
+    :type search_areas: np.ndarray
+    :param conf: Configuration data for analysis.
+    :type conf: ConfigData
+    :return: The ROI stacks of all channels and the factor by which they are sub-sampled compared to the image.
+    :rtype: Tuple[List[np.ndarray], int]
+    """
+    file_path = os.path.join(conf['DEFAULT']['img_directory'], img_filename)
+    bayer_planes = conf['analyse_photo'].getboolean('bayer_planes', fallback=False)
+    average_greens = conf['analyse_photo'].getboolean('average_greens', fallback=True)
+    cache_rois = conf['analyse_photo'].getboolean('cache_rois', fallback=False)
+    subsampling = get_subsampling_factor(file_path, bayer_planes)
+    plane_search_areas, window_radius = _get_plane_geometry(search_areas, conf, subsampling)
+
+    if cache_rois:
+        search_areas_hash = get_search_areas_hash(plane_search_areas, window_radius,
+                                                  f'{bayer_planes},{average_greens},{subsampling}')
+        rois = load_roi_stacks(img_filename, channels, search_areas_hash)
+        if rois is not None:
+            return rois, subsampling
+
+    channel_data = read_channels(file_path, channels, bayer_planes=bayer_planes, average_greens=average_greens)
+    rois = [extract_roi_stack(data, plane_search_areas, window_radius) for data in channel_data]
+    if cache_rois:
+        save_roi_stacks(img_filename, channels, rois, search_areas_hash)
+    return rois, subsampling
+
+
+def _get_plane_geometry(search_areas: np.ndarray, conf: ConfigData, subsampling: int) -> Tuple[np.ndarray, int]:
+    """
+    Get the search areas and window radius in the coordinates of the, possibly sub-sampled, image plane.
+
+    :param search_areas: A numpy array containing the search areas for LEDs.
+    :type search_areas: np.ndarray
+    :param conf: Configuration data for analysis.
+    :type conf: ConfigData
+    :param subsampling: Factor by which the image plane is sub-sampled.
+    :type subsampling: int
+    :return: The search areas and the window radius in plane coordinates.
+    :rtype: Tuple[np.ndarray, int]
+    """
+    window_radius = int(conf['find_search_areas']['window_radius'])
+    if subsampling > 1:
+        search_areas = _map_search_areas_to_plane(search_areas, subsampling)
+        window_radius = max(window_radius // subsampling, 1)
+    return search_areas, window_radius
+
+
+def _map_search_areas_to_plane(search_areas: np.ndarray, subsampling: int) -> np.ndarray:
+    """
+    Map the pixel positions of the search areas to the coordinates of a sub-sampled image plane.
+
+    :param search_areas: A numpy array containing the search areas for LEDs.
+    :type search_areas: np.ndarray
+    :param subsampling: Factor by which the image plane is sub-sampled.
+    :type subsampling: int
+    :return: A copy of the search areas with pixel positions in plane coordinates.
+    :rtype: np.ndarray
+    """
+    plane_search_areas = np.array(search_areas, copy=True)
+    plane_search_areas[:, 1:3] = plane_search_areas[:, 1:3] // subsampling
+    return plane_search_areas
+
+
+def _map_plane_coordinate_to_img(coordinate: float, subsampling: int, offset: float) -> float:
+    """
+    Map a coordinate on a sub-sampled image plane to the image. Pixel i of the plane is pixel
+    subsampling * i + offset of the image, the centers of the pixels, at i + 0.5, are mapped onto each other.
+
+    :param coordinate: Coordinate on the plane.
+    :type coordinate: float
+    :param subsampling: Factor by which the image plane is sub-sampled.
+    :type subsampling: int
+    :param offset: Position of the first pixel of the plane on the image along the coordinate.
+    :type offset: float
+    :return: Coordinate on the image.
+    :rtype: float
+    """
+    return subsampling * coordinate + offset - (subsampling - 1) / 2
+
+
+def _get_leds_to_analyse(line_indices: List[List[int]], conf: ConfigData) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the IDs of all LEDs to be analysed together with the index of their LED array, in the order of line_indices.
+    Only LEDs with an ID divisible by skip_leds + 1 are considered.
+
+    :param line_indices: IDs indicating the LEDs in the arrays.
+    :type line_indices: List[List[int]]
+    :param conf: Configuration data for analysis.
+    :type conf: ConfigData
+    :return: The LED IDs and the index of the LED array of every LED.
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    led_ids = np.concatenate([np.atleast_1d(line) for line in line_indices]).astype(int)
+    lines = np.repeat(np.arange(len(line_indices)), [np.size(line) for line in line_indices])
+    mask = led_ids % (int(conf['analyse_photo']['skip_leds']) + 1) == 0
+    return led_ids[mask], lines[mask]
+
+
+def _generate_img_analysis_data(img_filename: str, channel: int, rois: np.ndarray, search_areas: np.ndarray,
+                                line_indices: List[List[int]], conf: ConfigData, fit_leds=True, debug=False,
+                                debug_led=None, subsampling=1,
+                                warm_start_params: Optional[Dict[int, np.ndarray]] = None,
+                                led_templates: Optional[Dict[int, np.ndarray]] = None) -> List[LEDAnalysisData]:
+    """
+    Generate LED analysis data for a single color channel of an already read image.
+    If the ROIs are taken from a sub-sampled plane, search areas and window radius are mapped to plane coordinates.
+
+    :param img_filename: The filename of the image to be analyzed.
+    :type img_filename: str
+    :param channel: The color channel of the ROIs.
+    :type channel: int
+    :param rois: Array with the windows around all search areas of the channel, indexed by LED id.
+    :type rois: np.ndarray
+    :param search_areas: A numpy array containing the search areas for LEDs.
+    :type search_areas: np.ndarray
+    :param line_indices: IDs indicating the LEDs in the arrays.
+    :type line_indices: List[List[int]]
+    :param conf: Configuration data for analysis.
+    :type conf: ConfigData
+    :param fit_leds: Whether to fit the LED model to the data. Default is True.
+    :type fit_leds: bool
+    :param debug: If True, the function will run in debug mode. Default is False.
+    :type debug: bool
+    :param debug_led: The specific LED to debug. Default is None.
+    :type debug_led: Optional[int]
+    :param subsampling: Factor by which the ROIs are sub-sampled compared to the image. Default is 1.
+    :type subsampling: int
+    :param warm_start_params: Converged fit parameters of the previous image per LED id, updated with the results of
+        this image. Default is None.
+    :type warm_start_params: Optional[Dict[int, np.ndarray]]
+    :param led_templates: Shape parameters per LED id. Only the amplitude of LEDs with a template is fitted.
+        Default is None.
+    :type led_templates: Optional[Dict[int, np.ndarray]]
+    :return: A list of LEDAnalysisData objects containing analysis results.
+    :rtype: List[LEDAnalysisData]
+    """
+    search_areas, window_radius = _get_plane_geometry(search_areas, conf, subsampling)
+    plane_offset = (0., 0.)
+    if fit_leds and subsampling > 1:
+        plane_offset = get_plane_offset(os.path.join(conf['DEFAULT']['img_directory'], img_filename), channel,
+                                        conf['analyse_photo'].getboolean('average_greens', fallback=True))
+    img_analysis_data = []
+
+    if debug:
+        analysis_res = _generate_led_analysis_data(conf, channel, rois, debug, debug_led, img_filename, 0, search_areas,
+                                                   window_radius, fit_leds, subsampling, plane_offset=plane_offset)
+        return analysis_res
+
+    batched_fit_results = None
+    if fit_leds and conf['analyse_photo'].get('fit_solver', 'nelder-mead') == 'batched':
+        led_ids, _ = _get_leds_to_analyse(line_indices, conf)
+        if led_templates is not None:
+            led_ids = np.array([iled for iled in led_ids if iled not in led_templates], dtype=int)
+        batched_fit_results = _fit_model_to_leds_batched(rois, led_ids, warm_start_params)
+
+    num_of_arrays = len(line_indices)
+    for led_array_idx in range(num_of_arrays):
+        print('processing LED array ', led_array_idx, '...')
+        for iled in line_indices[led_array_idx]:
+            if iled % (int(conf['analyse_photo']['skip_leds']) + 1) == 0:
+                led_analysis_data = _generate_led_analysis_data(conf, channel, rois, debug, iled, img_filename,
+                                                                led_array_idx, search_areas, window_radius, fit_leds,
+                                                                subsampling, warm_start_params, led_templates,
+                                                                batched_fit_results, plane_offset)
+                img_analysis_data.append(led_analysis_data)
+    return img_analysis_data
+
+
+def _generate_led_analysis_data(conf: ConfigData, channel: int, rois: np.ndarray, debug: bool, iled: int, img_filename: str, led_array_idx: int, search_areas: np.ndarray, window_radius: int, fit_leds: bool = True, subsampling: int = 1, warm_start_params: Optional[Dict[int, np.ndarray]] = None, led_templates: Optional[Dict[int, np.ndarray]] = None, batched_fit_results: Optional[Dict[int, Tuple[scipy.optimize.OptimizeResult, float]]] = None, plane_offset: Tuple[float, float] = (0., 0.)) -> LEDAnalysisData:
     """
     Generate analysis data for a specific LED.
 
@@ -116,8 +712,8 @@ def _generate_led_analysis_data(conf: ConfigData, channel: int, data: np.ndarray
     :type conf: ConfigData
     :param channel: Color Channel for which analysis should be generated.
     :type channel: int
-    :param data: Array representing the image data.
-    :type data: np.ndarray
+    :param rois: Array with the windows around all search areas, indexed by LED id.
+    :type rois: np.ndarray
     :param debug: If True, enters debug mode.
     :type debug: bool
     :param iled: ID of the LED for which analysis should be generated.
@@ -132,38 +728,66 @@ def _generate_led_analysis_data(conf: ConfigData, channel: int, data: np.ndarray
     :type window_radius: int
     :param fit_leds: If True, the LED is fitted to a model function.
     :type fit_leds: bool
+    :param subsampling: Factor by which the ROIs are sub-sampled compared to the image. LED centers are mapped back to
+        image coordinates, the other fit parameters stay in pixels of the sub-sampled window.
+    :type subsampling: int
+    :param warm_start_params: Converged fit parameters of the previous image per LED id. The fit of the LED starts
+        from its entry if present and the entry is replaced by the result, or removed if the fit failed.
+    :type warm_start_params: Optional[Dict[int, np.ndarray]]
+    :param led_templates: Shape parameters per LED id. If the LED has a template, only its amplitude and, if
+        'template_fit_shift' is set, its center is fitted.
+    :type led_templates: Optional[Dict[int, np.ndarray]]
+    :param batched_fit_results: Results and fit times of LEDs already fitted together with the other LEDs of the
+        image, see _fit_model_to_leds_batched. If the LED has an entry, it is used instead of fitting again.
+    :type batched_fit_results: Optional[Dict[int, Tuple[scipy.optimize.OptimizeResult, float]]]
+    :param plane_offset: Position of the first pixel of the sub-sampled plane on the image, see get_plane_offset.
+    :type plane_offset: Tuple[float, float]
     :return: Analysis data for the LED.
     :rtype: LEDAnalysisData
     """
     led_data = LEDAnalysisData(iled, led_array_idx, fit_leds)
     center_search_area_x = int(search_areas[iled, 1])
     center_search_area_y = int(search_areas[iled, 2])
-    search_area = np.index_exp[center_search_area_x - window_radius:
-                               center_search_area_x + window_radius,
-                               center_search_area_y - window_radius:
-                               center_search_area_y + window_radius]
+    search_area = rois[iled]
 
     if fit_leds:
         start_time = time.process_time()
-        led_data.fit_results, mesh = _fit_model_to_led(data[search_area])
+        x0 = warm_start_params.get(iled) if warm_start_params is not None else None
+        led_template = led_templates.get(iled) if led_templates is not None else None
+        fit_time = None
+        if batched_fit_results is not None and iled in batched_fit_results:
+            led_data.fit_results, fit_time = batched_fit_results[iled]
+        elif led_template is not None:
+            fit_shift = conf['analyse_photo'].getboolean('template_fit_shift', fallback=False)
+            led_data.fit_results, mesh = _fit_template_to_led(search_area, led_template, fit_shift)
+        else:
+            led_data.fit_results, mesh = _fit_model_to_led(search_area, conf['analyse_photo'].get('fit_solver',
+                                                                                              'nelder-mead'), x0)
         end_time = time.process_time()
-        led_data.fit_time = end_time - start_time
-        led_data.led_center_x = led_data.fit_results.x[0] + center_search_area_x - window_radius
-        led_data.led_center_y = led_data.fit_results.x[1] + center_search_area_y - window_radius
+        if warm_start_params is not None:
+            if led_data.fit_results.success:
+                warm_start_params[iled] = led_data.fit_results.x
+            else:
+                warm_start_params.pop(iled, None)
+        led_data.fit_time = end_time - start_time if fit_time is None else fit_time
+        led_data.led_center_x = _map_plane_coordinate_to_img(
+            led_data.fit_results.x[0] + center_search_area_x - window_radius, subsampling, plane_offset[0])
+        led_data.led_center_y = _map_plane_coordinate_to_img(
+            led_data.fit_results.x[1] + center_search_area_y - window_radius, subsampling, plane_offset[1])
         if debug:
             return led_data.fit_results.x
         if not led_data.fit_results.success:  # A > 255 or A < 0:
             _log_warnings(img_filename, channel, led_data, center_search_area_x, center_search_area_y,
-                          data[search_area].shape, window_radius, conf)
+                          search_area.shape, window_radius, conf)
 
-    led_data.mean_color_value = np.mean(data[search_area])
-    led_data.sum_color_value = np.sum(data[search_area])
-    led_data.max_color_value = np.amax(data[search_area])
+    led_data.mean_color_value = np.mean(search_area)
+    led_data.sum_color_value = np.sum(search_area)
+    led_data.max_color_value = np.amax(search_area)
 
     return led_data
 
 
-def _save_results_in_file(channel: int, img_data: LEDAnalysisData, img_filename: str, img_id: str, img_infos: np.ndarray, basename: str) -> None:
+def _save_results_in_file(channel: int, img_data: LEDAnalysisData, img_filename: str, img_id: str, experiment_time: float, basename: str) -> None:
     """
     Save analysis results to a file.
 
@@ -175,20 +799,30 @@ def _save_results_in_file(channel: int, img_data: LEDAnalysisData, img_filename:
     :type img_filename: str
     :param img_id: Identifier for the image.
     :type img_id: int
-    :param img_infos: An array containing the image IDs, image filenames, capture time and experiment time for all images.
-    :type img_infos: np.ndarray
+    :param experiment_time: Experiment time of the image in seconds.
+    :type experiment_time: float
     :param basename: Base name for the file to save.
     :type basename: str
     """
     file_path = os.path.join('analysis', f'channel{channel}', f'{img_id}_led_positions.csv')
     out_file = open(file_path, 'w')
-    header = _create_header(channel, img_id, img_filename, img_infos, basename, img_data[0].fit_leds)
+    header = _create_header(channel, img_id, img_filename, experiment_time, basename, img_data[0].fit_leds)
     out_file.write(header)
     for led_data in img_data:
         out_file.write(str(led_data))
     out_file.close()
 
 
+def _get_journal_path() -> str:
+    """
+    Get the path of the journal of processed images.
+
+    :return: Path of the journal.
+    :rtype: str
+    """
+    return os.path.join('analysis', 'processed_imgs.csv')
+
+
 def _find_analysed_img_ids(channel):
     """
     Find and save filenames of images that have not yet been analyzed.
@@ -220,31 +854,150 @@ def _save_list_of_remaining_imgs_needed_to_be_processed(remaining_imgs): # TODO:
     out_file.close()
 
 
-def _fit_model_to_led(search_area: np.ndarray) -> Tuple[scipy.optimize.OptimizeResult, List[np.ndarray]]:
+def _fit_model_to_led(search_area: np.ndarray, solver='nelder-mead',
+                      x0: Optional[np.ndarray] = None) -> Tuple[scipy.optimize.OptimizeResult, List[np.ndarray]]:
     """
     Fit a model to the LED in a specific search area.
 
     :param search_area: Part of the image where the LED is located.
     :type search_area: np.ndarray
+    :param solver: 'nelder-mead' to minimize target_function or 'least_squares' for a trust region fit of the
+        residuals with analytic Jacobian. Default is 'nelder-mead'.
+    :type solver: str
+    :param x0: Initial guess of the parameters, e.g. the result of the previous image. If None, the fit starts in the
+        center of the search area. Default is None.
+    :type x0: Optional[np.ndarray]
     :return: Result of the fit and mesh of the search area.
     :rtype: tuple[scipy.optimize.OptimizeResult, List[np.ndarray]]
     """
     nx = search_area.shape[0]
     ny = search_area.shape[1]
 
-    center_x = nx // 2
-    center_y = ny // 2
-    x0 = np.array([center_x, center_y, 2., 2., 200., 1.0, 1.0, 1.0])
+    if x0 is None:
+        center_x = nx // 2
+        center_y = ny // 2
+        x0 = np.array([center_x, center_y, 2., 2., 200., 1.0, 1.0, 1.0])
     x = np.linspace(0.5, nx - 0.5, nx)
     y = np.linspace(0.5, ny - 0.5, ny)
     mesh = np.meshgrid(x, y)
-    res = scipy.optimize.minimize(target_function, x0,
-                                  args=(search_area, mesh), method='nelder-mead',
+    if solver == 'least_squares':
+        return _fit_model_to_led_least_squares(search_area, x0, mesh), mesh
+    res = scipy.optimize.minimize(LEDFitObjective(search_area, mesh), x0, method='nelder-mead',
                                   options={'xatol': 1e-8, 'disp': False,
                                            'adaptive': False, 'maxiter': 10000})
     return res, mesh
 
 
+def _fit_model_to_leds_batched(rois: np.ndarray, led_ids: np.ndarray,
+                               warm_start_params: Optional[Dict[int, np.ndarray]] = None
+                               ) -> Dict[int, Tuple[scipy.optimize.OptimizeResult, float]]:
+    """
+    Fit the LED model to the windows of several LEDs simultaneously, see fit_led_model_batched.
+    As for the other solvers, fun of the results is the value of target_function at the solution.
+
+    :param rois: Array with the windows around all search areas, indexed by LED id.
+    :type rois: np.ndarray
+    :param led_ids: IDs of the LEDs to fit.
+    :type led_ids: np.ndarray
+    :param warm_start_params: Converged fit parameters of the previous image per LED id, used as initial guesses.
+        Default is None.
+    :type warm_start_params: Optional[Dict[int, np.ndarray]]
+    :return: Result of the fit and the share of the fit time per LED id.
+    :rtype: Dict[int, Tuple[scipy.optimize.OptimizeResult, float]]
+    """
+    if len(led_ids) == 0:
+        return {}
+    start_time = time.process_time()
+    windows = np.asarray(rois[led_ids])
+    nx, ny = windows.shape[1:]
+    x0 = np.tile([nx // 2, ny // 2, 2., 2., 200., 1.0, 1.0, 1.0], (len(led_ids), 1))
+    if warm_start_params is not None:
+        for led_idx, iled in enumerate(led_ids):
+            if iled in warm_start_params:
+                x0[led_idx] = warm_start_params[iled]
+    params, success, fun, nfev = fit_led_model_batched(windows, x0)
+    fit_time = (time.process_time() - start_time) / len(led_ids)
+    return {int(iled): (scipy.optimize.OptimizeResult(x=params[led_idx], success=bool(success[led_idx]),
+                                                      fun=fun[led_idx], nfev=int(nfev[led_idx])), fit_time)
+            for led_idx, iled in enumerate(led_ids)}
+
+
+def _fit_model_to_led_least_squares(search_area: np.ndarray, x0: np.ndarray,
+                                    mesh: List[np.ndarray]) -> scipy.optimize.OptimizeResult:
+    """
+    Fit the LED model to the search area with a bounded trust region least squares solver.
+    The penalties of target_function are replaced by bounds of the parameters. As for the other solver, fun of the
+    result is the value of target_function at the solution.
+
+    :param search_area: Part of the image where the LED is located.
+    :type search_area: np.ndarray
+    :param x0: Initial guess of the parameters.
+    :type x0: np.ndarray
+    :param mesh: Mesh grid values of x and y of the search area.
+    :type mesh: List[np.ndarray]
+    :return: Result of the fit.
+    :rtype: scipy.optimize.OptimizeResult
+    """
+    data = threshold_data(search_area)
+    lower, upper = get_parameter_bounds(mesh)
+    x0 = np.clip(x0, lower, upper)
+    res = scipy.optimize.least_squares(residual_function, x0, jac=residual_jacobian, bounds=(lower, upper),
+                                       method='trf', args=(data, mesh), xtol=1e-8)
+    res.fun = target_function(res.x, search_area, mesh)
+    return res
+
+
+def _fit_template_to_led(search_area: np.ndarray, led_template: np.ndarray,
+                         fit_shift=False) -> Tuple[scipy.optimize.OptimizeResult, List[np.ndarray]]:
+    """
+    Fit the LED model with the fixed shape of a template to the LED in a specific search area.
+    The amplitude is computed in closed form as linear least squares solution. If fit_shift is set, the center is
+    fitted together with the amplitude by a small least squares problem instead.
+
+    :param search_area: Part of the image where the LED is located.
+    :type search_area: np.ndarray
+    :param led_template: Fit parameters of the template of the LED.
+    :type led_template: np.ndarray
+    :param fit_shift: Whether to fit the center of the LED as well. Default is False.
+    :type fit_shift: bool
+    :return: Result of the fit and mesh of the search area. fun is the value of target_function at the solution.
+    :rtype: tuple[scipy.optimize.OptimizeResult, List[np.ndarray]]
+    """
+    nx = search_area.shape[0]
+    ny = search_area.shape[1]
+    x = np.linspace(0.5, nx - 0.5, nx)
+    y = np.linspace(0.5, ny - 0.5, ny)
+    mesh = np.meshgrid(x, y)
+    data = threshold_data(search_area)
+    params = np.array(led_template, dtype=float)
+
+    if fit_shift:
+        free = [0, 1, 4]
+        lower, upper = get_parameter_bounds(mesh)
+
+        def free_residuals(free_params):
+            params[free] = free_params
+            return residual_function(params, data, mesh)
+
+        def free_jacobian(free_params):
+            params[free] = free_params
+            return residual_jacobian(params, data, mesh)[:, free]
+
+        res = scipy.optimize.least_squares(free_residuals, np.clip(params[free], lower[free], upper[free]),
+                                           jac=free_jacobian, bounds=(lower[free], upper[free]), method='trf')
+        params[free] = res.x
+        success, nfev = res.success, res.nfev
+    else:
+        shape = led_model(mesh[0], mesh[1], *params[:4], 1., *params[5:])
+        norm = np.sum(shape ** 2)
+        success, nfev = bool(norm > 0), 1
+        params[4] = np.sum(shape * data) / norm if success else 0.
+
+    res = scipy.optimize.OptimizeResult(x=params, success=success, nfev=nfev,
+                                        fun=target_function(params, search_area, mesh))
+    return res, mesh
+
+
 def _log_warnings(img_filename, channel, led_data, cx, cy, size_of_search_area, window_radius, conf) -> None:
     """
     Log warnings that occur during LED fitting.
@@ -281,7 +1034,7 @@ def _log_warnings(img_filename, channel, led_data, cx, cy, size_of_search_area,
     logfile.close()
 
 
-def _create_header(channel: int, img_id: str, img_filename: str, img_infos: np.ndarray, basename: str, fit_leds: str):
+def _create_header(channel: int, img_id: str, img_filename: str, experiment_time: float, basename: str, fit_leds: str):
     """
     Create a header for the analysis result file.
 
@@ -291,8 +1044,8 @@ def _create_header(channel: int, img_id: str, img_filename: str, img_infos: np.n
     :type img_id: str
     :param img_filename: Name of the image.
     :type img_filename: str
-    :param img_infos: An array containing the image IDs, image filenames, capture time and experiment time for all images.
-    :type img_infos: np.ndarray
+    :param experiment_time: Experiment time of the image in seconds.
+    :type experiment_time: float
     :param basename: Base name for the file.
     :type basename: str
     :param fit_leds: If True, includes fit data in the header.
@@ -302,7 +1055,7 @@ def _create_header(channel: int, img_id: str, img_filename: str, img_infos: np.n
     """
     out_str = f'# image root = {basename}, photo file name = {img_filename}, '
     out_str += f"channel = {channel}, "
-    out_str += f"time[s] = {img_infos[int(img_id) - 1][3]}\n"
+    out_str += f"time[s] = {experiment_time}\n"
     out_str += "# id,line,sum_col_value,average_col_value,max_col_value"
     if fit_leds:
         out_str += ",led_center_x, led_center_y"
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+from ledsa.core.ConfigData import ConfigData
+from ledsa.data_extraction.LEDAnalysisData import LEDAnalysisData
+
+
+class ExperimentTestCase(unittest.TestCase):
+    """
+    Base class of tests which run in the directory of a small experiment, created in a temporary directory.
+    The experiment has 'num_of_imgs' images with ids starting at 1 and 'num_of_leds' LEDs on a single LED array,
+    the images themselves do not exist.
+    """
+    num_of_imgs = 2
+    num_of_leds = 3
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        os.makedirs(os.path.join('analysis', 'channel0'))
+        ConfigData(load_config_file=False, img_directory='./', num_of_arrays=1, num_of_cores=1,
+                   img_name_string='test_img_{}.jpg', first_img_experiment=1, last_img_experiment=self.num_of_imgs,
+                   reference_img='test_img_1.jpg', first_img_analysis=1, last_img_analysis=self.num_of_imgs).save()
+        with open(os.path.join('analysis', 'image_infos_analysis.csv'), 'w') as file:
+            file.write('#ID,Name,Time[s],Experiment_Time[s]\n')
+            for img_id in range(1, self.num_of_imgs + 1):
+                file.write(f'{img_id},test_img_{img_id}.jpg,12:00:{img_id - 1:02d},{img_id - 1:.1f}\n')
+        with open(os.path.join('analysis', 'led_search_areas_with_coordinates.csv'), 'w') as file:
+            file.write('# LED id, pixel position x, pixel position y, x, y, z, width, height\n')
+            for led_id in range(self.num_of_leds):
+                file.write(f'{led_id},10,20,0,0,0,{0.1 * led_id},{0.2 * led_id}\n')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def create_img_data(self, img_id):
+        """
+        Create the analysis data of all LEDs of an image with fit results. The values depend on image and LED id.
+        """
+        img_data = []
+        for led_id in range(self.num_of_leds):
+            led_data = LEDAnalysisData(led_id, 0, True)
+            led_data.led_center_x = 10.5 + led_id
+            led_data.led_center_y = 20.5
+            led_data.sum_color_value = 1000. * img_id + led_id
+            led_data.mean_color_value = 10. * img_id + led_id
+            led_data.max_color_value = 200 + led_id
+            led_data.fit_results = OptimizeResult(x=np.array([5., 6., 0.5, -0.5, 200. + led_id, 0.1, 1.5, 1.6]),
+                                                  success=True, fun=0.25, nfev=42)
+            led_data.fit_time = 0.01
+            img_data.append(led_data)
+        return img_data
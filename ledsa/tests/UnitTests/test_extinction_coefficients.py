@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from ledsa.analysis.Experiment import Experiment, Layers, Camera
+from ledsa.analysis.ExtinctionCoefficientsJoint import ExtinctionCoefficientsJoint
+from ledsa.analysis.ExtinctionCoefficientsLinear import ExtinctionCoefficientsLinear
+
+
+class TestLinearSolvers(unittest.TestCase):
+    """
+    Solve synthetic extinction data of three LEDs per layer, whose light traverses their own layer and all layers
+    above, for a smooth profile of the coefficients which grows in time.
+    """
+    num_of_layers = 10
+
+    def setUp(self):
+        self.experiment = Experiment(layers=Layers(self.num_of_layers, 0., 3.), led_array=0,
+                                     camera=Camera(pos_x=0., pos_y=0., pos_z=3.))
+        self.distances = np.zeros((3 * self.num_of_layers, self.num_of_layers))
+        for iled in range(3 * self.num_of_layers):
+            layer = iled // 3
+            self.distances[iled, layer:] = 0.3
+            self.distances[iled, layer] += 0.5 * (iled % 3 + 1)
+        heights = (np.arange(self.num_of_layers) + 0.5) / self.num_of_layers
+        self.kappas = np.array([0.05 + 0.3 * time / (1 + np.exp(-8 * (heights - 0.5))) for time in [0., 0.5, 1.]])
+        self.rel_intensities = np.exp(-self.kappas @ self.distances.T)
+
+    def create_solver(self, solver_class, **kwargs):
+        solver = solver_class(experiment=self.experiment, **kwargs)
+        solver.distances_per_led_and_layer = self.distances
+        return solver
+
+    def test_linear_solver(self):
+        solver = self.create_solver(ExtinctionCoefficientsLinear)
+        kappas = solver.calc_coefficients_of_imgs(self.rel_intensities)
+        # the coefficients are returned from the top to the bottom layer
+        np.testing.assert_allclose(np.flip(kappas, axis=1), self.kappas, atol=1e-4)
+        np.testing.assert_allclose(solver.calc_coefficients_of_img(self.rel_intensities[1]), kappas[1])
+
+    def test_linear_solver_with_incomplete_images(self):
+        solver = self.create_solver(ExtinctionCoefficientsLinear)
+        rel_intensities = self.rel_intensities.copy()
+        rel_intensities[1, 4] = np.nan
+        rel_intensities[2, 5] = 0
+        kappas = solver.calc_coefficients_of_imgs(rel_intensities)
+        np.testing.assert_allclose(np.flip(kappas, axis=1), self.kappas, atol=1e-4)
+
+    def test_linear_solver_keeps_the_bounds(self):
+        solver = self.create_solver(ExtinctionCoefficientsLinear)
+        solver.bounds = (0, 0.2)
+        kappas = solver.calc_coefficients_of_imgs(self.rel_intensities)
+        self.assertTrue(np.all((kappas >= 0) & (kappas <= 0.2 + 1e-12)))
+        np.testing.assert_allclose(np.flip(kappas[0]), self.kappas[0], atol=1e-4)
+
+    def test_joint_solver(self):
+        solver = self.create_solver(ExtinctionCoefficientsJoint)
+        kappas = solver.calc_coefficients_of_all_imgs(self.rel_intensities)
+        np.testing.assert_allclose(np.flip(kappas, axis=1), self.kappas, atol=1e-3)
+
+    def test_joint_solver_without_temporal_coupling_solves_images_separately(self):
+        solver = self.create_solver(ExtinctionCoefficientsJoint, weighting_temporal=0)
+        linear_solver = self.create_solver(ExtinctionCoefficientsLinear)
+        np.testing.assert_allclose(solver.calc_coefficients_of_all_imgs(self.rel_intensities),
+                                   linear_solver.calc_coefficients_of_imgs(self.rel_intensities), atol=1e-8)
+
+    def test_joint_solver_smooths_in_time(self):
+        rng = np.random.default_rng(0)
+        rel_intensities = self.rel_intensities * (1 + 0.01 * rng.standard_normal(self.rel_intensities.shape))
+        linear_kappas = self.create_solver(ExtinctionCoefficientsLinear).calc_coefficients_of_imgs(rel_intensities)
+        joint_kappas = self.create_solver(ExtinctionCoefficientsJoint, weighting_temporal=1.)\
+            .calc_coefficients_of_all_imgs(rel_intensities)
+        self.assertLess(np.abs(np.diff(joint_kappas, axis=0)).sum(), np.abs(np.diff(linear_kappas, axis=0)).sum())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+
+from ledsa.core.image_reading import _mask_raw_channel, _read_bayer_plane
+
+
+class TestReadModes(unittest.TestCase):
+    """
+    Compare the sub-sampled Bayer planes with the masked channels of the full resolution Bayer array.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.raw_pattern = np.array([[0, 1], [3, 2]])
+        self.filter_array = np.tile(self.raw_pattern, (6, 8))
+        self.data = rng.integers(512, 16000, size=self.filter_array.shape).astype(np.uint16)
+        self.black_levels = [512, 510, 514, 510]
+        self.white_level = 16383
+
+    def read_plane(self, channel, average_greens=False):
+        return _read_bayer_plane(self.data, self.raw_pattern, channel, self.black_levels, self.white_level, 14,
+                                 average_greens)
+
+    def test_planes_hold_the_values_of_the_masked_channels(self):
+        for channel in [0, 2]:
+            masked = _mask_raw_channel(self.data, self.filter_array, channel, self.black_levels[channel],
+                                       self.white_level, 14)
+            row, col = np.argwhere(self.raw_pattern == channel)[0]
+            plane = self.read_plane(channel)
+            self.assertEqual(plane.shape, (6, 8))
+            np.testing.assert_array_equal(plane, masked[row::2, col::2])
+            self.assertEqual(np.count_nonzero(masked[self.filter_array != channel]), 0)
+
+    def test_green_planes(self):
+        masked = _mask_raw_channel(self.data, self.filter_array, 1, self.black_levels[1], self.white_level, 14)
+        np.testing.assert_array_equal(self.read_plane(1), masked[0::2, 1::2])
+        green_2 = _mask_raw_channel(self.data, self.filter_array, 1, self.black_levels[3], self.white_level, 14)
+        np.testing.assert_array_equal(self.read_plane(3), green_2[1::2, 0::2])
+        np.testing.assert_array_equal(self.read_plane(1, average_greens=True),
+                                      (masked[0::2, 1::2].astype(int) + green_2[1::2, 0::2]) // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import unittest
+
+from ledsa.data_extraction.step_3_functions import append_to_journal, create_fit_result_file, \
+    find_and_save_not_analysed_imgs, read_journal, read_journal_run, start_journal
+from ledsa.tests.UnitTests.ExperimentTestCase import ExperimentTestCase
+
+
+def read_images_to_process():
+    with open('images_to_process.csv') as in_file:
+        return in_file.read().split()
+
+
+class TestJournal(ExperimentTestCase):
+    num_of_imgs = 4
+
+    def test_round_trip(self):
+        start_journal([0, 2], 'full')
+        append_to_journal(1, [0, 2], 'full')
+        append_to_journal(2, [0], 'full')
+        self.assertEqual(read_journal_run(), ([0, 2], 'full'))
+        self.assertEqual(read_journal(), {(1, 0, 'full'), (1, 2, 'full'), (2, 0, 'full')})
+
+    def test_interrupted_entry_is_ignored(self):
+        start_journal([0], 'none')
+        append_to_journal(1, [0], 'none')
+        with open(os.path.join('analysis', 'processed_imgs.csv'), 'a') as out_file:
+            out_file.write('2,0,no')
+        self.assertEqual(read_journal(), {(1, 0, 'none')})
+        append_to_journal(3, [0], 'none')
+        self.assertEqual(read_journal(), {(1, 0, 'none'), (3, 0, 'none')})
+
+    def test_restart_processes_missing_images(self):
+        start_journal([0], 'full')
+        for img_id in [1, 3]:
+            create_fit_result_file(self.create_img_data(img_id), img_id, 0)
+            append_to_journal(img_id, [0], 'full')
+        find_and_save_not_analysed_imgs([0], 'full')
+        self.assertEqual(read_images_to_process(), ['test_img_2.jpg', 'test_img_4.jpg'])
+
+    def test_restart_processes_images_of_other_fit_mode(self):
+        start_journal([0], 'none')
+        append_to_journal(1, [0], 'full')
+        create_fit_result_file(self.create_img_data(1), 1, 0)
+        find_and_save_not_analysed_imgs([0], 'none')
+        self.assertEqual(len(read_images_to_process()), 4)
+
+    def test_restart_processes_images_with_removed_result_files(self):
+        start_journal([0], 'full')
+        for img_id in [1, 2]:
+            create_fit_result_file(self.create_img_data(img_id), img_id, 0)
+            append_to_journal(img_id, [0], 'full')
+        os.remove(os.path.join('analysis', 'channel0', '1_led_positions.csv'))
+        find_and_save_not_analysed_imgs([0], 'full')
+        self.assertEqual(read_images_to_process(), ['test_img_1.jpg', 'test_img_3.jpg', 'test_img_4.jpg'])
+        find_and_save_not_analysed_imgs([0], 'full', result_format='hdf')
+        self.assertEqual(read_images_to_process(), ['test_img_3.jpg', 'test_img_4.jpg'])
+
+    def test_restart_without_journal_uses_result_files(self):
+        create_fit_result_file(self.create_img_data(2), 2, 0)
+        self.assertIsNone(read_journal_run())
+        find_and_save_not_analysed_imgs([0], 'full')
+        self.assertEqual(read_images_to_process(), ['test_img_1.jpg', 'test_img_3.jpg', 'test_img_4.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from ledsa.data_extraction.batched_fit import fit_led_model_batched
+from ledsa.data_extraction.model import led_model, target_function
+from ledsa.data_extraction.step_3_functions import _fit_model_to_led, _fit_template_to_led
+
+
+def create_led_window(params, size=20):
+    x = np.linspace(0.5, size - 0.5, size)
+    mesh = np.meshgrid(x, x)
+    return led_model(mesh[0], mesh[1], *params), mesh
+
+
+class TestLedFits(unittest.TestCase):
+    """
+    Fit the LED model to synthetic windows of LEDs. The data is thresholded before the fit, so the fitted parameters
+    are close to, but not exactly the parameters of the window.
+    """
+    def setUp(self):
+        self.params = np.array([9.7, 10.3, 2.5, 2.2, 200., 0.3, 1.2, 1.4])
+        self.window, self.mesh = create_led_window(self.params)
+
+    def test_least_squares_matches_nelder_mead(self):
+        nelder_mead, _ = _fit_model_to_led(self.window, 'nelder-mead')
+        least_squares, _ = _fit_model_to_led(self.window, 'least_squares')
+        self.assertTrue(least_squares.success)
+        self.assertLess(least_squares.nfev, nelder_mead.nfev)
+        self.assertAlmostEqual(least_squares.fun, nelder_mead.fun, places=6)
+        self.assertAlmostEqual(least_squares.fun, target_function(least_squares.x, self.window, self.mesh))
+        np.testing.assert_allclose(least_squares.x[:2], self.params[:2], atol=1e-2)
+        np.testing.assert_allclose(least_squares.x[4], self.params[4], rtol=0.05)
+
+    def test_least_squares_starts_from_initial_guess(self):
+        res, _ = _fit_model_to_led(self.window, 'least_squares', x0=self.params)
+        first_res, _ = _fit_model_to_led(self.window, 'least_squares')
+        self.assertTrue(res.success)
+        self.assertLessEqual(res.nfev, first_res.nfev)
+        np.testing.assert_allclose(res.x[:2], self.params[:2], atol=1e-2)
+
+    def test_batched_fit_matches_single_fits(self):
+        shifted_params = self.params + [1., -1., 0, 0, 50., 0, 0, 0]
+        windows = np.stack([self.window, create_led_window(shifted_params)[0], np.zeros((20, 20))])
+        params, success, fun, nfev = fit_led_model_batched(windows)
+        np.testing.assert_array_equal(success[:2], [True, True])
+        for led_idx, led_params in enumerate([self.params, shifted_params]):
+            res, _ = _fit_model_to_led(windows[led_idx], 'least_squares')
+            self.assertLessEqual(fun[led_idx], res.fun + 1e-6)
+            self.assertAlmostEqual(fun[led_idx], target_function(params[led_idx], windows[led_idx], self.mesh))
+            np.testing.assert_allclose(params[led_idx, :2], led_params[:2], atol=1e-2)
+        self.assertTrue(np.all(np.isfinite(params[2])))
+
+    def test_template_fit_scales_the_amplitude(self):
+        res, _ = _fit_template_to_led(0.5 * self.window, self.params)
+        self.assertTrue(res.success)
+        self.assertEqual(res.nfev, 1)
+        np.testing.assert_array_equal(np.delete(res.x, 4), np.delete(self.params, 4))
+        self.assertAlmostEqual(res.x[4], 0.5 * self.params[4], delta=0.01 * self.params[4])
+
+    def test_template_fit_with_shift_finds_the_center(self):
+        shifted_params = self.params + [0.4, -0.3, 0, 0, 0, 0, 0, 0]
+        res, _ = _fit_template_to_led(create_led_window(shifted_params)[0], self.params, fit_shift=True)
+        self.assertTrue(res.success)
+        np.testing.assert_allclose(res.x[:2], shifted_params[:2], atol=1e-2)
+        np.testing.assert_array_equal(res.x[2:4], self.params[2:4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ledsa.core.file_handling import create_binary_data, read_hdf
+from ledsa.core.ResultCube import get_result_cube
+from ledsa.data_extraction.step_3_functions import create_result_array, create_result_file, create_fit_result_file
+from ledsa.tests.UnitTests.ExperimentTestCase import ExperimentTestCase
+
+
+class TestResultFiles(ExperimentTestCase):
+    num_of_imgs = 3
+
+    def check_fit_parameters(self, img_ids):
+        fit_parameters = read_hdf(0)
+        self.assertIn('fit_time', fit_parameters.columns)
+        self.assertEqual(len(fit_parameters), len(img_ids) * self.num_of_leds)
+        for img_id in img_ids:
+            img_parameters = fit_parameters.loc[img_id]
+            np.testing.assert_allclose(img_parameters['sum_col_val'], 1000. * img_id + np.arange(3))
+            np.testing.assert_allclose(img_parameters['max_col_val'], 200 + np.arange(3))
+            np.testing.assert_allclose(img_parameters['led_center_x'], 10.5 + np.arange(3))
+            np.testing.assert_allclose(img_parameters['led_center_y'], 20.5)
+            np.testing.assert_allclose(img_parameters['A'], 200. + np.arange(3))
+            np.testing.assert_allclose(img_parameters['wy'], 1.6)
+            np.testing.assert_allclose(img_parameters['fit_nfev'], 42)
+            np.testing.assert_allclose(img_parameters['fit_time'], 0.01)
+            np.testing.assert_allclose(img_parameters['height'], 0.2 * np.arange(3))
+
+    def test_stream_result_files_are_read_back(self):
+        for img_id in [1, 2]:
+            create_result_file(create_result_array(self.create_img_data(img_id), img_id), img_id, 0)
+        self.check_fit_parameters([1, 2])
+
+    def test_fit_result_files_are_read_back(self):
+        for img_id in [1, 2]:
+            create_fit_result_file(self.create_img_data(img_id), img_id, 0)
+        self.check_fit_parameters([1, 2])
+
+    def test_new_result_files_are_appended(self):
+        create_fit_result_file(self.create_img_data(1), 1, 0)
+        create_binary_data(0)
+        # the CSV file of an ingested image is not read again
+        os.remove(os.path.join('analysis', 'channel0', '1_led_positions.csv'))
+        for img_id in [2, 3]:
+            create_fit_result_file(self.create_img_data(img_id), img_id, 0)
+        create_binary_data(0)
+        self.check_fit_parameters([1, 2, 3])
+        with pd.HDFStore(os.path.join('analysis', 'channel0', 'all_parameters.h5'), mode='r') as store:
+            self.assertEqual(store['ingested_img_ids'].tolist(), [1, 2, 3])
+            self.assertEqual(store['missing_img_ids'].tolist(), [])
+
+    def test_missing_result_files_are_ingested_later(self):
+        for img_id in [1, 3]:
+            create_fit_result_file(self.create_img_data(img_id), img_id, 0)
+        create_binary_data(0)
+        self.assertTrue(read_hdf(0).loc[2]['sum_col_val'].isna().all())
+        create_fit_result_file(self.create_img_data(2), 2, 0)
+        create_binary_data(0)
+        self.check_fit_parameters([1, 2, 3])
+
+
+class TestResultCube(ExperimentTestCase):
+    def test_cube_holds_the_results_of_the_binary_file(self):
+        for img_id in [1, 2]:
+            create_fit_result_file(self.create_img_data(img_id), img_id, 0)
+        fit_parameters = read_hdf(0)
+        result_cube = get_result_cube(0)
+        np.testing.assert_array_equal(result_cube.img_ids, [1, 2])
+        np.testing.assert_array_equal(result_cube.get_led_ids(line=0), np.arange(self.num_of_leds))
+        np.testing.assert_allclose(result_cube.experiment_times, [0., 1.])
+        for quantity in ['sum_col_val', 'A', 'height']:
+            np.testing.assert_allclose(result_cube.get_values(quantity),
+                                       fit_parameters[quantity].unstack().to_numpy())
+
+    def test_cube_is_exported_again_after_new_results(self):
+        create_fit_result_file(self.create_img_data(1), 1, 0)
+        read_hdf(0)
+        self.assertEqual(get_result_cube(0).get_values('sum_col_val').shape, (1, self.num_of_leds))
+        create_fit_result_file(self.create_img_data(2), 2, 0)
+        read_hdf(0)
+        result_cube = get_result_cube(0)
+        np.testing.assert_allclose(result_cube.get_values('sum_col_val')[1], 2000. + np.arange(self.num_of_leds))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from ledsa.data_extraction.roi_functions import calc_roi_statistics, extract_roi_stack
+
+
+class TestRoiStatistics(unittest.TestCase):
+    """
+    Compare the vectorized statistics of the windows of all LEDs with the evaluation of every LED on its own.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.data = rng.integers(0, 256, size=(60, 80)).astype(np.uint8)
+        self.window_radius = 5
+        self.search_areas = np.array([[0, 10, 10], [1, 30, 40], [2, 54, 74], [3, 20, 65]])
+
+    def test_statistics_match_the_loop_over_leds(self):
+        rois = extract_roi_stack(self.data, self.search_areas, self.window_radius)
+        led_ids = np.array([3, 0, 2])
+        statistics = calc_roi_statistics(rois, led_ids, np.array([1, 0, 1]))
+        np.testing.assert_array_equal(statistics['led_id'], led_ids)
+        np.testing.assert_array_equal(statistics['line'], [1, 0, 1])
+        for led_idx, iled in enumerate(led_ids):
+            x, y = self.search_areas[iled, 1:]
+            search_area = self.data[x - self.window_radius:x + self.window_radius,
+                                    y - self.window_radius:y + self.window_radius]
+            self.assertEqual(statistics['sum_col_val'][led_idx], np.sum(search_area))
+            self.assertAlmostEqual(statistics['mean_col_val'][led_idx], np.mean(search_area))
+            self.assertEqual(statistics['max_col_val'][led_idx], np.amax(search_area))
+
+    def test_windows_beyond_the_border_are_filled_with_zeros(self):
+        search_areas = np.array([[0, 2, 3], [1, 58, 78]])
+        rois = extract_roi_stack(self.data, search_areas, self.window_radius)
+        self.assertEqual(rois.shape, (2, 10, 10))
+        np.testing.assert_array_equal(rois[0, 3:, 2:], self.data[:7, :8])
+        self.assertEqual(np.count_nonzero(rois[0, :3]), 0)
+        self.assertEqual(np.count_nonzero(rois[0, :, :2]), 0)
+        np.testing.assert_array_equal(rois[1, :7, :7], self.data[53:, 73:])
+        self.assertEqual(np.count_nonzero(rois[1, 7:]), 0)
+        statistics = calc_roi_statistics(rois, np.array([0, 1]), np.array([0, 0]))
+        self.assertAlmostEqual(statistics['mean_col_val'][1], np.sum(self.data[53:, 73:]) / 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Microbenchmark of the cost function of the LED fit.
+
+Compares the evaluations per second of target_function with those of a prepared LEDFitObjective on a typical
+20x20 window. Run with ``python -m ledsa.tests.benchmark_target_function``.
+"""
+import timeit
+
+import numpy as np
+
+from ledsa.data_extraction.LEDFitObjective import LEDFitObjective
+from ledsa.data_extraction.model import led_model, target_function
+
+
+def create_window(window_size=20, noise=2., seed=0) -> np.ndarray:
+    """
+    Create a noisy window with a single LED in its center.
+
+    :param window_size: Edge length of the window in pixels. Default is 20.
+    :type window_size: int
+    :param noise: Standard deviation of the added noise. Default is 2.
+    :type noise: float
+    :param seed: Seed of the random number generator. Default is 0.
+    :type seed: int
+    :return: The window.
+    :rtype: np.ndarray
+    """
+    x = np.linspace(0.5, window_size - 0.5, window_size)
+    mesh = np.meshgrid(x, x)
+    window = led_model(*mesh, window_size / 2, window_size / 2, 2.5, 2., 180., 0.3, 1., 1.2)
+    return window + np.random.default_rng(seed).normal(0, noise, window.shape)
+
+
+def run_benchmark(window_size=20, number=20000) -> None:
+    """
+    Print the evaluations per second of target_function and LEDFitObjective and check that both agree.
+
+    :param window_size: Edge length of the window in pixels. Default is 20.
+    :type window_size: int
+    :param number: Number of evaluations per timing. Default is 20000.
+    :type number: int
+    """
+    window = create_window(window_size)
+    x = np.linspace(0.5, window_size - 0.5, window_size)
+    mesh = np.meshgrid(x, x)
+    params = np.array([window_size / 2 - 0.3, window_size / 2 + 0.2, 2.2, 2.1, 170., 0.2, 1.1, 1.1])
+    objective = LEDFitObjective(window, mesh)
+    assert np.isclose(objective(params), target_function(params, window, mesh))
+
+    for name, function in [('target_function', lambda: target_function(params, window, mesh)),
+                           ('LEDFitObjective', lambda: objective(params))]:
+        duration = min(timeit.repeat(function, number=number, repeat=3))
+        print(f'{name:>16}: {number / duration:12.0f} evaluations per second')
+
+
+if __name__ == '__main__':
+    run_benchmark()